@@ -152,6 +152,8 @@ class ChickenDeLiveryWidget(ScriptedLoadableModuleWidget, VTKObservationMixin):
     """
     print("ChickenDelivery cleanup")
     self.removeObservers()
+    if self.logic:
+      self.logic.shutdown_node_index()
 
   def enter(self):
     """
@@ -434,6 +436,98 @@ class ChickenDeLiveryWidget(ScriptedLoadableModuleWidget, VTKObservationMixin):
   def onBtnBatchExport(self):
     batch_exporter()
 
+#
+# StorageNodeIndex
+#
+
+class StorageNodeIndex:
+  """
+  File path -> storable node index, so looking up an already loaded table does not scan
+  every node of the scene. Scene NodeAdded / NodeRemoved observers keep it current, a
+  ModifiedEvent observer per storable node catches storage nodes attached after the node
+  was added. get() re-checks the hit, a stale entry can only cause a miss.
+  """
+
+  def __init__(self, scene):
+    self._scene = scene
+    self._by_path = {}
+    self._path_of = {}
+    self._node_tags = {}
+    self._scene_tags = [
+      scene.AddObserver(scene.NodeAddedEvent, self._on_node_added),
+      scene.AddObserver(scene.NodeRemovedEvent, self._on_node_removed),
+      scene.AddObserver(scene.EndCloseEvent, lambda caller, event: self._rebuild()),
+    ]
+    self._rebuild()
+
+  def get(self, path):
+    for node_id in list(self._by_path.get(path, ())):
+      node = self._scene.GetNodeByID(node_id)
+      storage = node.GetStorageNode() if node is not None else None
+      if storage is not None and storage.GetFileName() == path:
+        return node
+    return None
+
+  def close(self):
+    for tag in self._scene_tags:
+      self._scene.RemoveObserver(tag)
+    self._scene_tags = []
+    self._clear()
+
+  def _clear(self):
+    for node, tag in self._node_tags.values():
+      node.RemoveObserver(tag)
+    self._by_path = {}
+    self._path_of = {}
+    self._node_tags = {}
+
+  def _rebuild(self):
+    self._clear()
+    for node in slicer.util.getNodesByClass("vtkMRMLStorableNode"):
+      self._track(node)
+
+  def _track(self, node):
+    if node.GetID() in self._node_tags:
+      return
+    self._node_tags[node.GetID()] = (node, node.AddObserver(vtk.vtkCommand.ModifiedEvent, self._on_node_modified))
+    self._update(node)
+
+  def _update(self, node):
+    node_id = node.GetID()
+    storage = node.GetStorageNode()
+    path = storage.GetFileName() if storage is not None else None
+    old_path = self._path_of.get(node_id)
+    if old_path == path:
+      return
+    if old_path is not None:
+      self._by_path.get(old_path, set()).discard(node_id)
+    if path:
+      self._path_of[node_id] = path
+      self._by_path.setdefault(path, set()).add(node_id)
+    else:
+      self._path_of.pop(node_id, None)
+
+  def _forget(self, node_id):
+    node_tag = self._node_tags.pop(node_id, None)
+    if node_tag is not None:
+      node_tag[0].RemoveObserver(node_tag[1])
+    path = self._path_of.pop(node_id, None)
+    if path is not None:
+      self._by_path.get(path, set()).discard(node_id)
+
+  @vtk.calldata_type(vtk.VTK_OBJECT)
+  def _on_node_added(self, caller, event, node):
+    if node is not None and node.IsA("vtkMRMLStorableNode"):
+      self._track(node)
+
+  @vtk.calldata_type(vtk.VTK_OBJECT)
+  def _on_node_removed(self, caller, event, node):
+    if node is not None and node.IsA("vtkMRMLStorableNode"):
+      self._forget(node.GetID())
+
+  def _on_node_modified(self, caller, event):
+    self._update(caller)
+
 #
 # ChickenDeLiveryLogic
 #
@@ -449,6 +543,7 @@ class ChickenDeLiveryLogic(ScriptedLoadableModuleLogic):
     Called when the logic class is instantiated. Can be used for initializing member variables.
     """
     ScriptedLoadableModuleLogic.__init__(self)
+    self._node_index = None
 
     self.dbTable = None
     self.dbDictList = []
@@ -479,18 +574,20 @@ class ChickenDeLiveryLogic(ScriptedLoadableModuleLogic):
       parameterNode.SetParameter("ShowNonControl","true")
 
 
+  @property
+  def node_index(self):
+    if self._node_index is None:
+      self._node_index = StorageNodeIndex(slicer.mrmlScene)
+    return self._node_index
+
+  def shutdown_node_index(self):
+    if self._node_index is not None:
+      self._node_index.close()
+      self._node_index = None
+
   def get_node_if_loaded(self, file_path):
-    all_node = slicer.mrmlScene.GetNodes()
-    node_name = ""
-    for n in all_node:
-      try:
-        if n.GetStorageNode().GetFileName()==file_path:
-          node_name = n.GetName()
-          break
-      except:
-        continue    
-      
-    return node_name
+    node = self.node_index.get(file_path)
+    return node.GetName() if node is not None else ""
 
 
   def initializeStudy(self):
@@ -500,17 +597,13 @@ class ChickenDeLiveryLogic(ScriptedLoadableModuleLogic):
     print(f"Database path {db_path}")
     print(f"Presegmentation path {preseg_path}")
 
-    try:
-      _node = slicer.util.getNode(self.get_node_if_loaded(db_path))
-      self.dbTable = _node
-    except slicer.util.MRMLNodeNotFoundException:
+    self.dbTable = self.node_index.get(db_path)
+    if self.dbTable is None:
       self.dbTable = slicer.util.loadTable(db_path)
 
-    try:
-      _node = _node = slicer.util.getNode(self.get_node_if_loaded(preseg_path))
-      self.presegTable = _node
-    except slicer.util.MRMLNodeNotFoundException:
-      self.presegTable = slicer.util.loadTable(preseg_path)    
+    self.presegTable = self.node_index.get(preseg_path)
+    if self.presegTable is None:
+      self.presegTable = slicer.util.loadTable(preseg_path)
 
     self.dbDictList = self.init_table(self.dbTable)
     self.presegDictList = self.init_table(self.presegTable)
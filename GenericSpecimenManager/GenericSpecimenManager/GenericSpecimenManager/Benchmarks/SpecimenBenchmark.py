@@ -0,0 +1,228 @@
+"""
+SpecimenBenchmark
+=================
+
+Reproducible performance numbers for the specimen engine, on synthetic
+studies (SyntheticStudy.py) at several scales:
+
+    python Benchmarks/SpecimenBenchmark.py --work /tmp/bench --scales small,medium
+    Slicer --no-main-window --python-script Benchmarks/SpecimenBenchmark.py --work /tmp/bench
+
+Timed operations:
+
+  plain Python   load_config, load_study (csv read + StudyPlan + row join, as
+                 SpecimenCLI does it), headless_export (SpecimenExport, forced)
+  inside Slicer  additionally initializeStudy, GenericSpecimen load / save /
+                 close (through the logic, on `--sample` specimens) and the
+                 scene based batch_exporter (forced)
+
+Every study is generated once per scale into `<work>/<scale>/` and reused
+while its parameters do not change. Results go to a JSON file (median, p95
+and min seconds per scale and operation, plus host / python / slicer info).
+
+`--baseline FILE` compares against an earlier result file: an operation whose
+median got slower by more than `--tolerance` (relative, default 20%) and
+`--min-delta` seconds is reported as a regression and the exit code is 1.
+`--save-baseline FILE` stores this run as the new baseline. Baselines only
+compare meaningfully on the same machine and storage.
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import platform
+import argparse
+
+if __name__ == "__main__":
+    # run as a script: make `Resources.` and `Benchmarks.` importable
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Benchmarks.SyntheticStudy import generate
+from Resources.SpecimenStudy import load_config
+from Resources.SpecimenCLI import load_study, in_slicer
+from Resources.SpecimenExport import build_export_jobs, run_export_jobs
+from Resources.SpecimenTiming import percentile
+
+
+SCALES = {
+    "small": {"rows": 20, "size": 64},
+    "medium": {"rows": 100, "size": 128},
+    "large": {"rows": 400, "size": 256},
+}
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+
+def aggregate(samples):
+    result = {}
+    for op, seconds in samples.items():
+        if not seconds:
+            continue
+        ordered = sorted(seconds)
+        result[op] = {"n": len(ordered), "median_s": percentile(ordered, 50),
+                      "p95_s": percentile(ordered, 95), "min_s": ordered[0]}
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Study preparation
+# ---------------------------------------------------------------------------
+
+def prepare_study(work, scale, params, regenerate=False):
+    """Config path of the synthetic study of `scale`, generated if missing or
+    generated with other parameters."""
+    study_dir = os.path.join(work, scale)
+    marker = os.path.join(study_dir, "synthetic.json")
+    config_path = os.path.join(study_dir, "config.json")
+    if not regenerate and os.path.exists(config_path) and os.path.exists(marker):
+        with open(marker, "r", encoding="utf-8") as f:
+            if json.load(f) == params:
+                return config_path
+    config_path = generate(study_dir, **params)
+    with open(marker, "w", encoding="utf-8") as f:
+        json.dump(params, f)
+    return config_path
+
+
+# ---------------------------------------------------------------------------
+# Benchmarks
+# ---------------------------------------------------------------------------
+
+def bench_pure(config_path, repeat, workers):
+    samples = {"load_config": [], "load_study": [], "headless_export": []}
+    for _ in range(repeat):
+        samples["load_config"].append(timed(lambda: load_config(config_path)))
+        samples["load_study"].append(timed(lambda: load_study(config_path)))
+
+    cfg, specimens, _ = load_study(config_path)
+    jobs = build_export_jobs(cfg, specimens, force=True)
+    samples["headless_export"].append(
+        timed(lambda: run_export_jobs(jobs, workers=workers, use_processes=not in_slicer())))
+    return samples
+
+
+def bench_slicer(config_path, repeat, sample):
+    import slicer
+    from Resources.GenericSpecimenEngine import GenericSpecimenManagerLogic, batch_exporter
+
+    samples = {"initializeStudy": [], "load": [], "save": [], "close": [], "batch_exporter": []}
+    logic = GenericSpecimenManagerLogic()
+    logic.load_config(config_path)
+    parameter_node = logic.getParameterNode()
+    parameter_node.SetParameter("DatabaseCSVPath", logic._abs_path(logic.cfg["database_csv_path"]))
+    parameter_node.SetParameter("PresegCSVPath", logic._abs_path(logic.cfg["preseg_csv_path"]))
+
+    for _ in range(repeat):
+        samples["initializeStudy"].append(timed(logic.initializeStudy))
+
+    keys = sorted(logic.specimens)
+    chosen = keys[::max(1, len(keys) // max(1, sample))][:sample]
+    try:
+        for key in chosen:
+            samples["load"].append(timed(lambda: logic.load_specimen(key, offer_journal=False)))
+            samples["save"].append(timed(logic.save_active_specimen))
+            if logic.save_writer is not None:
+                logic.save_writer.wait()
+            samples["close"].append(timed(lambda: logic.close_active_specimen(no_question=True, keep_cached=False)))
+        samples["batch_exporter"].append(timed(lambda: batch_exporter(logic, force=True)))
+    finally:
+        if logic.hasActiveSpecimen:
+            logic.close_active_specimen(no_question=True, keep_cached=False)
+        logic.shutdown_prefetcher()
+        logic.shutdown_progressive()
+        logic.shutdown_disk_cache()
+        logic.shutdown_save_writer()
+        logic.shutdown_leases()
+        logic.shutdown_node_index()
+        logic.shutdown_study_db()
+        slicer.mrmlScene.Clear(0)
+    return samples
+
+
+# ---------------------------------------------------------------------------
+# Baseline comparison
+# ---------------------------------------------------------------------------
+
+def compare(results, baseline, tolerance=0.2, min_delta=0.01):
+    """[(scale, op, baseline median, median, ratio, regressed)] for every
+    (scale, op) present in both."""
+    rows = []
+    for scale, ops in results["scales"].items():
+        for op, stats in ops.items():
+            before = baseline.get("scales", {}).get(scale, {}).get(op)
+            if not before or not before.get("median_s"):
+                continue
+            ratio = stats["median_s"] / before["median_s"]
+            regressed = ratio > 1.0 + tolerance and stats["median_s"] - before["median_s"] > min_delta
+            rows.append((scale, op, before["median_s"], stats["median_s"], ratio, regressed))
+    return rows
+
+
+def environment():
+    env = {"host": socket.gethostname(), "python": platform.python_version(),
+           "platform": platform.platform(), "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    if in_slicer():
+        import slicer
+        env["slicer"] = slicer.app.applicationVersion
+    return env
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the specimen engine on synthetic studies.")
+    parser.add_argument("--work", required=True, help="directory for the generated studies and results")
+    parser.add_argument("--scales", default="small", help=f"comma separated, of {', '.join(SCALES)}")
+    parser.add_argument("--repeat", type=int, default=5, help="repetitions of the cheap operations")
+    parser.add_argument("--sample", type=int, default=3, help="specimens to load / save / close per scale")
+    parser.add_argument("--workers", type=int, help="headless export pool size")
+    parser.add_argument("--regenerate", action="store_true", help="regenerate the synthetic studies")
+    parser.add_argument("--out", help="result file (default: <work>/results-<time>.json)")
+    parser.add_argument("--baseline", help="result file to compare against")
+    parser.add_argument("--save-baseline", help="also store this run as a baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--min-delta", type=float, default=0.01, help="ignore slowdowns below this many seconds")
+    args = parser.parse_args(argv)
+
+    results = {"environment": environment(), "scales": {}}
+    for scale in [s.strip() for s in args.scales.split(",") if s.strip()]:
+        if scale not in SCALES:
+            parser.error(f"unknown scale '{scale}'")
+        config_path = prepare_study(args.work, scale, SCALES[scale], args.regenerate)
+        samples = bench_pure(config_path, args.repeat, args.workers)
+        if in_slicer():
+            samples.update(bench_slicer(config_path, args.repeat, args.sample))
+        results["scales"][scale] = aggregate(samples)
+        for op, stats in results["scales"][scale].items():
+            print(f"[SpecimenBenchmark] {scale:>6} {op:<16} median {stats['median_s']:.3f}s  "
+                  f"p95 {stats['p95_s']:.3f}s  (n={stats['n']})")
+
+    out_path = args.out or os.path.join(args.work, f"results-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    for path in [out_path] + ([args.save_baseline] if args.save_baseline else []):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=1)
+        print(f"[SpecimenBenchmark] results written to {path}")
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        for scale, op, before, now, ratio, regressed in compare(results, baseline, args.tolerance, args.min_delta):
+            flag = "REGRESSION" if regressed else "ok"
+            print(f"[SpecimenBenchmark] {scale:>6} {op:<16} {before:.3f}s -> {now:.3f}s ({ratio:.2f}x) {flag}")
+            if regressed:
+                status = 1
+    return status
+
+
+if __name__ == "__main__":
+    status = main()
+    if in_slicer():
+        import slicer
+        slicer.util.exit(status)
+    else:
+        sys.exit(status)
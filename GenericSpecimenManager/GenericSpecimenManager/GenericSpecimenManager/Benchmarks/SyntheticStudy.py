@@ -0,0 +1,197 @@
+"""
+SyntheticStudy
+==============
+
+Generates a synthetic GenericSpecimenEngine study for the benchmarks in
+SpecimenBenchmark.py:
+
+  <out>/config.json               dynamic "pattern" images, file and empty
+                                  segments, landmarks, batch export
+  <out>/etc/database.csv          N rows: ID, measurement, done
+  <out>/etc/img_paths.csv         background, mask and seq_<k> columns; every
+                                  specimen has a different number of seq_ images
+  <out>/data/<ID>/...             background (int16 noise + ellipsoid), mask
+                                  (uint8 ellipsoid), seq_<k> volumes and one
+                                  mask file per file segment (slabs of the
+                                  ellipsoid)
+  <out>/<ID>/<measurement>/       segment.seg.nrrd (shared labelmap layer) and
+                                  <ID>-markups.mrk.json of the done specimens
+
+    python Benchmarks/SyntheticStudy.py --out /tmp/study --rows 50 --size 128
+
+The content is seeded, so the same arguments give the same study. Needs
+numpy and SimpleITK, not slicer.
+"""
+
+import os
+import csv
+import json
+import argparse
+
+import numpy as np
+import SimpleITK as sitk
+
+
+MEASUREMENT = "m1"
+
+
+def ellipsoid(size, rng):
+    """uint8 (k, j, i) mask of a randomly scaled ellipsoid filling most of a size^3 grid."""
+    radii = size * rng.uniform(0.3, 0.45, 3)
+    k, j, i = np.ogrid[:size, :size, :size]
+    c = (size - 1) / 2.0
+    inside = ((i - c) / radii[0]) ** 2 + ((j - c) / radii[1]) ** 2 + ((k - c) / radii[2]) ** 2 <= 1.0
+    return inside.astype(np.uint8)
+
+
+def write_image(array, path, spacing):
+    image = sitk.GetImageFromArray(array)
+    image.SetSpacing([float(spacing)] * 3)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    sitk.WriteImage(image, path, True)
+
+
+def slab_labels(mask, n_segments):
+    """Split `mask` into n_segments slabs along k: label image with values 1..n."""
+    ks = np.flatnonzero(mask.any(axis=(1, 2)))
+    labels = np.zeros_like(mask)
+    if len(ks) == 0 or n_segments == 0:
+        return labels
+    bounds = np.linspace(ks[0], ks[-1] + 1, n_segments + 1).astype(int)
+    for value, (k0, k1) in enumerate(zip(bounds[:-1], bounds[1:]), start=1):
+        labels[k0:k1][mask[k0:k1] != 0] = value
+    return labels
+
+
+def write_seg_nrrd(labels, segment_names, path, spacing, rng):
+    """One shared labelmap layer as Slicer writes it: segment i has label value
+    i + 1 (segments without voxels in `labels` are the empty ones)."""
+    image = sitk.GetImageFromArray(labels)
+    image.SetSpacing([float(spacing)] * 3)
+    size = labels.shape[::-1]
+    extent = f"0 {size[0] - 1} 0 {size[1] - 1} 0 {size[2] - 1}"
+    image.SetMetaData("Segmentation_MasterRepresentation", "Binary labelmap")
+    image.SetMetaData("Segmentation_ContainedRepresentationNames", "Binary labelmap|")
+    for index, name in enumerate(segment_names):
+        prefix = f"Segment{index}_"
+        image.SetMetaData(prefix + "ID", f"Segment_{index + 1}")
+        image.SetMetaData(prefix + "Name", name)
+        image.SetMetaData(prefix + "Color", " ".join(f"{c:.3f}" for c in rng.uniform(0, 1, 3)))
+        image.SetMetaData(prefix + "Layer", "0")
+        image.SetMetaData(prefix + "LabelValue", str(index + 1))
+        image.SetMetaData(prefix + "Extent", extent)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    sitk.WriteImage(image, path, True)
+
+
+def write_markups(path, n_points, size, spacing, rng):
+    points = [{"id": str(i + 1), "label": f"L-{i + 1}", "description": "",
+               "position": [float(v) for v in rng.uniform(0, size * spacing, 3)],
+               "positionStatus": "defined"}
+              for i in range(n_points)]
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"markups": [{"type": "Fiducial", "coordinateSystem": "LPS", "controlPoints": points}]}, f)
+
+
+def study_config(out, n_file_segments, n_empty_segments):
+    segments = [{"name": f"part{i + 1}"} for i in range(n_file_segments)]
+    segments += [{"name": f"empty{i + 1}", "source": "empty"} for i in range(n_empty_segments)]
+    return {
+        "study_dir": out,
+        "database_csv_path": "etc/database.csv",
+        "preseg_csv_path": "etc/img_paths.csv",
+        "key_columns": ["ID", "measurement"],
+        "table_columns": ["ID", "measurement", "done"],
+        "output_dir_pattern": ["ID", "measurement"],
+        "images": [
+            {"name": "background", "csv_column": "background", "role": "background", "required": True},
+            {"name": "mask", "csv_column": "mask", "type": "labelmap", "role": "label"},
+            {"pattern": "^seq_.*$", "strip_prefix": "seq_"},
+        ],
+        "segmentation": {
+            "enabled": True,
+            "reference_image": "background",
+            "path_pattern": "data/{ID}/{ID}-{segment_name}.nii.gz",
+            "segments": segments,
+        },
+        "landmarks": {"enabled": True, "path_pattern": "{ID}/{measurement}/{ID}-markups.mrk.json"},
+        "batch_export": {"enabled": True, "export_segments": True, "export_markups": True,
+                         "reference_image": "background", "output_dir": "export"},
+    }
+
+
+def generate(out, rows=20, size=64, spacing=0.5, n_seq=3, n_file_segments=4, n_empty_segments=2,
+             n_landmarks=10, done_every=2, seed=0):
+    """Write the study to `out`; returns the config path."""
+    rng = np.random.default_rng(seed)
+    out = os.path.abspath(out)
+    os.makedirs(os.path.join(out, "etc"), exist_ok=True)
+    segment_names = [f"part{i + 1}" for i in range(n_file_segments)] + \
+                    [f"empty{i + 1}" for i in range(n_empty_segments)]
+    seq_columns = [f"seq_{i + 1}" for i in range(n_seq)]
+
+    db_rows, preseg_rows = [], []
+    for row in range(rows):
+        sid = f"S{row:05d}"
+        done = "1" if done_every and row % done_every == 0 else "0"
+        db_rows.append({"ID": sid, "measurement": MEASUREMENT, "done": done})
+
+        data_dir = os.path.join(out, "data", sid)
+        mask = ellipsoid(size, rng)
+        background = (rng.normal(0, 50, mask.shape) + 1000 * mask).astype(np.int16)
+        write_image(background, os.path.join(data_dir, f"{sid}-background.nii.gz"), spacing)
+        write_image(mask, os.path.join(data_dir, f"{sid}-mask.nii.gz"), spacing)
+        preseg = {"ID": sid, "measurement": MEASUREMENT,
+                  "background": f"data/{sid}/{sid}-background.nii.gz",
+                  "mask": f"data/{sid}/{sid}-mask.nii.gz"}
+
+        # specimen `row` has (row % (n_seq + 1)) of the seq_ images: the pattern expands differently per row
+        for col in seq_columns[:row % (n_seq + 1)]:
+            write_image((background * rng.uniform(0.5, 1.5)).astype(np.int16),
+                        os.path.join(data_dir, f"{sid}-{col}.nii.gz"), spacing)
+            preseg[col] = f"data/{sid}/{sid}-{col}.nii.gz"
+        preseg_rows.append(preseg)
+
+        labels = slab_labels(mask, n_file_segments)
+        for value in range(1, n_file_segments + 1):
+            write_image((labels == value).astype(np.uint8),
+                        os.path.join(data_dir, f"{sid}-part{value}.nii.gz"), spacing)
+        if done == "1":
+            specimen_dir = os.path.join(out, sid, MEASUREMENT)
+            write_seg_nrrd(labels, segment_names, os.path.join(specimen_dir, "segment.seg.nrrd"), spacing, rng)
+            write_markups(os.path.join(specimen_dir, f"{sid}-markups.mrk.json"), n_landmarks, size, spacing, rng)
+
+    for name, table, columns in (("database.csv", db_rows, ["ID", "measurement", "done"]),
+                                 ("img_paths.csv", preseg_rows, ["ID", "measurement", "background", "mask"] + seq_columns)):
+        with open(os.path.join(out, "etc", name), "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=columns, restval="")
+            writer.writeheader()
+            writer.writerows(table)
+
+    config_path = os.path.join(out, "config.json")
+    with open(config_path, "w", encoding="utf-8") as f:
+        json.dump(study_config(out, n_file_segments, n_empty_segments), f, indent=2)
+    print(f"[SyntheticStudy] {rows} specimens ({size}^3 voxels) written to {out}")
+    return config_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic specimen study.")
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--rows", type=int, default=20)
+    parser.add_argument("--size", type=int, default=64, help="volume edge length in voxels")
+    parser.add_argument("--spacing", type=float, default=0.5)
+    parser.add_argument("--seq", type=int, default=3, help="max number of seq_ (pattern) images per specimen")
+    parser.add_argument("--file-segments", type=int, default=4)
+    parser.add_argument("--empty-segments", type=int, default=2)
+    parser.add_argument("--landmarks", type=int, default=10)
+    parser.add_argument("--done-every", type=int, default=2, help="every n-th specimen is done (0: none)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    generate(args.out, args.rows, args.size, args.spacing, args.seq, args.file_segments, args.empty_segments,
+             args.landmarks, args.done_every, args.seed)
+
+
+if __name__ == "__main__":
+    main()
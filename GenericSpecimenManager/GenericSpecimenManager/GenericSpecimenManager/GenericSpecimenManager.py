@@ -47,10 +47,59 @@ class GenericSpecimenManagerWidget(GenericSpecimenManagerWidgetBase):
 
 
 class GenericSpecimenManagerTest(ScriptedLoadableModuleTest):
+    """Run headless with
+
+        Slicer --no-main-window --python-code "import GenericSpecimenManager; GenericSpecimenManager.GenericSpecimenManagerTest().runTest(); exit()"
+
+    or with "Reload and Test" in the module panel.
+    """
+
     def setUp(self):
         slicer.mrmlScene.Clear()
 
     def runTest(self):
         self.setUp()
-        # Config-driven module: no fixed self-test data set.
-        pass
+        # Config-driven module: no fixed study data set, only engine pieces.
+        self.test_background_segmentation_save()
+
+    def test_background_segmentation_save(self):
+        """A segmentation snapshot written on the BackgroundWriter thread is a
+        readable .seg.nrrd with the same segment and voxels."""
+        import tempfile
+        import numpy as np
+        from Resources.GenericSpecimenEngine import snapshot_segmentation, write_snapshot_atomic
+        from Resources.SpecimenSave import BackgroundWriter
+
+        self.delayDisplay("Background segmentation save")
+        volume = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLScalarVolumeNode")
+        slicer.util.updateVolumeFromArray(volume, np.zeros((8, 10, 12), dtype=np.int16))
+        segmentation_node = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLSegmentationNode")
+        segmentation_node.SetReferenceImageGeometryParameterFromVolumeNode(volume)
+        segment_id = segmentation_node.GetSegmentation().AddEmptySegment("bone")
+        mask = np.zeros((8, 10, 12), dtype=np.uint8)
+        mask[2:5, 3:7, 4:9] = 1
+        slicer.util.updateSegmentBinaryLabelmapFromArray(mask, segmentation_node, segment_id, volume)
+
+        out_dir = tempfile.mkdtemp()
+        path = os.path.join(out_dir, "test.seg.nrrd")
+        snapshot, storage = snapshot_segmentation(segmentation_node)
+        writer = BackgroundWriter()
+        try:
+            writer.submit(("test", "segmentation"), lambda: write_snapshot_atomic(snapshot, storage, path),
+                          "test segmentation")
+            writer.wait()
+            errors = [error for _, _, error in writer.poll_results() if error]
+        finally:
+            writer.shutdown()
+        self.assertEqual(errors, [])
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual([name for name in os.listdir(out_dir) if name != "test.seg.nrrd"], [])
+
+        loaded = slicer.util.loadSegmentation(path)
+        segmentation = loaded.GetSegmentation()
+        self.assertEqual(segmentation.GetNumberOfSegments(), 1)
+        loaded_id = segmentation.GetNthSegmentID(0)
+        self.assertEqual(segmentation.GetSegment(loaded_id).GetName(), "bone")
+        loaded_mask = slicer.util.arrayFromSegmentBinaryLabelmap(loaded, loaded_id, volume)
+        self.assertEqual(int(loaded_mask.sum()), int(mask.sum()))
+        self.delayDisplay("Background segmentation save passed")
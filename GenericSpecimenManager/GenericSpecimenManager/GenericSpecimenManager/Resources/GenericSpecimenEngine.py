@@ -19,15 +19,20 @@ Override model: every image / segment resolves its final properties as
 i.e. plain dict merges, last one wins. No cascading rule lists, no name
 pattern matching against a global preset registry - if you need a group of
 images to share a look, give them the same "preset" name.
+
+Config loading and per-specimen path resolution live in SpecimenStudy.py
+(no Slicer imports, usable from plain Python); `load_config` is re-exported
+here.
 """
 
 import os
-import re
-import json
+import collections
 
+import numpy as np
 import qt
 import vtk
 import ctk
+from vtk.util import numpy_support
 
 from qt import QFileDialog
 
@@ -35,59 +40,161 @@ import slicer
 from slicer.ScriptedLoadableModule import *
 from slicer.util import VTKObservationMixin
 
+from Resources.SpecimenImageIO import (ImagePrefetcher, ProgressiveLoader, node_name_from_path, PROXY_DIR,
+                                       proxy_is_fresh, header_geometry, read_image, estimate_image_bytes,
+                                       read_images, same_grid, resample_to_grid)
+from Resources.SpecimenStudy import SpecimenPaths, StudyPlan, load_config, config_mtime, join_rows
+from Resources.SpecimenSave import BackgroundWriter, write_atomic
+from Resources.SpecimenJournal import SegmentJournal
+from Resources.SpecimenDatabase import StudyDatabase
+from Resources.SpecimenLease import LeaseManager
+from Resources.SpecimenDiskCache import DiskCache
+from Resources.SpecimenCrop import (CropBoxCache, crop_image, crop_region, file_fingerprint, mask_box,
+                                    read_image_region)
+from Resources.SpecimenTiming import NULL_TIMING, SpanLog, read_spans, summarize
+from Resources.SpecimenExport import (build_export_jobs, run_export_jobs, check_manifest, write_manifest,
+                                      split_layer, merge_layers, write_label_table, multilabel_paths,
+                                      Grid, image_on_grid, segment_statistics, update_statistics_table)
+from Resources.SpecimenLandmarks import export_study_landmarks
+
 
 # ---------------------------------------------------------------------------
-# Config helpers
+# Node helpers
 # ---------------------------------------------------------------------------
 
-def load_config(path):
-    """Load and normalize a study config json. See README.md for the schema."""
-    with open(path, "r", encoding="utf-8") as f:
-        cfg = json.load(f)
-
-    cfg.setdefault("study_dir", os.path.dirname(path))
-    cfg.setdefault("key_columns", ["ID"])
-    cfg.setdefault("done_column", "done")
-    cfg.setdefault("table_columns", list(cfg["key_columns"]) + [cfg["done_column"]])
-    cfg.setdefault("output_dir_pattern", list(cfg["key_columns"]))
-
-    cfg.setdefault("defaults", {})
-    cfg["defaults"].setdefault("image", {})
-    cfg["defaults"].setdefault("segment", {})
-    cfg.setdefault("presets", {})
-
-    cfg.setdefault("images", [])
-    cfg.setdefault("segmentation", {"enabled": False})
-    cfg.setdefault("landmarks", {"enabled": False})
-    cfg.setdefault("volume_rendering", {"enabled": False})
-    cfg.setdefault("window_level", {"enabled": False})
-    cfg.setdefault("batch_export", {"enabled": False})
-    cfg.setdefault("segment_editor", {})
-    return cfg
-
-
-def _merge(*dicts):
-    """Shallow dict merge, later entries win. None entries are skipped."""
-    result = {}
-    for d in dicts:
-        if d:
-            result.update(d)
-    return result
+def _volume_node_from_image(image, path, labelmap=False):
+    """Build a volume node from a prefetched CachedImage (main thread only).
+
+    Mirrors what slicer.util.loadVolume / loadLabelVolume would have produced
+    for `path`: same node name, same geometry, a storage node pointing at the
+    source file and default display nodes.
+    """
+    cls = "vtkMRMLLabelMapVolumeNode" if labelmap else "vtkMRMLScalarVolumeNode"
+    node = slicer.mrmlScene.AddNewNodeByClass(cls, slicer.mrmlScene.GenerateUniqueName(node_name_from_path(path)))
+    _set_volume_from_image(node, image)
+    node.AddDefaultStorageNode(path)
+    node.CreateDefaultDisplayNodes()
+    if not labelmap:
+        node.GetDisplayNode().AutoWindowLevelOn()
+    return node
+
+
+def _direction_matrix(directions):
+    matrix = vtk.vtkMatrix4x4()
+    for r in range(3):
+        for c in range(3):
+            matrix.SetElement(r, c, directions[r][c])
+    return matrix
+
+
+def _set_volume_from_image(node, image):
+    """Replace the voxels and geometry of a volume node with a CachedImage."""
+    slicer.util.updateVolumeFromArray(node, image.array)
+    node.SetOrigin(*image.origin)
+    node.SetSpacing(*image.spacing)
+    node.SetIJKToRASDirectionMatrix(_direction_matrix(image.directions))
+
+
+def _header_image_geometry(path):
+    """Voxel-less vtkOrientedImageData with the geometry of an image file (header only)."""
+    size, origin, spacing, directions = header_geometry(path)
+    geometry = slicer.vtkOrientedImageData()
+    geometry.SetExtent(0, size[0] - 1, 0, size[1] - 1, 0, size[2] - 1)
+    geometry.SetOrigin(*origin)
+    geometry.SetSpacing(*spacing)
+    geometry.SetDirectionMatrix(_direction_matrix(directions))
+    return geometry
+
+
+def _oriented_image_from_array(array, extent, ijk_to_ras):
+    """Unsigned char vtkOrientedImageData from a (k, j, i) array covering the VTK `extent`."""
+    image = slicer.vtkOrientedImageData()
+    image.SetExtent(*extent)
+    image.AllocateScalars(vtk.VTK_UNSIGNED_CHAR, 1)
+    if array.size:
+        numpy_support.vtk_to_numpy(image.GetPointData().GetScalars())[:] = np.asarray(array, dtype=np.uint8).ravel()
+    matrix = vtk.vtkMatrix4x4()
+    for r in range(4):
+        for c in range(4):
+            matrix.SetElement(r, c, float(ijk_to_ras[r][c]))
+    image.SetImageToWorldMatrix(matrix)
+    return image
+
+
+def _ijk_to_ras_of_image(image):
+    """4x4 IJK -> RAS (nested lists) of a CachedImage."""
+    return [[image.directions[r][c] * image.spacing[c] for c in range(3)] + [image.origin[r]]
+            for r in range(3)] + [[0.0, 0.0, 0.0, 1.0]]
+
+
+def _oriented_image_from_cached(image):
+    """Binary (non-zero = inside) vtkOrientedImageData of a decoded mask."""
+    nk, nj, ni = image.array.shape
+    return _oriented_image_from_array(image.array != 0, (0, ni - 1, 0, nj - 1, 0, nk - 1),
+                                      _ijk_to_ras_of_image(image))
+
+
+def _segment_mask(segment):
+    """(bool mask (k, j, i), VTK extent, IJK -> RAS 4x4) of one segment, read
+    from its (possibly shared) binary labelmap layer. None if the segment has
+    no binary labelmap representation."""
+    image = segment.GetRepresentation(slicer.vtkSegmentationConverter.GetBinaryLabelmapRepresentationName())
+    if image is None:
+        return None
+    extent = image.GetExtent()
+    matrix = vtk.vtkMatrix4x4()
+    image.GetImageToWorldMatrix(matrix)
+    ijk_to_ras = [[matrix.GetElement(r, c) for c in range(4)] for r in range(4)]
+    if extent[1] < extent[0] or extent[3] < extent[2] or extent[5] < extent[4]:
+        return np.zeros((0, 0, 0), dtype=bool), extent, ijk_to_ras
+    dims = image.GetDimensions()
+    layer = numpy_support.vtk_to_numpy(image.GetPointData().GetScalars()).reshape(dims[2], dims[1], dims[0])
+    return layer == segment.GetLabelValue(), extent, ijk_to_ras
+
+
+def _write_node_to(node, path):
+    """Write `node` to `path` with a fresh default storage node."""
+    storage = node.CreateDefaultStorageNode()
+    storage.SetFileName(path)
+    if not storage.WriteData(node):
+        raise IOError(f"failed to write '{path}'")
+
+
+def _write_node_atomic(node, path):
+    """_write_node_to a temp file, then rename it to `path`."""
+    write_atomic(path, lambda tmp_path: _write_node_to(node, tmp_path))
+
+
+def snapshot_segmentation(segmentation_node):
+    """(detached deep copy of `segmentation_node`, storage node for it) for a
+    write on another thread. A node outside the scene cannot create its own
+    default storage node (that goes through the scene), so the storage node
+    is made here, on the main thread, configured like the original's."""
+    snapshot = slicer.vtkMRMLSegmentationNode()
+    snapshot.GetSegmentation().DeepCopy(segmentation_node.GetSegmentation())
+    storage = slicer.vtkMRMLSegmentationStorageNode()
+    original = segmentation_node.GetStorageNode()
+    if original is not None:
+        storage.SetUseCompression(original.GetUseCompression())
+    return snapshot, storage
+
+
+def write_snapshot_atomic(snapshot, storage, path):
+    """Write a snapshot_segmentation() result to `path` via a temp file (any thread)."""
+    def write(tmp_path):
+        storage.SetFileName(tmp_path)
+        if not storage.WriteData(snapshot):
+            raise IOError(f"failed to write '{tmp_path}'")
+    write_atomic(path, write)
 
 
 # ---------------------------------------------------------------------------
 # GenericSpecimen: one row (one "specimen") worth of data + Slicer nodes
 # ---------------------------------------------------------------------------
 
-class GenericSpecimen:
-    def __init__(self, key_values, cfg, db_row, preseg_row, study_dir):
-        self.cfg = cfg
-        self.key_columns = cfg["key_columns"]
-        self.key_values = tuple(key_values)
-        self.context = dict(zip(self.key_columns, self.key_values))
-        self.db_info = dict(db_row or {})
-        self.preseg_info = dict(preseg_row or {})
-        self.study_dir = study_dir
+class GenericSpecimen(SpecimenPaths):
+    def __init__(self, key_values, cfg, db_row, preseg_row, study_dir, plan=None):
+        SpecimenPaths.__init__(self, key_values, cfg, db_row, preseg_row, study_dir, plan)
 
         self.node_dict = {}          # logical image name -> volume/labelmap/markups node
         self.writeable = {}          # logical name ("__segmentation__", "__markups__", or image name) -> abs path
@@ -99,113 +206,317 @@ class GenericSpecimen:
         self.row_index = None        # row index in the raw database table
         self.done_col_index = None   # column index in the raw database table
 
-    # ---- identity / paths ----
-
-    @property
-    def key(self):
-        return self.key_values
-
-    @property
-    def label(self):
-        return "-".join(str(v) for v in self.key_values)
-
-    @property
-    def out_dir(self):
-        parts = [str(self.context.get(k, self.db_info.get(k, k))) for k in self.cfg["output_dir_pattern"]]
-        return os.path.join(self.study_dir, *parts)
-
-    def _context(self, extra=None):
-        ctx = dict(self.context)
-        ctx.update(self.db_info)
-        ctx.update(self.preseg_info)
-        if extra:
-            ctx.update(extra)
-        return ctx
-
-    def _to_abs(self, rel):
-        rel = str(rel).replace(2 * os.sep, os.sep)
-        if os.path.isabs(rel):
-            return rel
-        return os.path.join(self.study_dir, rel)
-
-    def markups_out_path(self):
-        lm_cfg = self.cfg["landmarks"]
-        col = lm_cfg.get("csv_column")
-        rel = self.preseg_info.get(col) if col else None
-        if not rel:
-            rel = lm_cfg.get("path_pattern", "{label}-markups.mrk.json").format(
-                **self._context({"label": self.label}))
-        return self._to_abs(rel)
-
-    def segmentation_out_path(self):
-        seg_cfg = self.cfg["segmentation"]
-        return os.path.join(self.out_dir, seg_cfg.get("output_filename", "segment.seg.nrrd"))
+        self.image_cache = None      # optional ImagePrefetcher, set by the logic
+        self.progressive = None      # optional ProgressiveLoader, set by the logic
+        self.disk_cache = None       # optional DiskCache, set by the logic
+        self._proxies = {}           # source path -> volume node still showing the block-mean proxy
+        self._proxy_failed = set()   # source paths whose full resolution read failed (proxy stays)
+        self._cropped = {}           # source path -> volume node holding only the crop_to region
+        self._placeholders = {}      # source path -> (voxel-less volume node, img_cfg) of on_demand / background images
+        self._placeholder_observations = []
+        self._placeholder_sizes = {}  # source path -> decoded bytes (header estimate)
+        self._progressive_timer = None
+        self.timing = NULL_TIMING    # SpanLog when timing is on, set by the logic
+        self.slice_layers = {}       # setSliceViewerLayers kwargs, remembered for re-showing a cached specimen
+        self.profile = "interactive"  # how the last load() ran: "interactive" or "export" (data only)
+        self.dirty = set()           # "__segmentation__" / "__markups__" edited since the last load / save
+        self._edit_observations = []
+
+        self.journal = None          # SegmentJournal (autosave), attached on load
+        self._journal_segments = {}  # segment id -> True if removed, edited since the last autosave
+        self._journal_markups = False
+        self._autosave_timer = None
+        self._hidden_disk_state = None  # mtimes of the saved files when hide() put it in the closed cache
 
     # ---- db table sync ----
 
     def update_done(self, table):
-        if self.row_index is None or self.done_col_index is None:
+        if table is None or self.row_index is None or self.done_col_index is None:
             return
         try:
             self.db_info[self.cfg["done_column"]] = table.GetCellText(self.row_index, self.done_col_index)
         except Exception as e:
             slicer.util.errorDisplay("Failed to update done state: " + str(e))
 
-    # ---- images: dynamic column expansion + defaults/preset/inline merge ----
+    def _load_image_node(self, path, itype, progressive=False, crop=None):
+        image = self.image_cache.take(path) if self.image_cache is not None else None
+        if crop is not None:
+            if image is not None:
+                image = crop_image(image, *crop)
+            else:
+                local = self.disk_cache.local_path(path) if self.disk_cache is not None else path
+                image = read_image_region(local, *crop)
+            node = _volume_node_from_image(image, path, labelmap=(itype == "labelmap"))
+            self._cropped[path] = node
+            return node
+        if image is not None:
+            print(f"[GenericSpecimen] using prefetched '{path}'")
+            return _volume_node_from_image(image, path, labelmap=(itype == "labelmap"))
+        if progressive and self.progressive is not None and self.cfg["progressive_load"].get("enabled"):
+            node = self._load_proxy_node(path, itype)
+            if node is not None:
+                return node
+        return self._read_through(slicer.util.loadLabelVolume if itype == "labelmap" else slicer.util.loadVolume,
+                                  path)
+
+    def _read_through(self, loader, path):
+        """`loader(path)` through the local disk cache. The node's storage
+        keeps pointing at `path`, so everything written goes to the NAS."""
+        local = self.disk_cache.local_path(path) if self.disk_cache is not None else path
+        node = loader(local)
+        if local != path and node is not None and node.GetStorageNode() is not None:
+            node.GetStorageNode().SetFileName(path)
+        return node
+
+    # ---- crop_to (load only the region around a mask) ----
+
+    def _crop_region(self, img_cfg, path):
+        """(index, size) of the crop_to region of image `path`, None when the
+        image is not cropped or the region cannot be determined (then the
+        whole image is loaded)."""
+        crop_cfg = img_cfg.get("crop_to")
+        if not crop_cfg:
+            return None
+        try:
+            mask_path, segment_name = self._crop_mask(crop_cfg)
+            fingerprint = [file_fingerprint(path), file_fingerprint(mask_path), segment_name, crop_cfg]
+            cache = CropBoxCache(os.path.join(self.out_dir, ".crop.json"))
+            region = cache.get(img_cfg["name"], fingerprint)
+            if region is None:
+                local = self.disk_cache.local_path if self.disk_cache is not None else (lambda p: p)
+                corners = mask_box(local(mask_path), segment_name)
+                region = crop_region(corners, local(path), crop_cfg.get("margin_mm", 10)) \
+                    if corners is not None else None
+                if region is None:
+                    print(f"[GenericSpecimen] crop_to mask of '{img_cfg['name']}' is empty, loading it whole")
+                    return None
+                cache.put(img_cfg["name"], fingerprint, *region)
+            return region
+        except Exception as e:
+            print(f"[GenericSpecimen] crop_to of '{img_cfg['name']}' failed, loading it whole: {e}")
+            return None
 
-    def _expand_image_entries(self):
-        """Turn cfg["images"] into a concrete per-specimen job list.
+    def _crop_mask(self, crop_cfg):
+        """(mask file, segment name or None) named by a crop_to config."""
+        if crop_cfg.get("image"):
+            mask_cfg = self.resolved_image_cfg(crop_cfg["image"])
+            if mask_cfg is None:
+                raise KeyError(f"no image '{crop_cfg['image']}'")
+            return self.resolve_image_path(mask_cfg), None
+        name = crop_cfg.get("segment")
+        if not name:
+            raise ValueError("crop_to needs an 'image' or a 'segment'")
+        seg_cfg = self.cfg["segmentation"]
+        seg_def = next((d for d in self.plan.segments if d["name"] == name), None)
+        if seg_def is not None and seg_def.get("source", "file") == "file":
+            source = self.resolve_segment_path(seg_cfg, seg_def)
+            if source and os.path.exists(source):
+                return source, None
+        return self.segmentation_out_path(), name
+
+    def _full_grid_path(self, node):
+        """Source file of `node` if it holds less than its file (a proxy, a
+        crop_to region or no voxels yet), else None."""
+        if node is None:
+            return None
+        for reduced in (self._proxies, self._cropped):
+            for path, reduced_node in reduced.items():
+                if reduced_node is node:
+                    return path
+        for path, (placeholder, _) in self._placeholders.items():
+            if placeholder is node:
+                return path
+        return None
 
-        A normal entry (with "csv_column" or "path_pattern") -> exactly one job.
-        An entry with "pattern" (a regex) -> ZERO OR MORE jobs: one per
-        non-key preseg.csv column whose name matches the regex AND that has a
-        non-empty value for THIS specimen. The job's image name is the
-        column name (optionally with a prefix/suffix stripped). This is how
-        "open as many images as this specimen has, named after their
-        column" works - some specimens can end up with more/fewer images
-        than others.
-        """
-        jobs = []
-        for img_cfg in self.cfg["images"]:
-            pattern = img_cfg.get("pattern")
-            if not pattern:
-                jobs.append(img_cfg)
+    def export_reference_node(self, name):
+        """Reference volume for exporting segments onto image `name`'s grid.
+        None - the segmentation's reference geometry, which is the full grid
+        of that image - while the node holds a proxy or crop_to region."""
+        node = self.node_dict.get(name)
+        return None if self._full_grid_path(node) is not None else node
+
+    def export_reference_grid(self, name):
+        """Grid of image `name` at full resolution - the grid segments are
+        exported onto - None if there is no such image."""
+        node = self.node_dict.get(name)
+        full_path = self._full_grid_path(node)
+        if full_path is not None:
+            return Grid.from_file(full_path)
+        if node is None or node.GetImageData() is None:
+            return None
+        return _volume_grid(node)
+
+    # ---- load policy: on_demand / background images (voxel-less placeholders) ----
+
+    def _add_placeholder(self, path, itype, img_cfg, background=False):
+        """A volume node with the image's name and geometry but no voxels. It is
+        decoded when a slice view or the Volumes module selects it, or - for
+        `background` images - as soon as the background thread has read it."""
+        cls = "vtkMRMLLabelMapVolumeNode" if itype == "labelmap" else "vtkMRMLScalarVolumeNode"
+        node = slicer.mrmlScene.AddNewNodeByClass(cls, slicer.mrmlScene.GenerateUniqueName(node_name_from_path(path)))
+        size, origin, spacing, directions = header_geometry(path)
+        node.SetOrigin(*origin)
+        node.SetSpacing(*spacing)
+        node.SetIJKToRASDirectionMatrix(_direction_matrix(directions))
+        self._placeholders[path] = (node, img_cfg)
+        if not self._placeholder_observations:
+            self._watch_placeholders()
+        if background and self.progressive is not None:
+            self.progressive.request_full(path)
+            self._start_progressive_timer()
+        return node
+
+    def _watch_placeholders(self):
+        self._unwatch_placeholders()
+        observed = list(slicer.util.getNodesByClass("vtkMRMLSliceCompositeNode"))
+        observed.append(slicer.app.applicationLogic().GetSelectionNode())
+        for obj in observed:
+            tag = obj.AddObserver(vtk.vtkCommand.ModifiedEvent, self._on_volume_selected)
+            self._placeholder_observations.append((obj, tag))
+
+    def _unwatch_placeholders(self):
+        for obj, tag in self._placeholder_observations:
+            obj.RemoveObserver(tag)
+        self._placeholder_observations = []
+
+    def _on_volume_selected(self, caller, event):
+        # decode after the selecting code has finished with the node
+        qt.QTimer.singleShot(0, self._load_selected_placeholders)
+
+    def _load_selected_placeholders(self):
+        selected = set()
+        for comp in slicer.util.getNodesByClass("vtkMRMLSliceCompositeNode"):
+            selected.update((comp.GetBackgroundVolumeID(), comp.GetForegroundVolumeID(), comp.GetLabelVolumeID()))
+        selection = slicer.app.applicationLogic().GetSelectionNode()
+        selected.update((selection.GetActiveVolumeID(), selection.GetActiveLabelVolumeID()))
+        for path, (node, _) in list(self._placeholders.items()):
+            if node.GetID() in selected:
+                self.load_placeholder(path)
+
+    def load_placeholder(self, path, image=None):
+        """Decode a placeholder image into its node (main thread). `image`: an
+        already read CachedImage (background load)."""
+        entry = self._placeholders.pop(path, None)
+        if entry is None:
+            return None
+        node, img_cfg = entry
+        if self.progressive is not None:
+            self.progressive.cancel([path])
+        print(f"[GenericSpecimen] loading '{img_cfg['name']}' on demand")
+        with self.timing.span("load.on_demand", self.label):
+            if image is None:
+                image = self.image_cache.take(path) if self.image_cache is not None else None
+            if image is None:
+                image = read_image(self.disk_cache.local_path(path) if self.disk_cache is not None else path)
+            _set_volume_from_image(node, image)
+            node.AddDefaultStorageNode(path)
+            node.CreateDefaultDisplayNodes()
+            if node.IsA("vtkMRMLScalarVolumeNode") and not node.IsA("vtkMRMLLabelMapVolumeNode"):
+                node.GetDisplayNode().AutoWindowLevelOn()
+            self._apply_visual_props(node, img_cfg)
+        if not self._placeholders:
+            self._unwatch_placeholders()
+        return node
+
+    def ensure_loaded(self, node):
+        """Decode `node` now if it is still a placeholder."""
+        for path, (placeholder, _) in list(self._placeholders.items()):
+            if placeholder is node:
+                self.load_placeholder(path)
+
+    def placeholder_bytes(self):
+        """Decoded size of the images not loaded yet (from their headers)."""
+        total = 0
+        for path in self._placeholders:
+            if path not in self._placeholder_sizes:
+                try:
+                    self._placeholder_sizes[path] = estimate_image_bytes(path)
+                except Exception:
+                    self._placeholder_sizes[path] = 0
+            total += self._placeholder_sizes[path]
+        return total
+
+    # ---- progressive load (block-mean proxy first, full resolution in the background) ----
+
+    def _load_proxy_node(self, path, itype):
+        """Show the proxy of `path` and queue the full resolution read. None if
+        the image is too small to bother (the caller loads it normally). If
+        there is no (fresh) proxy yet, the image is read whole now and the
+        proxy for the next time is built from that decoded array in the
+        background, so the file is read once."""
+        pl_cfg = self.cfg["progressive_load"]
+        factor = int(pl_cfg.get("factor", 4))
+        try:
+            if os.path.getsize(path) < float(pl_cfg.get("min_mb", 256)) * 1024 * 1024:
+                return None
+        except OSError:
+            return None
+        proxy = self.progressive.proxy_path(path, factor)
+        labelmap = itype == "labelmap"
+        if not proxy_is_fresh(path, proxy):
+            image = read_image(self.disk_cache.local_path(path) if self.disk_cache is not None else path)
+            self.progressive.request_proxy(path, factor, labelmap, image)
+            return _volume_node_from_image(image, path, labelmap)
+
+        print(f"[GenericSpecimen] showing the 1/{factor} proxy of '{path}' until it is read")
+        node = self._read_through(slicer.util.loadLabelVolume if labelmap else slicer.util.loadVolume, proxy)
+        node.SetName(slicer.mrmlScene.GenerateUniqueName(node_name_from_path(path)))
+        self._proxies[path] = node
+        self.progressive.request_full(path)
+        self._start_progressive_timer()
+        return node
+
+    def _start_progressive_timer(self):
+        if self._progressive_timer is None:
+            self._progressive_timer = qt.QTimer()
+            self._progressive_timer.setInterval(250)
+            self._progressive_timer.connect('timeout()', self._poll_progressive)
+            self._progressive_timer.start()
+
+    def _poll_progressive(self):
+        for path, image, error in self.progressive.poll(list(self._proxies) + list(self._placeholders)):
+            if path in self._placeholders:
+                if error is None:
+                    self.load_placeholder(path, image)
+                else:
+                    print(f"[GenericSpecimen] background load of '{path}' failed ({error}), left on demand")
+                    self._proxy_failed.add(path)
                 continue
-
-            regex = re.compile(pattern)
-            for col, val in self.preseg_info.items():
-                if col in self.key_columns or not val or not regex.match(col):
-                    continue
-
-                name = col
-                strip_prefix = img_cfg.get("strip_prefix")
-                if strip_prefix and name.startswith(strip_prefix):
-                    name = name[len(strip_prefix):]
-                strip_suffix = img_cfg.get("strip_suffix")
-                if strip_suffix and name.endswith(strip_suffix):
-                    name = name[:-len(strip_suffix)]
-
-                virtual_cfg = {k: v for k, v in img_cfg.items()
-                               if k not in ("pattern", "strip_prefix", "strip_suffix")}
-                virtual_cfg["name"] = name
-                virtual_cfg["csv_column"] = col
-                jobs.append(virtual_cfg)
-        return jobs
-
-    def _resolve_image_cfg(self, img_cfg):
-        preset = self.cfg["presets"].get(img_cfg.get("preset"), {}) if img_cfg.get("preset") else {}
-        return _merge(self.cfg["defaults"]["image"], preset, img_cfg)
-
-    def resolve_image_path(self, img_cfg):
-        col = img_cfg.get("csv_column")
-        if col and self.preseg_info.get(col):
-            rel = self.preseg_info[col]
-        elif img_cfg.get("path_pattern"):
-            rel = img_cfg["path_pattern"].format(**self._context({"name": img_cfg.get("name")}))
-        else:
-            raise ValueError(f"Cannot resolve path for image '{img_cfg.get('name')}': "
-                              f"no csv_column value and no path_pattern given")
-        return self._to_abs(rel)
+            node = self._proxies.get(path)
+            if error is not None or node is None or not slicer.mrmlScene.IsNodePresent(node):
+                print(f"[GenericSpecimen] full resolution of '{path}' not loaded ({error}), keeping the proxy")
+                self._proxy_failed.add(path)
+                continue
+            with self.timing.span("load.full_resolution", self.label):
+                _set_volume_from_image(node, image)
+                node.GetStorageNode().SetFileName(path)
+            del self._proxies[path]
+            print(f"[GenericSpecimen] full resolution of '{path}' is in")
+        pending = set(self._proxies) | set(self._placeholders)
+        if not pending - self._proxy_failed and self._progressive_timer is not None:
+            self._progressive_timer.stop()
+            self._progressive_timer = None
+
+    def _stop_progressive(self):
+        if self._progressive_timer is not None:
+            self._progressive_timer.stop()
+            self._progressive_timer = None
+        if self.progressive is not None:
+            self.progressive.cancel(list(self._proxies) + list(self._placeholders))
+        self._proxies = {}
+        self._proxy_failed = set()
+
+    def _bind_reference_geometry(self, seg_node, ref_node):
+        """Reference geometry of the segmentation: the full grid of `ref_node`,
+        also while it holds a proxy or a crop_to region."""
+        full_path = self._full_grid_path(ref_node)
+        if full_path is None:
+            seg_node.SetReferenceImageGeometryParameterFromVolumeNode(ref_node)
+            return
+        converter = slicer.vtkSegmentationConverter
+        seg_node.GetSegmentation().SetConversionParameter(
+            converter.GetReferenceImageGeometryParameterName(),
+            converter.SerializeImageGeometry(_header_image_geometry(full_path)))
 
     def _resolve_color_node(self, name_or_id):
         try:
@@ -253,39 +564,60 @@ class GenericSpecimen:
 
     # ---- segmentation ----
 
-    def _resolve_segment_cfg(self, seg_def):
-        return _merge(self.cfg["defaults"]["segment"], seg_def)
-
-    def resolve_segment_path(self, seg_cfg, seg_def):
-        col = seg_def.get("csv_column")
-        if col and self.preseg_info.get(col):
-            return self._to_abs(self.preseg_info[col])
-        pattern = seg_def.get("path_pattern") or seg_cfg.get("path_pattern")
-        if pattern:
-            rel = pattern.format(**self._context({"segment_name": seg_def["name"]}))
-            return self._to_abs(rel)
-        return None
-
     def _add_empty_segment(self, segmentation_node, name, reference_volume_node, color=None):
+        """Add a segment with an empty extent: it has no voxel buffer until it
+        is painted, and then lives on the segmentation's reference geometry
+        (bound from `reference_volume_node` before the segments are built)."""
         if reference_volume_node is None:
             print(f"[GenericSpecimen] no reference volume, skipping empty segment '{name}'")
             return
-        dummy = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLLabelMapVolumeNode")
-        volumes_logic = slicer.modules.volumes.logic()
-        volumes_logic.CreateLabelVolumeFromVolume(slicer.mrmlScene, dummy, reference_volume_node)
-        
-        dummy.GetImageData().GetPointData().GetScalars().Fill(0)
-        img = slicer.modules.segmentations.logic().CreateOrientedImageDataFromVolumeNode(dummy)
         if color:
-            segment_id = segmentation_node.AddSegmentFromBinaryLabelmapRepresentation(img, name, color)
+            segmentation_node.GetSegmentation().AddEmptySegment("", name, color)
         else:
-            segment_id = segmentation_node.AddSegmentFromBinaryLabelmapRepresentation(img, name)
-            
-        # print(f"Segment '{segment_id}' created.")
-        slicer.mrmlScene.RemoveNode(dummy)
+            segmentation_node.GetSegmentation().AddEmptySegment("", name)
+
+    def _decode_segment_sources(self, seg_cfg):
+        """{segment name: (path, CachedImage or None, error or None)} of every
+        "file" segment whose path resolves; all files are read and
+        decompressed concurrently (segmentation.decode_workers threads)."""
+        paths = {}
+        for seg_def in self.plan.segments:
+            if seg_def.get("source", "file") != "file":
+                continue
+            try:
+                path = self.resolve_segment_path(seg_cfg, seg_def)
+            except Exception:
+                path = None
+            if path is not None:
+                paths[seg_def["name"]] = path
 
-    def _build_segment(self, seg_def, segmentation_node, reference_volume_node):
-        seg_def = self._resolve_segment_cfg(seg_def)
+        def read(path):
+            return read_image(self.disk_cache.local_path(path) if self.disk_cache is not None else path)
+
+        decoded = read_images(paths.values(), reader=read, workers=seg_cfg.get("decode_workers", 8))
+        return {name: (path,) + decoded[path] for name, path in paths.items()}
+
+    def _reference_grid(self, ref_node):
+        """(size (i, j, k), 4x4 IJK -> RAS) of the segmentation's reference grid,
+        None without a reference image."""
+        if ref_node is None:
+            return None
+        full_path = self._full_grid_path(ref_node)
+        if full_path is not None:
+            size, origin, spacing, directions = header_geometry(full_path)
+            matrix = [[directions[r][c] * spacing[c] for c in range(3)] + [origin[r]] for r in range(3)]
+            return size, matrix + [[0.0, 0.0, 0.0, 1.0]]
+        if ref_node.GetImageData() is None:
+            return None
+        matrix = vtk.vtkMatrix4x4()
+        ref_node.GetIJKToRASMatrix(matrix)
+        return (list(ref_node.GetImageData().GetDimensions()),
+                [[matrix.GetElement(r, c) for c in range(4)] for r in range(4)])
+
+    def _build_segment(self, seg_def, segmentation_node, reference_volume_node, decoded, grid):
+        """`seg_def` is a StudyPlan segment (already merged with defaults.segment);
+        `decoded` the _decode_segment_sources result of the whole plan (decoded
+        once per load), `grid` the _reference_grid or None."""
         name = seg_def["name"]
         color = seg_def.get("color")
         source = seg_def.get("source", "file")   # "file" (default) | "empty"
@@ -294,28 +626,26 @@ class GenericSpecimen:
             self._add_empty_segment(segmentation_node, name, reference_volume_node, color)
             return
 
-        try:
-            path = self.resolve_segment_path(self.cfg["segmentation"], seg_def)
-        except Exception:
-            path = None
-
-        if path is None:
+        if name not in decoded:
             print(f"[GenericSpecimen] segment '{name}': source is 'file' but no path could be resolved, "
                   f"creating empty segment instead")
             self._add_empty_segment(segmentation_node, name, reference_volume_node, color)
             return
 
-        try:
-            mask_node = slicer.util.loadLabelVolume(path)
-            img = slicer.modules.segmentations.logic().CreateOrientedImageDataFromVolumeNode(mask_node)
-            if color:
-                segmentation_node.AddSegmentFromBinaryLabelmapRepresentation(img, name, color)
-            else:
-                segmentation_node.AddSegmentFromBinaryLabelmapRepresentation(img, name)
-            slicer.mrmlScene.RemoveNode(mask_node)
-        except Exception:
-            print(f"[GenericSpecimen] unable to load segment image '{path}', creating empty segment '{name}'")
+        path, image, error = decoded[name]
+        if error is not None:
+            print(f"[GenericSpecimen] unable to load segment image '{path}' ({error}), creating empty segment '{name}'")
             self._add_empty_segment(segmentation_node, name, reference_volume_node, color)
+            return
+        if grid is not None and not same_grid(image, *grid):
+            print(f"[GenericSpecimen] segment '{name}': '{path}' is not on the reference image's grid, "
+                  f"resampling it (nearest neighbour)")
+            image = resample_to_grid(image, *grid)
+        img = _oriented_image_from_cached(image)
+        if color:
+            segmentation_node.AddSegmentFromBinaryLabelmapRepresentation(img, name, color)
+        else:
+            segmentation_node.AddSegmentFromBinaryLabelmapRepresentation(img, name)
 
     def _load_segmentation(self, seg_cfg):
         out_path = self.segmentation_out_path()
@@ -324,18 +654,26 @@ class GenericSpecimen:
 
         if os.path.exists(out_path):
             print("[GenericSpecimen] loading existing segmentation...")
-            seg_node = slicer.util.loadSegmentation(out_path)
+            seg_node = self._read_through(slicer.util.loadSegmentation, out_path)
             if ref_node is not None:
-                seg_node.SetReferenceImageGeometryParameterFromVolumeNode(ref_node)
+                self._bind_reference_geometry(seg_node, ref_node)
         else:
             print("[GenericSpecimen] initializing new segmentation...")
             seg_node = slicer.vtkMRMLSegmentationNode()
             slicer.mrmlScene.AddNode(seg_node)
             seg_node.CreateDefaultDisplayNodes()
             if ref_node is not None:
-                seg_node.SetReferenceImageGeometryParameterFromVolumeNode(ref_node)
-            for seg_def in seg_cfg.get("segments", []):
-                self._build_segment(seg_def, seg_node, ref_node)
+                self._bind_reference_geometry(seg_node, ref_node)
+            with self.timing.span("load.segmentation.decode", self.label):
+                decoded = self._decode_segment_sources(seg_cfg)
+            grid = self._reference_grid(ref_node)
+            # one batch of scene events for the whole import
+            was_modifying = seg_node.StartModify()
+            try:
+                for seg_def in self.plan.segments:
+                    self._build_segment(seg_def, seg_node, ref_node, decoded, grid)
+            finally:
+                seg_node.EndModify(was_modifying)
 
         # seg_node.GetDisplayNode().SetOpacity(seg_cfg.get("opacity", 0.5))
         self.segmentation_node = seg_node
@@ -346,7 +684,7 @@ class GenericSpecimen:
     def _load_landmarks(self, lm_cfg):
         m_path = self.markups_out_path()
         try:
-            m_node = slicer.util.loadMarkups(m_path)
+            m_node = self._read_through(slicer.util.loadMarkups, m_path)
         except Exception:
             print(f"[GenericSpecimen] markups not found at '{m_path}', creating a new fiducial list")
             m_node = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLMarkupsFiducialNode", f"{self.label}-markups")
@@ -360,22 +698,86 @@ class GenericSpecimen:
 
     # ---- load / save / close ----
 
-    def load(self):
+    def load(self, ask_replay=None, profile="interactive"):
+        """Load every node of this specimen and show it.
+
+        If an autosave journal from an earlier (crashed) session exists,
+        `ask_replay(text)` decides whether to replay it (True) or discard it
+        (False). Without `ask_replay` the journal is left alone.
+
+        profile="export" loads data only (see load_for_export).
+        """
+        if profile == "export":
+            self.load_for_export()
+            return
         print(f"[GenericSpecimen] loading {self.label}")
-        
+        self.profile = "interactive"
+
+        with self.timing.span("load", self.label):
+            with self.timing.span("load.images", self.label):
+                self._load_images()
+
+            seg_cfg = self.cfg["segmentation"]
+            if seg_cfg.get("enabled"):
+                with self.timing.span("load.segmentation", self.label):
+                    self._load_segmentation(seg_cfg)
+
+            lm_cfg = self.cfg["landmarks"]
+            if lm_cfg.get("enabled"):
+                with self.timing.span("load.landmarks", self.label):
+                    self._load_landmarks(lm_cfg)
+
+            self._watch_edits()
+            with self.timing.span("load.journal", self.label):
+                self._recover_journal(ask_replay)
+            self._start_autosave()
+            self._show()
+
+    def load_for_export(self):
+        """Data-only load for batch export and other non-interactive use: the
+        reference image(s) and the segmentation if segments are exported, the
+        markups if markups are. Images are read whole (no proxy, no crop_to);
+        no edit tracking, journal, autosave, segment editor, slice layers,
+        workplace or volume rendering."""
+        print(f"[GenericSpecimen] loading {self.label} (export)")
+        self.profile = "export"
+        be_cfg = self.cfg.get("batch_export", {})
+
+        with self.timing.span("load.export", self.label):
+            seg_cfg = self.cfg["segmentation"]
+            if be_cfg.get("export_segments") and seg_cfg.get("enabled"):
+                ref_names = {be_cfg.get("reference_image"), seg_cfg.get("reference_image")} - {None}
+                self._load_images(only=ref_names, reduced=False)
+                self._load_segmentation(seg_cfg)
+
+            lm_cfg = self.cfg["landmarks"]
+            if be_cfg.get("export_markups") and lm_cfg.get("enabled"):
+                self._load_landmarks(lm_cfg)
+
+    def _load_images(self, only=None, reduced=True):
+        """Load the images (those named in `only`, if given). `reduced`=False
+        reads them whole even if they have progressive_load / crop_to."""
         background_node = None
         label_node, label_opacity = None, None
         foreground_node, foreground_opacity = None, None
 
-        for raw_img_cfg in self._expand_image_entries():
-            img_cfg = self._resolve_image_cfg(raw_img_cfg)
+        for img_cfg in self.image_jobs():
             name = img_cfg["name"]
+            if only is not None and name not in only:
+                continue
             required = img_cfg.get("required", False)
             itype = img_cfg.get("type", "volume")
 
             try:
                 path = self.resolve_image_path(img_cfg)
-                node = slicer.util.loadLabelVolume(path) if itype == "labelmap" else slicer.util.loadVolume(path)
+                policy = img_cfg.get("load", "eager")
+                if reduced and policy in ("on_demand", "background") and not img_cfg.get("role"):
+                    node = self._add_placeholder(path, itype, img_cfg, background=(policy == "background"))
+                elif reduced:
+                    node = self._load_image_node(path, itype, img_cfg.get("progressive", True),
+                                                 self._crop_region(img_cfg, path))
+                else:
+                    node = self._load_image_node(path, itype)
             except Exception as e:
                 if required:
                     raise
@@ -383,8 +785,10 @@ class GenericSpecimen:
                 continue
 
             self.node_dict[name] = node
-            self.writeable[name] = path
-            self._apply_visual_props(node, img_cfg)
+            if path not in self._cropped:    # never save a crop_to region over the whole image
+                self.writeable[name] = path
+            if path not in self._placeholders:
+                self._apply_visual_props(node, img_cfg)
             opacity = img_cfg.get("opacity")
 
             role = img_cfg.get("role")
@@ -408,25 +812,173 @@ class GenericSpecimen:
         if foreground_node is not None:
             slice_kwargs["foreground"] = foreground_node
             slice_kwargs["foregroundOpacity"] = foreground_opacity if foreground_opacity is not None else 0.5
-        if slice_kwargs:
-            slicer.util.setSliceViewerLayers(**slice_kwargs)
+        self.slice_layers = slice_kwargs
 
-        seg_cfg = self.cfg["segmentation"]
-        if seg_cfg.get("enabled"):
-            self._load_segmentation(seg_cfg)
-            self._configure_segment_editor()
+    def _show(self):
+        """Everything that puts the loaded nodes on screen (slice layers, segment
+        editor, workplace tweaks, volume rendering)."""
+        if self.slice_layers:
+            with self.timing.span("show.slice_layers", self.label):
+                slicer.util.setSliceViewerLayers(**self.slice_layers)
 
-        lm_cfg = self.cfg["landmarks"]
-        if lm_cfg.get("enabled"):
-            self._load_landmarks(lm_cfg)
+        if self.segmentation_node is not None:
+            with self.timing.span("show.segment_editor", self.label):
+                self._configure_segment_editor()
 
-        self._customize_workplace()
+        with self.timing.span("show.workplace", self.label):
+            self._customize_workplace()
 
         vr_cfg = self.cfg["volume_rendering"]
         if vr_cfg.get("enabled"):
-            self._start_volume_rendering(vr_cfg)
-        
-        
+            with self.timing.span("show.volume_rendering", self.label):
+                self._start_volume_rendering(vr_cfg)
+
+    # ---- edit tracking (what changed since the last load / save) ----
+
+    def _watch_edits(self):
+        self._unwatch_edits()
+        self.dirty = set()
+        if self.segmentation_node is not None:
+            seg = self.segmentation_node.GetSegmentation()
+            events = [slicer.vtkSegmentation.SegmentAdded, slicer.vtkSegmentation.SegmentRemoved,
+                      slicer.vtkSegmentation.SegmentModified]
+            # SourceRepresentationModified was called MasterRepresentationModified before Slicer 5.4
+            events.append(getattr(slicer.vtkSegmentation, "SourceRepresentationModified",
+                                  getattr(slicer.vtkSegmentation, "MasterRepresentationModified", None)))
+            for event in events:
+                if event is not None:
+                    tag = seg.AddObserver(event, self._on_segment_edited)
+                    self._edit_observations.append((seg, tag))
+            tag = seg.AddObserver(slicer.vtkSegmentation.SegmentRemoved, self._on_segment_removed)
+            self._edit_observations.append((seg, tag))
+        if self.markups_node is not None:
+            for event in (slicer.vtkMRMLMarkupsNode.PointAddedEvent, slicer.vtkMRMLMarkupsNode.PointRemovedEvent,
+                          slicer.vtkMRMLMarkupsNode.PointModifiedEvent):
+                tag = self.markups_node.AddObserver(event, self._on_markups_edited)
+                self._edit_observations.append((self.markups_node, tag))
+        self._journal_segments = {}
+        self._journal_markups = False
+
+    @vtk.calldata_type(vtk.VTK_STRING)
+    def _on_segment_edited(self, caller, event, segment_id=None):
+        self.dirty.add("__segmentation__")
+        if segment_id:
+            self._journal_segments[segment_id] = False
+        else:
+            # no segment id passed: the whole segmentation changed
+            for sid in caller.GetSegmentIDs():
+                self._journal_segments.setdefault(sid, False)
+
+    @vtk.calldata_type(vtk.VTK_STRING)
+    def _on_segment_removed(self, caller, event, segment_id=None):
+        self.dirty.add("__segmentation__")
+        if segment_id:
+            self._journal_segments[segment_id] = True
+
+    def _on_markups_edited(self, caller, event):
+        self.dirty.add("__markups__")
+        self._journal_markups = True
+
+    # ---- autosave journal ----
+
+    def _start_autosave(self):
+        as_cfg = self.cfg.get("autosave", {})
+        if not as_cfg.get("enabled") or self._autosave_timer is not None:
+            return
+        self._autosave_timer = qt.QTimer()
+        self._autosave_timer.setInterval(int(float(as_cfg.get("interval_s", 60)) * 1000))
+        self._autosave_timer.connect('timeout()', self.write_journal)
+        self._autosave_timer.start()
+
+    def _stop_autosave(self):
+        if self._autosave_timer is not None:
+            self._autosave_timer.stop()
+            self._autosave_timer = None
+
+    def _discard_journal(self):
+        """Edits are being thrown away on purpose (close / hide without saving)."""
+        self._stop_autosave()
+        if self.journal is not None:
+            self.journal.clear()
+            self.journal = None
+        self._journal_segments = {}
+        self._journal_markups = False
+
+    def write_journal(self):
+        """Autosave tick: journal the segments and markups edited since the last tick."""
+        if not self._journal_segments and not self._journal_markups:
+            return
+        if self.journal is None:
+            self.journal = SegmentJournal(self.autosave_dir())
+        try:
+            if self.segmentation_node is not None:
+                seg = self.segmentation_node.GetSegmentation()
+                for segment_id, removed in list(self._journal_segments.items()):
+                    segment = seg.GetSegment(segment_id)
+                    if removed or segment is None:
+                        self.journal.remove_segment(segment_id)
+                        continue
+                    mask = _segment_mask(segment)
+                    if mask is not None:
+                        self.journal.write_segment(segment_id, segment.GetName(), segment.GetColor(), *mask)
+            if self._journal_markups and self.markups_node is not None:
+                self.journal.write_markups(lambda tmp_path: _write_node_to(self.markups_node, tmp_path))
+        except Exception as e:
+            print(f"[GenericSpecimen] autosave of {self.label} failed, retrying at the next interval: {e}")
+            return
+        self._journal_segments = {}
+        self._journal_markups = False
+
+    def _recover_journal(self, ask_replay):
+        if ask_replay is None or not os.path.isdir(self.autosave_dir()):
+            return
+        journal = SegmentJournal(self.autosave_dir())
+        if not journal.has_entries():
+            return
+        self.journal = journal
+        if not ask_replay(f"{self.label} has autosaved edits that were never saved "
+                          f"({journal.summary()}).\n\nRestore them?"):
+            print(f"[GenericSpecimen] discarding the autosave journal of {self.label}")
+            journal.clear()
+            return
+
+        print(f"[GenericSpecimen] replaying the autosave journal of {self.label}")
+        if self.segmentation_node is not None:
+            seg = self.segmentation_node.GetSegmentation()
+            for segment_id in journal.removed_segments():
+                if seg.GetSegment(segment_id) is not None:
+                    seg.RemoveSegment(segment_id)
+            for segment_id, name, color, mask, extent, ijk_to_ras in journal.segments():
+                if seg.GetSegment(segment_id) is None:
+                    if color:
+                        seg.AddEmptySegment(segment_id, name, color)
+                    else:
+                        seg.AddEmptySegment(segment_id, name)
+                slicer.vtkSlicerSegmentationsModuleLogic.SetBinaryLabelmapToSegment(
+                    _oriented_image_from_array(mask, extent, ijk_to_ras), self.segmentation_node, segment_id,
+                    slicer.vtkSlicerSegmentationsModuleLogic.MODE_REPLACE)
+
+        markups_path = journal.markups_path()
+        if markups_path and self.markups_node is not None:
+            journaled = slicer.util.loadMarkups(markups_path)
+            self.markups_node.RemoveAllControlPoints()
+            position = [0.0, 0.0, 0.0]
+            for i in range(journaled.GetNumberOfControlPoints()):
+                journaled.GetNthControlPointPosition(i, position)
+                n = self.markups_node.AddControlPoint(position, journaled.GetNthControlPointLabel(i))
+                self.markups_node.SetNthControlPointDescription(n, journaled.GetNthControlPointDescription(i))
+                self.markups_node.SetNthControlPointPositionStatus(n, journaled.GetNthControlPointPositionStatus(i))
+            slicer.mrmlScene.RemoveNode(journaled)
+
+        # replayed content is unsaved, but already journaled
+        self._journal_segments = {}
+        self._journal_markups = False
+
+    def _unwatch_edits(self):
+        for obj, tag in self._edit_observations:
+            obj.RemoveObserver(tag)
+        self._edit_observations = []
+
     def _configure_segment_editor(self):
         se_cfg = self.cfg.get("segment_editor", {})
 
@@ -532,6 +1084,7 @@ class GenericSpecimen:
         if src_node is None:
             print(f"[GenericSpecimen] volume rendering source '{vr_cfg.get('source_image')}' not loaded, skipping")
             return
+        self.ensure_loaded(src_node)
 
         logic = slicer.modules.volumerendering.logic()
         displayNode = logic.CreateVolumeRenderingDisplayNode()
@@ -574,16 +1127,28 @@ class GenericSpecimen:
 
     # ---- save / close ----
 
-    def save(self):
+    def save(self, writer=None):
+        """Write every writeable node; each file is replaced atomically (temp file + rename).
+
+        With a BackgroundWriter (save.async), the segmentation is snapshotted
+        (deep copy, detached from the scene) and written on the writer's
+        thread; markups and images are small and written right away.
+        Autosave journal entries covered by this save are dropped once the
+        files are on disk.
+        """
         print(f"[GenericSpecimen] saving {self.label}")
+        with self.timing.span("save", self.label):
+            self._save(writer)
+
+    def _save(self, writer):
         if not os.path.isdir(self.out_dir):
             os.makedirs(self.out_dir, exist_ok=True)
 
-        for logical_name, path in self.writeable.items():
-            out_dir = os.path.dirname(path)
-            if out_dir and not os.path.isdir(out_dir):
-                os.makedirs(out_dir, exist_ok=True)
+        journal = self.journal
+        journal_seq = journal.seq if journal is not None else None
+        async_segmentation = False
 
+        for logical_name, path in self.writeable.items():
             if logical_name == "__segmentation__":
                 node = self.segmentation_node
             elif logical_name == "__markups__":
@@ -593,18 +1158,38 @@ class GenericSpecimen:
 
             if node is None:
                 continue
+            if node in self._proxies.values():
+                print(f"[GenericSpecimen] '{logical_name}' is still the low resolution proxy, not saved")
+                continue
+            if any(node is placeholder for placeholder, _ in self._placeholders.values()):
+                continue        # never loaded, nothing to save
+
+            phase = {"__segmentation__": "save.segmentation", "__markups__": "save.markups"}.get(logical_name,
+                                                                                                   "save.image")
+            if writer is not None and logical_name == "__segmentation__":
+                with self.timing.span("save.snapshot", self.label):
+                    snapshot, storage = snapshot_segmentation(self.segmentation_node)
+                timing, label = self.timing, self.label
+
+                def write_snapshot(snapshot=snapshot, storage=storage, path=path):
+                    with timing.span("save.segmentation.background", label):
+                        write_snapshot_atomic(snapshot, storage, path)
+                    if journal is not None:
+                        journal.clear(journal_seq)
+
+                writer.submit((self.label, logical_name), write_snapshot, f"{self.label} segmentation")
+                async_segmentation = True
+                continue
+            with self.timing.span(phase, self.label):
+                _write_node_atomic(node, path)
 
-            storage = node.CreateDefaultStorageNode()
-            storage.SetFileName(path)
-            storage.WriteData(node)
-
-    def close(self):
-        if slicer.mrmlScene.IsClosing():
-            print("[GenericSpecimen] scene is closing, skip cleanup")
-            return
+        if journal is not None and not async_segmentation:
+            journal.clear(journal_seq)
+        self.dirty = set()
+        self._journal_segments = {}
+        self._journal_markups = False
 
-        print(f"[GenericSpecimen] closing {self.label}")
-        
+    def _remove_volume_rendering(self):
         if self.volume_rendering_node and slicer.mrmlScene.IsNodePresent(self.volume_rendering_node):
             slicer.mrmlScene.RemoveNode(self.volume_rendering_node)
         self.volume_rendering_node = None
@@ -614,21 +1199,264 @@ class GenericSpecimen:
                 slicer.mrmlScene.RemoveNode(roi)
         self.volume_rendering_roi = []
 
-        all_nodes = list(self.node_dict.values())
-        if self.segmentation_node is not None and self.segmentation_node not in all_nodes:
-            all_nodes.append(self.segmentation_node)
-                      
-        for node in all_nodes:
+    def close(self):
+        if slicer.mrmlScene.IsClosing():
+            print("[GenericSpecimen] scene is closing, skip cleanup")
+            return
+
+        print(f"[GenericSpecimen] closing {self.label}")
+
+        with self.timing.span("close", self.label):
+            self._stop_progressive()
+            self._unwatch_placeholders()
+            self._placeholders = {}
+            self._cropped = {}
+            self._discard_journal()
+            self._unwatch_edits()
+            self._remove_volume_rendering()
+
+            all_nodes = list(self.node_dict.values())
+            if self.segmentation_node is not None and self.segmentation_node not in all_nodes:
+                all_nodes.append(self.segmentation_node)
+
+            for node in all_nodes:
+                try:
+                    if node and slicer.mrmlScene.IsNodePresent(node):
+                        slicer.mrmlScene.RemoveNode(node)
+                except Exception:
+                    pass
+
+            self.node_dict = {}
+            self.segmentation_node = None
+            self.markups_node = None
+
+    # ---- hide / restore (closed-specimen cache) ----
+
+    def _drop_node(self, node):
+        if node is not None and slicer.mrmlScene.IsNodePresent(node):
+            slicer.mrmlScene.RemoveNode(node)
+
+    def hide(self):
+        """Take the specimen off screen but keep its nodes in the scene.
+
+        Segmentation / markups with unsaved edits are removed (exactly as
+        close() would), so a later restore() reloads them from disk instead of
+        resurrecting edits the user chose not to save. Returns False if
+        nothing was kept.
+        """
+        print(f"[GenericSpecimen] hiding {self.label}")
+        self._hidden_disk_state = self._disk_state()
+        self._unwatch_placeholders()
+        self._discard_journal()
+        self._remove_volume_rendering()
+
+        if "__segmentation__" in self.dirty:
+            self._drop_node(self.segmentation_node)
+            self.segmentation_node = None
+        if "__markups__" in self.dirty:
+            self._drop_node(self.markups_node)
+            self.node_dict.pop("__markups__", None)
+            self.markups_node = None
+        self._watch_edits()
+
+        for node in (self.segmentation_node, self.markups_node):
+            if node is not None and node.GetDisplayNode():
+                node.GetDisplayNode().SetVisibility(False)
+        slicer.util.setSliceViewerLayers(background=None, foreground=None, label=None)
+
+        return bool(self.node_dict) or self.segmentation_node is not None
+
+    def restore(self):
+        """Inverse of hide(): reload whatever hide() dropped, then show again."""
+        print(f"[GenericSpecimen] restoring {self.label} from the closed-specimen cache")
+        with self.timing.span("restore", self.label):
+            seg_cfg = self.cfg["segmentation"]
+            if seg_cfg.get("enabled") and self.segmentation_node is None:
+                self._load_segmentation(seg_cfg)
+            lm_cfg = self.cfg["landmarks"]
+            if lm_cfg.get("enabled") and self.markups_node is None:
+                self._load_landmarks(lm_cfg)
+            self._watch_edits()
+            self._start_autosave()
+            if self._placeholders:
+                self._watch_placeholders()
+            self._hidden_disk_state = None
+
+            for node in (self.segmentation_node, self.markups_node):
+                if node is not None and node.GetDisplayNode():
+                    node.GetDisplayNode().SetVisibility(True)
+            self._show()
+
+    def _disk_state(self):
+        state = {}
+        for path in (self.segmentation_out_path(), self.markups_out_path()):
             try:
-                if node and slicer.mrmlScene.IsNodePresent(node):
-                    slicer.mrmlScene.RemoveNode(node)
-            except Exception:
-                pass
+                state[path] = os.stat(path).st_mtime_ns
+            except OSError:
+                state[path] = None
+        return state
+
+    def changed_on_disk(self):
+        """True if the saved segmentation / markups changed since hide() (e.g.
+        another workstation saved this specimen while it sat in the cache)."""
+        return self._hidden_disk_state is not None and self._disk_state() != self._hidden_disk_state
+
+    def memory_bytes(self):
+        """Approximate memory held by this specimen's image data."""
+        kib = 0
+        for node in self.node_dict.values():
+            image_data = node.GetImageData() if hasattr(node, "GetImageData") else None
+            if image_data is not None:
+                kib += image_data.GetActualMemorySize()
+        if self.segmentation_node is not None:
+            seg = self.segmentation_node.GetSegmentation()
+            for i in range(seg.GetNumberOfLayers()):
+                layer = seg.GetLayerDataObject(i)
+                if layer is not None:
+                    kib += layer.GetActualMemorySize()
+        return kib * 1024
+
+
+# ---------------------------------------------------------------------------
+# StorageNodeIndex: file path -> loaded node, without scanning the scene
+# ---------------------------------------------------------------------------
+
+class StorageNodeIndex:
+    """Index of the scene's storable nodes by their storage node's file name.
+
+    The scene is scanned once, on construction. After that NodeAdded /
+    NodeRemoved observers keep the index current, and a ModifiedEvent
+    observer on every storable node catches a storage node being attached
+    after the node was added (that is how the IO manager loads files). The
+    index is rebuilt after a scene close. `get()` re-checks the hit, so a
+    stale entry can only cause a miss, never a wrong node.
+    """
+
+    def __init__(self, scene):
+        self._scene = scene
+        self._by_path = {}        # file name -> {node ID}
+        self._path_of = {}        # node ID -> file name
+        self._node_tags = {}      # node ID -> (node, ModifiedEvent observer tag)
+        self._scene_tags = [
+            scene.AddObserver(scene.NodeAddedEvent, self._on_node_added),
+            scene.AddObserver(scene.NodeRemovedEvent, self._on_node_removed),
+            scene.AddObserver(scene.EndCloseEvent, lambda caller, event: self._rebuild()),
+        ]
+        self._rebuild()
+
+    def get(self, path):
+        """The storable node whose storage node reads/writes `path`, or None."""
+        for node_id in list(self._by_path.get(path, ())):
+            node = self._scene.GetNodeByID(node_id)
+            storage = node.GetStorageNode() if node is not None else None
+            if storage is not None and storage.GetFileName() == path:
+                return node
+        return None
+
+    def close(self):
+        for tag in self._scene_tags:
+            self._scene.RemoveObserver(tag)
+        self._scene_tags = []
+        self._clear()
+
+    def _clear(self):
+        for node, tag in self._node_tags.values():
+            node.RemoveObserver(tag)
+        self._by_path = {}
+        self._path_of = {}
+        self._node_tags = {}
+
+    def _rebuild(self):
+        self._clear()
+        for node in slicer.util.getNodesByClass("vtkMRMLStorableNode"):
+            self._track(node)
+
+    def _track(self, node):
+        node_id = node.GetID()
+        if node_id in self._node_tags:
+            return
+        self._node_tags[node_id] = (node, node.AddObserver(vtk.vtkCommand.ModifiedEvent, self._on_node_modified))
+        self._update(node)
+
+    def _update(self, node):
+        node_id = node.GetID()
+        storage = node.GetStorageNode()
+        path = storage.GetFileName() if storage is not None else None
+        old_path = self._path_of.get(node_id)
+        if old_path == path:
+            return
+        if old_path is not None:
+            self._by_path.get(old_path, set()).discard(node_id)
+        if path:
+            self._path_of[node_id] = path
+            self._by_path.setdefault(path, set()).add(node_id)
+        else:
+            self._path_of.pop(node_id, None)
+
+    def _forget(self, node_id):
+        node_tag = self._node_tags.pop(node_id, None)
+        if node_tag is not None:
+            node_tag[0].RemoveObserver(node_tag[1])
+        path = self._path_of.pop(node_id, None)
+        if path is not None:
+            self._by_path.get(path, set()).discard(node_id)
+
+    @vtk.calldata_type(vtk.VTK_OBJECT)
+    def _on_node_added(self, caller, event, node):
+        if node is not None and node.IsA("vtkMRMLStorableNode"):
+            self._track(node)
+
+    @vtk.calldata_type(vtk.VTK_OBJECT)
+    def _on_node_removed(self, caller, event, node):
+        if node is not None and node.IsA("vtkMRMLStorableNode"):
+            self._forget(node.GetID())
+
+    def _on_node_modified(self, caller, event):
+        self._update(caller)
+
+
+class ClosedSpecimenCache:
+    """LRU of recently closed specimens whose nodes stay (hidden) in the scene.
+
+    Bounded both by count and by bytes (GenericSpecimen.memory_bytes); the
+    least recently closed specimen is evicted first and really closed.
+    """
+
+    def __init__(self, max_specimens, budget_bytes):
+        self.max_specimens = int(max_specimens)
+        self.budget_bytes = int(budget_bytes)
+        self._entries = collections.OrderedDict()   # key -> (specimen, nbytes)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def put(self, specimen):
+        if not specimen.hide():
+            specimen.close()
+            return
+        self._entries[specimen.key] = (specimen, specimen.memory_bytes())
+        self._entries.move_to_end(specimen.key)
+        self._evict()
+
+    def pop(self, key):
+        entry = self._entries.pop(key, None)
+        return entry[0] if entry else None
+
+    def memory_bytes(self):
+        return sum(n for _, n in self._entries.values())
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_specimens
+                                 or sum(n for _, n in self._entries.values()) > self.budget_bytes):
+            _, (specimen, _) = self._entries.popitem(last=False)
+            specimen.close()
+
+    def clear(self, remove_nodes=True):
+        entries, self._entries = self._entries, collections.OrderedDict()
+        if remove_nodes:
+            for specimen, _ in entries.values():
+                specimen.close()
 
-        self.node_dict = {}
-        self.segmentation_node = None
-        self.markups_node = None
-        
 
 # ---------------------------------------------------------------------------
 # GenericSpecimenManagerLogic
@@ -645,15 +1473,146 @@ class GenericSpecimenManagerLogic(ScriptedLoadableModuleLogic):
         self.dbDictList = []
         self.presegDictList = []
         self.dbColumnNames = []      # raw, ordered database.csv column names (for name-based cell write-back)
+        self.presegColumnNames = []
+        self.config_path = None
+        self._config_mtime_ns = None
+        self.plan = None             # StudyPlan of cfg + preseg columns, recompiled when config.json changes
         self.specimens = {}
+        self.duplicate_keys = {}
+        self._joined_rows = {}       # key -> (db_row, preseg_row) as read, for incremental re-initialize
         self.active_specimen = None
         self.default_config_path = None   # set by the wrapper module before use
+        self.prefetcher = None
+        self.progressive = None           # ProgressiveLoader when progressive_load is on
+        self.disk_cache = None            # DiskCache when disk_cache is on
+        self.closed_cache = None
+        self.save_writer = None           # BackgroundWriter when save.async is on
+        self._node_index = None           # StorageNodeIndex, created on first use
+        self.study_db = None              # StudyDatabase when database.backend is "sqlite"
+        self.leases = None                # LeaseManager when leasing is on
+        self.timing = NULL_TIMING         # SpanLog when timing is on
+        self._lease_timer = None
+        self.table_order = []             # keys in the order the widget shows them (prefetch order)
 
     def load_config(self, config_path):
+        mtime = config_mtime(config_path)
         self.cfg = load_config(config_path)
+        self.config_path = config_path
+        self._config_mtime_ns = mtime
+        self.plan = None
         self.study_dir = self.cfg["study_dir"]
+        self._setup_disk_cache()
+        self._setup_prefetcher()
+        self._setup_progressive()
+        self._setup_closed_cache()
+        self._setup_save_writer()
+        self._setup_study_db()
+        self._setup_leases()
+        self._setup_timing()
         return self.cfg
 
+    # ---- local disk cache ----
+
+    def _setup_disk_cache(self):
+        self.shutdown_disk_cache()
+        dc_cfg = self.cfg["disk_cache"]
+        if dc_cfg.get("enabled"):
+            cache_dir = os.path.expanduser(dc_cfg.get("dir", "~/.cache/GenericSpecimenManager"))
+            budget = float(dc_cfg.get("budget_gb", 50)) * 1024 ** 3
+            try:
+                self.disk_cache = DiskCache(cache_dir, budget)
+            except OSError as e:
+                print(f"[GenericSpecimenManager] disk cache '{cache_dir}' not usable, reading from the study dir: {e}")
+
+    def shutdown_disk_cache(self):
+        if self.disk_cache is not None:
+            self.disk_cache.shutdown()
+            self.disk_cache = None
+
+    def _read_image(self, path):
+        """read_image for the background loaders, through the disk cache."""
+        return read_image(self.disk_cache.local_path(path) if self.disk_cache is not None else path)
+
+    def warm_disk_cache(self, order=None):
+        """Copy the files of the not-done specimens (table order) to the disk
+        cache in the background, the active one excluded."""
+        if self.disk_cache is None or not self.cfg["disk_cache"].get("warm", True):
+            return
+        done_col = self.cfg["done_column"]
+        active_key = self.active_specimen.key if self.active_specimen is not None else None
+        paths = []
+        for key in order or self.table_order or sorted(self.specimens):
+            specimen = self.specimens.get(key)
+            if specimen is None or key == active_key or specimen.db_info.get(done_col) == "1":
+                continue
+            paths.extend(specimen.cache_paths())
+        self.disk_cache.warm(paths)
+
+    # ---- background prefetch ----
+
+    def _setup_prefetcher(self):
+        self.shutdown_prefetcher()
+        pf_cfg = self.cfg.get("prefetch", {})
+        if pf_cfg.get("enabled"):
+            budget = int(pf_cfg.get("memory_budget_mb", 2048)) * 1024 * 1024
+            self.prefetcher = ImagePrefetcher(budget, reader=self._read_image)
+
+    def shutdown_prefetcher(self):
+        if self.prefetcher is not None:
+            self.prefetcher.shutdown()
+            self.prefetcher = None
+
+    # ---- progressive load ----
+
+    def _setup_progressive(self):
+        # one idle thread; also reads the images with "load": "background"
+        self.shutdown_progressive()
+        self.progressive = ProgressiveLoader(reader=self._read_image, proxy_dir=self._proxy_dir())
+
+    def _proxy_dir(self):
+        """progressive_load.proxy_dir (relative to study_dir), else a folder of
+        the local disk cache, else None (PROXY_DIR next to each image)."""
+        proxy_dir = self.cfg["progressive_load"].get("proxy_dir")
+        if proxy_dir:
+            return self._abs_path(os.path.expanduser(proxy_dir))
+        if self.disk_cache is not None:
+            return os.path.join(self.disk_cache.cache_dir, PROXY_DIR)
+        return None
+
+    def shutdown_progressive(self):
+        if self.progressive is not None:
+            self.progressive.shutdown()
+            self.progressive = None
+
+    def prefetch_from(self, key, order=None, include_start=True):
+        """(Re)target the prefetch queue: the not-done specimens starting at
+        `key` in table order (`order`, default: the widget's order), `prefetch.count`
+        of them. Everything previously queued but not in the new list is
+        cancelled."""
+        if self.prefetcher is None:
+            return
+        order = list(order or self.table_order or sorted(self.specimens))
+        count = int(self.cfg["prefetch"].get("count", 2))
+        done_col = self.cfg["done_column"]
+        active_key = self.active_specimen.key if self.active_specimen is not None else None
+
+        start = order.index(key) if key in order else 0
+        if not include_start:
+            start += 1
+        paths = []
+        n = 0
+        for k in order[start:]:
+            if n >= count:
+                break
+            specimen = self.specimens.get(k)
+            if specimen is None or k == active_key or specimen.db_info.get(done_col) == "1":
+                continue
+            if self.closed_cache is not None and k in self.closed_cache:
+                continue
+            paths.extend(p for p, _ in specimen.image_paths(eager_only=True))
+            n += 1
+        self.prefetcher.schedule(paths)
+
     def _abs_path(self, rel):
         if not rel:
             return rel
@@ -679,60 +1638,188 @@ class GenericSpecimenManagerLogic(ScriptedLoadableModuleLogic):
             if not parameterNode.GetParameter("PresegCSVPath"):
                 parameterNode.SetParameter("PresegCSVPath", self._abs_path(self.cfg.get("preseg_csv_path", "")))
 
-    def get_node_if_loaded(self, file_path):
-        for n in slicer.mrmlScene.GetNodes():
-            try:
-                if n.GetStorageNode().GetFileName() == file_path:
-                    return n.GetName()
-            except Exception:
-                continue
-        return ""
+    @property
+    def node_index(self):
+        if self._node_index is None:
+            self._node_index = StorageNodeIndex(slicer.mrmlScene)
+        return self._node_index
 
-    def initializeStudy(self):
-        if self.cfg is None:
-            raise RuntimeError("No config loaded. Select a config.json first.")
+    def shutdown_node_index(self):
+        if self._node_index is not None:
+            self._node_index.close()
+            self._node_index = None
+
+    def get_node_if_loaded(self, file_path):
+        """Name of the node loaded from `file_path` ("" if none)."""
+        node = self.node_index.get(file_path)
+        return node.GetName() if node is not None else ""
 
+    def _get_or_load_table(self, path, reload=False):
+        node = self.node_index.get(path)
+        if node is None:
+            return slicer.util.loadTable(path)
+        if reload:
+            storage = node.GetStorageNode()
+            if storage is None:
+                slicer.mrmlScene.RemoveNode(node)
+                return slicer.util.loadTable(path)
+            storage.ReadData(node)
+        return node
+
+    def _read_study_tables(self, reload=False):
         db_path = self.getParameterNode().GetParameter("DatabaseCSVPath")
         preseg_path = self.getParameterNode().GetParameter("PresegCSVPath")
 
         print(f"Database path: {db_path}")
         print(f"Presegmentation path: {preseg_path}")
 
-        try:
-            node = slicer.util.getNode(self.get_node_if_loaded(db_path))
-            self.dbTable = node
-        except slicer.util.MRMLNodeNotFoundException:
-            self.dbTable = slicer.util.loadTable(db_path)
-
-        try:
-            node = slicer.util.getNode(self.get_node_if_loaded(preseg_path))
-            self.presegTable = node
-        except slicer.util.MRMLNodeNotFoundException:
-            self.presegTable = slicer.util.loadTable(preseg_path)
+        if self.study_db is not None:
+            # rows come from the SQLite file, imported from the csv files on first use
+            for source, csv_path in (("database", db_path), ("preseg", preseg_path)):
+                if not self.study_db.has_source(source):
+                    self.study_db.import_csv(source, csv_path, self.cfg["key_columns"])
+            self.dbTable = self.presegTable = None
+            self.dbDictList, self.dbColumnNames = self.study_db.read_rows("database")
+            self.presegDictList, self.presegColumnNames = self.study_db.read_rows("preseg")
+        else:
+            self.dbTable = self._get_or_load_table(db_path, reload)
+            self.presegTable = self._get_or_load_table(preseg_path, reload)
+
+            self.dbDictList, self.dbColumnNames = self._table_to_dicts(self.dbTable, return_columns=True)
+            self.presegDictList, self.presegColumnNames = self._table_to_dicts(self.presegTable, return_columns=True)
+        self._compile_plan()
+
+    # ---- SQLite backend ----
+
+    def _setup_study_db(self):
+        self.shutdown_study_db()
+        db_cfg = self.cfg.get("database", {})
+        if db_cfg.get("backend") == "sqlite":
+            self.study_db = StudyDatabase(self._abs_path(db_cfg.get("path", "study.sqlite")),
+                                          timeout=float(db_cfg.get("timeout_s", 30)))
+
+    def shutdown_study_db(self):
+        if self.study_db is not None:
+            self.study_db.close()
+            self.study_db = None
+
+    def import_study_db(self):
+        """(Re)import both csv files into the SQLite file, replacing its rows."""
+        self.study_db.import_csv("database", self.getParameterNode().GetParameter("DatabaseCSVPath"),
+                                 self.cfg["key_columns"])
+        self.study_db.import_csv("preseg", self.getParameterNode().GetParameter("PresegCSVPath"),
+                                 self.cfg["key_columns"])
+
+    # ---- study plan (compiled config) ----
+
+    def _compile_plan(self):
+        """(Re)build the StudyPlan if there is none yet or the preseg columns changed."""
+        if self.plan is None or self.plan.preseg_columns != tuple(self.presegColumnNames):
+            self.plan = StudyPlan(self.cfg, self.presegColumnNames, self.config_path, self._config_mtime_ns)
+
+    def refresh_plan_if_stale(self):
+        """Reload config.json if it changed on disk since it was compiled and
+        rebind every specimen to the new plan. Returns True if it reloaded."""
+        if self.plan is None or not self.plan.is_stale():
+            return False
+        print(f"[GenericSpecimenManager] {self.config_path} changed on disk, recompiling the study config")
+        self.load_config(self.config_path)
+        self._compile_plan()
+        for specimen in self.specimens.values():
+            specimen.rebind(self.cfg, self.plan, self.study_dir)
+        return True
 
-        self.dbDictList, self.dbColumnNames = self._table_to_dicts(self.dbTable, return_columns=True)
-        self.presegDictList = self._table_to_dicts(self.presegTable)
+    def _join_rows(self):
+        """Hash join of database.csv and preseg.csv on key_columns.
 
-        key_columns = self.cfg["key_columns"]
+        Returns {key: (db_row_index, db_row, preseg_row)} for every key present
+        in both tables. Duplicate keys are reported (and stored in
+        self.duplicate_keys); the first row of a duplicated key is used.
+        """
+        joined, self.duplicate_keys = join_rows(self.dbDictList, self.presegDictList, self.cfg["key_columns"])
+        for source, dups in self.duplicate_keys.items():
+            for key, rows in dups.items():
+                print(f"[GenericSpecimenManager] duplicate key {key} in {source} csv at rows {rows}, "
+                      f"using row {rows[0]}")
+        return joined
+
+    def _make_specimen(self, key, db_idx, db_row, preseg_row):
         done_col = self.cfg["done_column"]
+        specimen = GenericSpecimen(key, self.cfg, db_row, preseg_row, self.study_dir, self.plan)
+        specimen.row_index = db_idx
+        specimen.done_col_index = self.dbColumnNames.index(done_col) if done_col in self.dbColumnNames else None
+        return specimen
 
-        db_keys = [tuple(row.get(c, "") for c in key_columns) for row in self.dbDictList]
-        preseg_keys = [tuple(row.get(c, "") for c in key_columns) for row in self.presegDictList]
-        common_keys = sorted(set(db_keys).intersection(set(preseg_keys)))
+    def initializeStudy(self):
+        if self.cfg is None:
+            raise RuntimeError("No config loaded. Select a config.json first.")
 
-        self.specimens = {}
-        for key in common_keys:
-            db_idx = db_keys.index(key)
-            db_row = self.dbDictList[db_idx]
-            preseg_row = next(
-                (r for r in self.presegDictList if tuple(r.get(c, "") for c in key_columns) == key), {})
+        with self.timing.span("initializeStudy"):
+            self.refresh_plan_if_stale()
+            with self.timing.span("initializeStudy.read_tables"):
+                self._read_study_tables()
+            joined = self._join_rows()
+
+            self.specimens = {}
+            self._joined_rows = {}
+            for key in sorted(joined):
+                db_idx, db_row, preseg_row = joined[key]
+                self.specimens[key] = self._make_specimen(key, db_idx, db_row, preseg_row)
+                self._joined_rows[key] = (db_row, preseg_row)
+
+        print(f"[GenericSpecimenManager] initialized {len(self.specimens)} specimens")
+
+    def reinitializeStudy(self):
+        """Re-read both csv files from disk and rebuild only the specimens whose
+        rows changed. Unchanged specimens keep their GenericSpecimen object
+        (only row_index is refreshed); the active specimen is updated in place.
 
-            specimen = GenericSpecimen(key, self.cfg, db_row, preseg_row, self.study_dir)
+        Returns (added, changed, removed) key lists.
+        """
+        if self.cfg is None:
+            raise RuntimeError("No config loaded. Select a config.json first.")
+        if not self.specimens:
+            self.initializeStudy()
+            return sorted(self.specimens), [], []
+
+        self.refresh_plan_if_stale()
+        with self.timing.span("reinitializeStudy.read_tables"):
+            self._read_study_tables(reload=True)
+        joined = self._join_rows()
+
+        old_specimens = self.specimens
+        old_rows = self._joined_rows
+        added, changed = [], []
+        self.specimens = {}
+        self._joined_rows = {}
+        for key in sorted(joined):
+            db_idx, db_row, preseg_row = joined[key]
+            self._joined_rows[key] = (db_row, preseg_row)
+            specimen = old_specimens.get(key)
+
+            if specimen is None:
+                added.append(key)
+                specimen = self._make_specimen(key, db_idx, db_row, preseg_row)
+            elif old_rows.get(key) != (db_row, preseg_row):
+                changed.append(key)
+                if specimen is self.active_specimen:
+                    specimen.db_info = dict(db_row)
+                    specimen.preseg_info = dict(preseg_row)
+                else:
+                    specimen = self._make_specimen(key, db_idx, db_row, preseg_row)
             specimen.row_index = db_idx
-            specimen.done_col_index = self.dbColumnNames.index(done_col) if done_col in self.dbColumnNames else None
+            if specimen.plan is not self.plan:
+                specimen.rebind(self.cfg, self.plan, self.study_dir)
             self.specimens[key] = specimen
 
-        print(f"[GenericSpecimenManager] initialized {len(self.specimens)} specimens")
+        removed = sorted(k for k in old_specimens if k not in self.specimens)
+        if self.active_specimen is not None and self.active_specimen.key in removed:
+            print(f"[GenericSpecimenManager] active specimen {self.active_specimen.label} "
+                  f"no longer present in the csv files")
+
+        print(f"[GenericSpecimenManager] re-initialized {len(self.specimens)} specimens "
+              f"({len(added)} added, {len(changed)} changed, {len(removed)} removed)")
+        return added, changed, removed
 
     def _table_to_dicts(self, table, return_columns=False):
         dict_list = []
@@ -763,48 +1850,400 @@ class GenericSpecimenManagerLogic(ScriptedLoadableModuleLogic):
         c.setDefaultButton(qt.QMessageBox.Ok)
         c.exec_()
 
-    def load_specimen(self, key):
+    def load_specimen(self, key, offer_journal=True, profile="interactive", quiet=False):
+        """Make `key` the active specimen. profile="export" is the data-only
+        load for batch export: no lease (nothing is written), no closed-cache
+        restore and no prefetch. With `quiet`, a specimen leased elsewhere is
+        only logged, not reported in a dialog."""
         target = self.specimens.get(key)
         if isinstance(self.active_specimen, GenericSpecimen):
             self.info("A specimen has already been loaded.")
             return False
         if target is None:
             raise ValueError(f"Specimen {key} not initialized")
-        target.load()
+        self.refresh_plan_if_stale()
+        if self.save_writer is not None:
+            self.save_writer.wait((target.label,))   # do not read a seg.nrrd that is still being written
+        target.image_cache = self.prefetcher
+        target.progressive = self.progressive
+        target.disk_cache = self.disk_cache
+        target.timing = self.timing
+
+        if profile == "export":
+            target.load(profile="export")
+            self.active_specimen = target
+            return True
+
+        if self.leases is not None:
+            acquired, holder = self.leases.acquire(target.label)
+            if not acquired:
+                message = f"{target.label} is being worked on at {holder.get('owner') or 'another workstation'}."
+                if quiet:
+                    print(f"[GenericSpecimen] {message}")
+                else:
+                    self.info(message)
+                return False
+
+        try:
+            cached = self.closed_cache.pop(key) if self.closed_cache is not None else None
+            if cached is target and not target.changed_on_disk():
+                target.restore()
+            else:
+                if cached is not None:
+                    cached.close()      # rows changed (reinitializeStudy) or saved elsewhere since it was cached
+                target.load(self.confirm if offer_journal else None)
+        except Exception:
+            if self.leases is not None:
+                self.leases.release(target.label)
+            raise
         self.active_specimen = target
+        self.prefetch_from(key, include_start=False)
         return True
 
-    def close_active_specimen(self, no_question=False):
+    def memory_usage(self):
+        """{part: bytes} of image / segmentation memory: the active specimen's
+        loaded data, its images not loaded yet (load policy), the hidden
+        closed-cache specimens and the prefetch cache."""
+        active = self.active_specimen
+        return {"active": active.memory_bytes() if active is not None else 0,
+                "not_loaded": active.placeholder_bytes() if active is not None else 0,
+                "closed_cache": self.closed_cache.memory_bytes() if self.closed_cache is not None else 0,
+                "prefetch": self.prefetcher.cached_bytes if self.prefetcher is not None else 0}
+
+    def _retire_active_specimen(self, keep_cached=True):
+        specimen, self.active_specimen = self.active_specimen, None
+        exported = specimen.profile == "export"
+        if keep_cached and not exported and self.closed_cache is not None and not slicer.mrmlScene.IsClosing():
+            self.closed_cache.put(specimen)
+        else:
+            specimen.close()
+        if self.leases is not None and not exported:
+            if self.save_writer is not None:
+                self.save_writer.wait((specimen.label,))   # the next holder must read the finished file
+            self.leases.release(specimen.label)
+
+    # ---- timing spans ----
+
+    def _setup_timing(self):
+        timing_cfg = self.cfg.get("timing", {})
+        if timing_cfg.get("enabled"):
+            self.timing = SpanLog(self._abs_path(timing_cfg.get("dir", ".timing")),
+                                  fmt=timing_cfg.get("format", "jsonl"),
+                                  max_bytes=int(float(timing_cfg.get("max_mb", 5)) * 1024 * 1024),
+                                  backups=int(timing_cfg.get("backups", 3)))
+        else:
+            self.timing = NULL_TIMING
+
+    def timing_summary(self):
+        """Median / p95 per phase over every workstation's span log (see SpecimenTiming.py)."""
+        if not self.timing.enabled:
+            return []
+        return summarize(read_spans(self.timing.directory))
+
+    # ---- leasing (several workstations on one study) ----
+
+    def _setup_leases(self):
+        self.shutdown_leases()
+        lease_cfg = self.cfg.get("leasing", {})
+        if lease_cfg.get("enabled"):
+            self.leases = LeaseManager(self._abs_path(lease_cfg.get("dir", ".leases")),
+                                       ttl_s=float(lease_cfg.get("ttl_s", 300)))
+            self._lease_timer = qt.QTimer()
+            self._lease_timer.setInterval(int(float(lease_cfg.get("heartbeat_s", 60)) * 1000))
+            self._lease_timer.connect('timeout()', self._heartbeat_leases)
+            self._lease_timer.start()
+
+    def shutdown_leases(self):
+        """Stop the heartbeat and give back every lease this workstation holds."""
+        if self._lease_timer is not None:
+            self._lease_timer.stop()
+            self._lease_timer = None
+        if self.leases is not None:
+            self.leases.release_all()
+            self.leases = None
+
+    def _heartbeat_leases(self):
+        for label in self.leases.heartbeat_all():
+            print(f"[GenericSpecimenManager] lost the lease of {label} (expired and taken over elsewhere)")
+            if self.active_specimen is not None and self.active_specimen.label == label:
+                slicer.util.warningDisplay(
+                    f"The lease of {label} expired and another workstation took it over.\n"
+                    f"Saving now may overwrite its work.")
+
+    def lease_holders(self):
+        """{label: owner} of every live lease (this workstation's included)."""
+        if self.leases is None:
+            return {}
+        return {label: info.get("owner") or "?" for label, info in self.leases.holders().items()}
+
+    def next_free_specimen(self, order=None):
+        """Keys of the not-done specimens, in table order, that no other
+        workstation holds a lease on."""
+        holders = self.lease_holders()
+        own = self.leases.owner if self.leases is not None else None
+        done_col = self.cfg["done_column"]
+        active_key = self.active_specimen.key if self.active_specimen is not None else None
+        for key in list(order or self.table_order or sorted(self.specimens)):
+            specimen = self.specimens.get(key)
+            if specimen is None or key == active_key or specimen.db_info.get(done_col) == "1":
+                continue
+            if holders.get(specimen.label, own) != own:
+                continue
+            yield key
+
+    def load_next_free_specimen(self, order=None):
+        """Lease and load the first free not-done specimen. A specimen another
+        workstation leases in the meantime is skipped without a dialog
+        (load_specimen takes the lease and releases it again if loading
+        fails). Returns its key or None."""
+        if isinstance(self.active_specimen, GenericSpecimen):
+            self.info("A specimen has already been loaded.")
+            return None
+        for key in self.next_free_specimen(order):
+            if self.load_specimen(key, quiet=True):
+                return key
+        self.info("There is no free specimen left to work on.")
+        return None
+
+    def close_active_specimen(self, no_question=False, keep_cached=True):
         if no_question:
             if self.active_specimen is not None:
-                self.active_specimen.close()
-                self.active_specimen = None
+                self._retire_active_specimen(keep_cached)
             return
         if not isinstance(self.active_specimen, GenericSpecimen):
             self.info("There is no active specimen to close.")
             return
         if not self.confirm("Do you really want to close the active specimen?"):
             return
-        self.active_specimen.close()
-        self.active_specimen = None
+        self._retire_active_specimen(keep_cached)
+
+    # ---- closed-specimen cache ----
+
+    def _setup_closed_cache(self):
+        self.clear_closed_cache()
+        cc_cfg = self.cfg.get("closed_cache", {})
+        if cc_cfg.get("enabled"):
+            self.closed_cache = ClosedSpecimenCache(
+                cc_cfg.get("max_specimens", 3),
+                int(cc_cfg.get("memory_budget_mb", 4096)) * 1024 * 1024)
+
+    def clear_closed_cache(self, remove_nodes=True):
+        if self.closed_cache is not None:
+            self.closed_cache.clear(remove_nodes)
 
     def save_active_specimen(self):
         if not isinstance(self.active_specimen, GenericSpecimen):
             self.info("There is no active specimen to save.")
             return
-        self.active_specimen.save()
+        if self.leases is not None and not self.leases.heartbeat(self.active_specimen.label):
+            holder = self.leases.read(self.active_specimen.label) or {}
+            if not self.confirm(f"The lease of {self.active_specimen.label} is now held by "
+                                f"{holder.get('owner') or 'another workstation'}. Save anyway?"):
+                return
+        self.active_specimen.save(self.save_writer)
+
+    # ---- background save ----
+
+    def _setup_save_writer(self):
+        self.shutdown_save_writer()
+        if self.cfg.get("save", {}).get("async"):
+            self.save_writer = BackgroundWriter()
+
+    def shutdown_save_writer(self):
+        """Finish every queued save, then stop the writer thread."""
+        if self.save_writer is not None:
+            self.save_writer.shutdown(wait=True)
+            self.save_writer = None
+
+    def poll_save_results(self):
+        return self.save_writer.poll_results() if self.save_writer is not None else []
 
     def save_db(self):
         db_path = self.getParameterNode().GetParameter("DatabaseCSVPath")
+        if self.study_db is not None:
+            # cells are already written row by row; this exports a csv snapshot
+            self.study_db.export_csv("database", db_path)
+            return
         storage = self.dbTable.CreateDefaultStorageNode()
         storage.SetFileName(db_path)
         storage.WriteData(self.dbTable)
 
+    def set_db_value(self, key, col_name, value):
+        """Write one cell back to the database vtkTable (or, with the SQLite
+        backend, straight into its row) by COLUMN NAME + the specimen's real
+        row_index (not by any display position), so this is safe regardless
+        of table_columns being a subset of database.csv, or of the display
+        order differing from the raw csv row order."""
+        specimen = self.specimens.get(key)
+        if specimen is None or specimen.row_index is None:
+            return False
+        if col_name not in self.dbColumnNames:
+            print(f"[GenericSpecimenManager] column '{col_name}' not present in database.csv, not writing back")
+            return False
+        if self.study_db is not None:
+            self.study_db.set_value("database", specimen.row_index, col_name, value)
+        else:
+            self.dbTable.SetCellText(specimen.row_index, self.dbColumnNames.index(col_name), value)
+        specimen.db_info[col_name] = value
+        return True
+
     @property
     def hasActiveSpecimen(self):
         return isinstance(self.active_specimen, GenericSpecimen)
 
 
+# ---------------------------------------------------------------------------
+# SpecimenTableModel: the specimen table, rendered lazily by a QTableView
+# ---------------------------------------------------------------------------
+
+class SpecimenTableModel(qt.QAbstractTableModel):
+    """Table model over logic.specimens.
+
+    Cells are produced in data() straight from the specimens' db_info, only
+    for the rows the view actually paints - no per-cell widget items. The
+    model owns the row order: key order, narrowed by `filter_text` (substring
+    of any shown column) and optionally with not-done specimens first.
+    `refresh(changed)` recomputes that order (keys only) and resets the view
+    only if the visible rows changed; otherwise just the `changed` rows are
+    repainted. Edits are written back through logic.set_db_value.
+
+    With leasing on, a read-only "Locked by" column after the configured
+    ones shows which workstation holds each specimen (`set_lease_holders`).
+    """
+
+    DONE_COLOR = qt.QColor(0, 127, 0)
+    LEASED_COLOR = qt.QColor(127, 127, 127)
+    LEASE_HEADER = "Locked by"
+
+    def __init__(self, logic, parent=None):
+        qt.QAbstractTableModel.__init__(self, parent)
+        self._logic = logic
+        self._columns = []
+        self._keys = []
+        self._rows = {}           # key -> row
+        self.filter_text = ""
+        self.not_done_first = False
+        self.show_lease_column = False
+        self._holders = {}        # label -> lease owner
+
+    @property
+    def keys(self):
+        return list(self._keys)
+
+    def key_at(self, row):
+        return self._keys[row] if 0 <= row < len(self._keys) else None
+
+    def row_of(self, key):
+        return self._rows.get(key)
+
+    def _is_done(self, specimen):
+        return specimen.db_info.get(self._logic.cfg["done_column"]) == "1"
+
+    def _ordered_keys(self):
+        specimens = self._logic.specimens
+        keys = sorted(specimens)
+        text = self.filter_text.strip().lower()
+        if text:
+            keys = [k for k in keys
+                    if any(text in str(specimens[k].db_info.get(c, "")).lower() for c in self._columns)
+                    or text in specimens[k].label.lower()]
+        if self.not_done_first:
+            keys.sort(key=lambda k: self._is_done(specimens[k]))   # stable: key order within each group
+        return keys
+
+    def refresh(self, changed=None):
+        """Re-sync with logic.specimens. Returns True if the rows were rebuilt."""
+        columns = list(self._logic.cfg["table_columns"]) if self._logic.cfg else []
+        show_lease_column = bool(self._logic.cfg and self._logic.cfg.get("leasing", {}).get("enabled"))
+        columns_changed = columns != self._columns or show_lease_column != self.show_lease_column
+        self._columns = columns
+        self.show_lease_column = show_lease_column
+        keys = self._ordered_keys() if self._logic.cfg else []
+        if changed is None or columns_changed or keys != self._keys:
+            self.beginResetModel()
+            self._keys = keys
+            self._rows = {k: i for i, k in enumerate(keys)}
+            self.endResetModel()
+            return True
+        for key in changed:
+            self.row_changed(key)
+        return False
+
+    def row_changed(self, key):
+        row = self._rows.get(key)
+        if row is not None and self.columnCount():
+            self.dataChanged.emit(self.index(row, 0), self.index(row, self.columnCount() - 1))
+
+    def set_lease_holders(self, holders):
+        """{label: owner}; repaints only the rows whose holder changed."""
+        old, self._holders = self._holders, dict(holders)
+        changed_labels = {label for label in set(old) | set(self._holders) if old.get(label) != self._holders.get(label)}
+        if not changed_labels:
+            return
+        for key in self._keys:
+            specimen = self._logic.specimens.get(key)
+            if specimen is not None and specimen.label in changed_labels:
+                self.row_changed(key)
+
+    def _is_lease_column(self, column):
+        return self.show_lease_column and column == len(self._columns)
+
+    # ---- QAbstractTableModel ----
+
+    def rowCount(self, parent=qt.QModelIndex()):
+        return 0 if parent.isValid() else len(self._keys)
+
+    def columnCount(self, parent=qt.QModelIndex()):
+        return 0 if parent.isValid() else len(self._columns) + (1 if self.show_lease_column else 0)
+
+    def data(self, index, role=qt.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        specimen = self._logic.specimens.get(self._keys[index.row()])
+        if specimen is None:
+            return None
+        if role in (qt.Qt.DisplayRole, qt.Qt.EditRole):
+            if self._is_lease_column(index.column()):
+                return self._holders.get(specimen.label, "")
+            return specimen.db_info.get(self._columns[index.column()], "")
+        if role == qt.Qt.BackgroundRole:
+            if self._is_done(specimen):
+                return qt.QBrush(self.DONE_COLOR)
+            if specimen.label in self._holders:
+                return qt.QBrush(self.LEASED_COLOR)
+        return None
+
+    def headerData(self, section, orientation, role=qt.Qt.DisplayRole):
+        if role != qt.Qt.DisplayRole:
+            return None
+        if orientation == qt.Qt.Horizontal:
+            if self._is_lease_column(section):
+                return self.LEASE_HEADER
+            return self._columns[section] if section < len(self._columns) else None
+        return str(section + 1)
+
+    def flags(self, index):
+        if not index.isValid():
+            return qt.Qt.NoItemFlags
+        if self._is_lease_column(index.column()):
+            return qt.Qt.ItemIsSelectable | qt.Qt.ItemIsEnabled
+        return qt.Qt.ItemIsSelectable | qt.Qt.ItemIsEnabled | qt.Qt.ItemIsEditable
+
+    def setData(self, index, value, role=qt.Qt.EditRole):
+        if role != qt.Qt.EditRole or not index.isValid() or index.column() >= len(self._columns):
+            return False
+        key = self._keys[index.row()]
+        try:
+            written = self._logic.set_db_value(key, self._columns[index.column()], str(value))
+        except Exception as e:
+            slicer.util.errorDisplay("Failed to update table: " + str(e))
+            import traceback
+            traceback.print_exc()
+            return False
+        self.row_changed(key)   # whole row: the done color may have changed
+        return written
+
+
 # ---------------------------------------------------------------------------
 # GenericSpecimenManagerWidgetBase
 #
@@ -825,8 +2264,7 @@ class GenericSpecimenManagerWidgetBase(ScriptedLoadableModuleWidget, VTKObservat
         self._parameterNode = None
         self._updatingGUIFromParameterNode = False
         self.tbl_selected_key = None
-        self.table_lock = False
-        self._displayed_keys = []
+        self.table_model = None
 
     def setup(self):
         ScriptedLoadableModuleWidget.setup(self)
@@ -846,18 +2284,26 @@ class GenericSpecimenManagerWidgetBase(ScriptedLoadableModuleWidget, VTKObservat
         self.ui.tbDBPath.textChanged.connect(self.updateParameterNodeFromGUI)
         self.ui.tbPresegPath.textChanged.connect(self.updateParameterNodeFromGUI)
 
+        self.table_model = SpecimenTableModel(self.logic)
+        self.ui.tblSpecimens.setModel(self.table_model)
+        # size columns from the first rows only, not by measuring every specimen
+        self.ui.tblSpecimens.horizontalHeader().setResizeContentsPrecision(200)
         self.ui.tblSpecimens.selectionModel().selectionChanged.connect(self.selected_specimen_changed)
-        self.ui.tblSpecimens.itemChanged.connect(self.specimen_tbl_changed)
+        self.ui.leSpecimenFilter.textChanged.connect(self.onSpecimenFilterChanged)
+        self.ui.cbNotDoneFirst.toggled.connect(self.onNotDoneFirstToggled)
 
         self.ui.btnSelectConfig.connect('clicked(bool)', self.onBtnSelectConfig)
         self.ui.btnInitializeStudy.connect('clicked(bool)', self.onBtnInitializeStudy)
+        self.ui.btnReloadStudy.connect('clicked(bool)', self.onBtnReloadStudy)
         self.ui.btnSelectDB.connect('clicked(bool)', self.onBtnSelectDB)
         self.ui.btnSelectPreseg.connect('clicked(bool)', self.onBtnSelectPreseg)
         self.ui.btnBatchExport.connect('clicked(bool)', self.onBtnBatchExport)
         self.ui.btnLoadSelected.connect('clicked(bool)', self.onBtnLoadSelected)
+        self.ui.btnLoadNextFree.connect('clicked(bool)', self.onBtnLoadNextFree)
         self.ui.btnSaveActiveSpecimen.connect('clicked(bool)', self.onBtnSaveActiveSpecimen)
         self.ui.btnCloseActiveSpecimen.connect('clicked(bool)', self.onBtnCloseActiveSpecimen)
         self.ui.btnSaveDB.connect('clicked(bool)', self.onBtnSaveDB)
+        self.ui.btnRefreshTiming.connect('clicked(bool)', self.onBtnRefreshTiming)
 
         # If this wrapper module is locked to a single config (CONFIG_PATH set),
         # hide the config picker row - there is nothing to switch between.
@@ -869,10 +2315,38 @@ class GenericSpecimenManagerWidgetBase(ScriptedLoadableModuleWidget, VTKObservat
             self.ui.btnSelectConfig.visible = False
             self.ui.tbConfigPath.visible = False
 
+        # background saves (save.async) report back through this timer, on the main thread
+        self._saveStatusTimer = qt.QTimer()
+        self._saveStatusTimer.setInterval(500)
+        self._saveStatusTimer.connect('timeout()', self._report_background_saves)
+        self._saveStatusTimer.start()
+
+        # with leasing on, the "Locked by" column follows the other workstations
+        self._leaseViewTimer = qt.QTimer()
+        self._leaseViewTimer.setInterval(15000)
+        self._leaseViewTimer.connect('timeout()', self._refresh_lease_holders)
+        self._leaseViewTimer.start()
+
+        self._memoryTimer = qt.QTimer()
+        self._memoryTimer.setInterval(2000)
+        self._memoryTimer.connect('timeout()', self._refresh_memory_label)
+        self._memoryTimer.start()
+
         self.initializeParameterNode()
 
     def cleanup(self):
         self.removeObservers()
+        self._saveStatusTimer.stop()
+        self._leaseViewTimer.stop()
+        self._memoryTimer.stop()
+        if self.logic:
+            self.logic.shutdown_prefetcher()
+            self.logic.shutdown_progressive()
+            self.logic.shutdown_disk_cache()
+            self.logic.shutdown_save_writer()
+            self.logic.shutdown_leases()
+            self.logic.shutdown_node_index()
+            self.logic.shutdown_study_db()
 
     def enter(self):
         self.initializeParameterNode()
@@ -883,6 +2357,8 @@ class GenericSpecimenManagerWidgetBase(ScriptedLoadableModuleWidget, VTKObservat
     def onSceneStartClose(self, caller, event):
         if self.logic and self.logic.hasActiveSpecimen:
             self.logic.close_active_specimen(no_question=True)
+        if self.logic:
+            self.logic.clear_closed_cache(remove_nodes=False)
         self.setParameterNode(None)
 
     def onSceneEndClose(self, caller, event):
@@ -949,108 +2425,91 @@ class GenericSpecimenManagerWidgetBase(ScriptedLoadableModuleWidget, VTKObservat
             if self.logic.cfg is None:
                 self.logic.load_config(str(self.ui.tbConfigPath.text) or self.CONFIG_PATH)
             self.logic.initializeStudy()
+            self._warn_duplicate_keys()
             self.show_specimen_table()
         except Exception as e:
             slicer.util.errorDisplay("Failed to initialize study: " + str(e))
             import traceback
             traceback.print_exc()
 
-    def show_specimen_table(self):
+    def onBtnReloadStudy(self):
+        try:
+            if self.logic.cfg is None:
+                self.logic.load_config(str(self.ui.tbConfigPath.text) or self.CONFIG_PATH)
+            added, changed, removed = self.logic.reinitializeStudy()
+            self._warn_duplicate_keys()
+            self.show_specimen_table(changed)
+        except Exception as e:
+            slicer.util.errorDisplay("Failed to reload study: " + str(e))
+            import traceback
+            traceback.print_exc()
+
+    def _warn_duplicate_keys(self):
+        lines = []
+        for source, dups in self.logic.duplicate_keys.items():
+            for key, rows in dups.items():
+                lines.append(f"{source}: {'-'.join(key)} (rows {', '.join(str(r) for r in rows)})")
+        if lines:
+            slicer.util.warningDisplay("Duplicate keys found, the first row is used for each:\n" + "\n".join(lines))
+
+    def show_specimen_table(self, changed=None):
+        """Sync the table with logic.specimens. With `changed` (keys), only those
+        rows are repainted unless the set / order of visible rows changed."""
         if self._parameterNode is None or self._updatingGUIFromParameterNode:
             return
-        wasModified = self._parameterNode.StartModify()
+        if self.table_model.refresh(changed):
+            self.ui.tblSpecimens.resizeColumnsToContents()
+        if self.logic.table_order != self.table_model.keys:
+            self.logic.table_order = self.table_model.keys
+            self.logic.warm_disk_cache()
+        self._refresh_lease_holders()
 
-        cfg = self.logic.cfg
-        columns = cfg["table_columns"]
-        keys = sorted(self.logic.specimens.keys())
-        self._displayed_keys = keys   # row -> key, independent of raw csv row order
-
-        tbl = self.ui.tblSpecimens
-        tbl.clear()
-        tbl.clearContents()
-        tbl.setColumnCount(len(columns))
-        tbl.setRowCount(len(keys))
-
-        done_col = cfg["done_column"]
-        for i, key in enumerate(keys):
-            specimen = self.logic.specimens[key]
-            specimen.update_done(self.logic.dbTable)
-            for j, col in enumerate(columns):
-                tbl.setItem(i, j, qt.QTableWidgetItem(specimen.db_info.get(col, "")))
-            if specimen.db_info.get(done_col) == str(1):
-                for j in range(tbl.columnCount):
-                    tbl.item(i, j).setBackground(qt.QColor(0, 127, 0))
-
-        tbl.setHorizontalHeaderLabels(columns)
-        tbl.resizeColumnsToContents()
-        self._parameterNode.EndModify(wasModified)
+    def _refresh_lease_holders(self):
+        if self.logic is not None and self.logic.leases is not None:
+            self.table_model.set_lease_holders(self.logic.lease_holders())
+
+    def onSpecimenFilterChanged(self, text):
+        self.table_model.filter_text = text
+        self.show_specimen_table()
+
+    def onNotDoneFirstToggled(self, checked):
+        self.table_model.not_done_first = checked
+        self.show_specimen_table()
 
     def selected_specimen_changed(self):
-        sel = self.ui.tblSpecimens.selectedIndexes()
+        sel = self.ui.tblSpecimens.selectionModel().selectedIndexes()
         if len(sel) == 0:
             return
-        row = sel[0].row()
-        key_columns = self.logic.cfg["key_columns"]
-        columns = self.logic.cfg["table_columns"]
-        key = tuple(self.ui.tblSpecimens.item(row, columns.index(c)).text() for c in key_columns)
+        key = self.table_model.key_at(sel[0].row())
+        if key is None:
+            return
         self.tbl_selected_key = key
         self.ui.lblSelectedSpecimen.text = "-".join(key)
+        self.logic.prefetch_from(key, self.table_model.keys)
 
-    def specimen_tbl_changed(self):
-        """Any cell the user edits gets written back to the underlying database
-        vtkTable by COLUMN NAME + the specimen's real row_index (not by the
-        widget's own row/column position), so this is safe regardless of
-        table_columns being a subset of database.csv, or of the display order
-        (sorted by key) differing from the raw csv row order."""
-        if self.table_lock:
-            return
-        self.table_lock = True
+    def onBtnLoadSelected(self):
         try:
-            tbl = self.ui.tblSpecimens
-            sel = tbl.selectedIndexes()
-            if len(sel) == 0:
-                return
-            row, col = sel[0].row(), sel[0].column()
-
-            cfg = self.logic.cfg
-            columns = cfg["table_columns"]
-            done_col_display_idx = columns.index(cfg["done_column"]) if cfg["done_column"] in columns else tbl.columnCount - 1
-
-            current_done = tbl.item(row, done_col_display_idx).text()
-            if str(current_done) == "1":
-                for j in range(tbl.columnCount):
-                    tbl.item(row, j).setBackground(qt.QColor(0, 127, 0))
-            else:
-                for j in range(tbl.columnCount):
-                    tbl.item(row, j).setBackground(qt.QColor("transparent"))
-
-            key = self._displayed_keys[row]
-            specimen = self.logic.specimens.get(key)
-            if specimen is None or specimen.row_index is None:
-                return
-
-            col_name = columns[col]
-            if col_name not in self.logic.dbColumnNames:
-                print(f"[GenericSpecimenManager] column '{col_name}' not present in database.csv, not writing back")
+            if not self.tbl_selected_key:
                 return
-            real_col = self.logic.dbColumnNames.index(col_name)
-
-            val = tbl.item(row, col).text()
-            self.logic.dbTable.SetCellText(specimen.row_index, real_col, val)
-            specimen.db_info[col_name] = val
-
+            self.logic.load_specimen(self.tbl_selected_key)
+            self._refresh_lease_holders()
+            self.ui.btnLoadSelected.enabled = not self.logic.hasActiveSpecimen
+            if self.logic.hasActiveSpecimen:
+                self.ui.lblActiveSpecimen.text = self.logic.active_specimen.label
         except Exception as e:
-            slicer.util.errorDisplay("Failed to update table: " + str(e))
+            slicer.util.errorDisplay("Failed to load specimen: " + str(e))
             import traceback
             traceback.print_exc()
-        finally:
-            self.table_lock = False
 
-    def onBtnLoadSelected(self):
+    def onBtnLoadNextFree(self):
         try:
-            if not self.tbl_selected_key:
+            key = self.logic.load_next_free_specimen(self.table_model.keys)
+            self._refresh_lease_holders()
+            if key is None:
                 return
-            self.logic.load_specimen(self.tbl_selected_key)
+            row = self.table_model.row_of(key)
+            if row is not None:
+                self.ui.tblSpecimens.selectRow(row)
             self.ui.btnLoadSelected.enabled = not self.logic.hasActiveSpecimen
             if self.logic.hasActiveSpecimen:
                 self.ui.lblActiveSpecimen.text = self.logic.active_specimen.label
@@ -1062,14 +2521,38 @@ class GenericSpecimenManagerWidgetBase(ScriptedLoadableModuleWidget, VTKObservat
     def onBtnSaveActiveSpecimen(self):
         try:
             self.logic.save_active_specimen()
+            if self.logic.save_writer is not None:
+                slicer.util.showStatusMessage("Saving segmentation in the background...", 3000)
         except Exception as e:
             slicer.util.errorDisplay("Failed to save specimen: " + str(e))
             import traceback
             traceback.print_exc()
 
+    def _report_background_saves(self):
+        for _, description, error in self.logic.poll_save_results():
+            if error is None:
+                slicer.util.showStatusMessage(f"Saved {description}", 5000)
+            else:
+                slicer.util.errorDisplay(f"Failed to save {description}: {error}\n"
+                                         f"The previous file on disk was left unchanged.")
+
+    def _refresh_memory_label(self):
+        if self.logic is None or self.logic.cfg is None:
+            return
+        usage = self.logic.memory_usage()
+        text = f"{usage['active'] / 1024 ** 2:.0f} MB loaded"
+        if usage["not_loaded"]:
+            text += f", {usage['not_loaded'] / 1024 ** 2:.0f} MB on demand"
+        if usage["closed_cache"]:
+            text += f", {usage['closed_cache'] / 1024 ** 2:.0f} MB closed cache"
+        if usage["prefetch"]:
+            text += f", {usage['prefetch'] / 1024 ** 2:.0f} MB prefetched"
+        self.ui.lblMemory.text = text
+
     def onBtnCloseActiveSpecimen(self):
         try:
             self.logic.close_active_specimen()
+            self._refresh_lease_holders()
             self.ui.btnLoadSelected.enabled = not self.logic.hasActiveSpecimen
             if not self.logic.hasActiveSpecimen:
                 self.ui.lblActiveSpecimen.text = ""
@@ -1086,49 +2569,107 @@ class GenericSpecimenManagerWidgetBase(ScriptedLoadableModuleWidget, VTKObservat
             import traceback
             traceback.print_exc()
 
+    TIMING_HEADERS = ["Phase", "n", "Median (s)", "p95 (s)", "Median read (MB)", "Peak RSS (MB)"]
+
+    def onBtnRefreshTiming(self):
+        try:
+            rows = self.logic.timing_summary()
+        except Exception as e:
+            slicer.util.errorDisplay("Failed to read the timing logs: " + str(e))
+            import traceback
+            traceback.print_exc()
+            return
+        if not self.logic.timing.enabled:
+            slicer.util.showStatusMessage("Timing is not enabled in the study config.", 5000)
+
+        def fmt(value, scale=1.0, digits=2):
+            return "" if value is None else f"{value / scale:.{digits}f}"
+
+        table = self.ui.tblTiming
+        table.clear()
+        table.setColumnCount(len(self.TIMING_HEADERS))
+        table.setHorizontalHeaderLabels(self.TIMING_HEADERS)
+        table.setRowCount(len(rows))
+        for i, row in enumerate(rows):
+            cells = [row["phase"], str(row["n"]), fmt(row["median_s"]), fmt(row["p95_s"]),
+                     fmt(row["median_bytes_read"], 1024 * 1024, 1), fmt(row["max_peak_rss_bytes"], 1024 * 1024, 0)]
+            for j, text in enumerate(cells):
+                table.setItem(i, j, qt.QTableWidgetItem(text))
+        table.resizeColumnsToContents()
+
     def onBtnBatchExport(self):
-        batch_exporter(self.logic)
+        batch_exporter(self.logic, force=self.ui.cbForceExport.checked)
 
 
 # ---------------------------------------------------------------------------
 # Generic batch export
 # ---------------------------------------------------------------------------
 
-def batch_exporter(logic):
+def batch_exporter(logic, force=False):
+    """Export every done specimen (see batch_export in README.md).
+
+    Specimens whose inputs did not change since their last export (per-specimen
+    manifest next to the output, see SpecimenExport.py) are skipped unless
+    `force` is set. With batch_export.landmark_table the markups are not
+    exported per specimen but read straight from their files into one table
+    (SpecimenLandmarks.py). With batch_export.statistics the segment
+    statistics of the exported specimens go into the study's statistics table.
+    """
     if logic.hasActiveSpecimen:
         print("Please close the active specimen before running a batch export.")
         return
 
+    if logic.save_writer is not None:
+        logic.save_writer.wait()
+
     cfg = logic.cfg
     be_cfg = cfg.get("batch_export", {})
     if not be_cfg.get("enabled"):
         print("[batch_exporter] batch_export is not enabled in the config.")
         return
 
+    if be_cfg.get("headless"):
+        headless_batch_exporter(logic, force)
+        return
+
     logic.initializeStudy()
-    done_col = cfg["done_column"]
     segments_filter = be_cfg.get("segments_filter")   # optional allow-list of segment names to export
+    statistics = {}
 
-    for key, specimen in logic.specimens.items():
-        if specimen.db_info.get(done_col) != "1":
-            continue
-
-        logic.load_specimen(key)
-
-        be_out_dir = be_cfg.get("output_dir")
-        if be_out_dir:
-            out_dir = be_out_dir if os.path.isabs(be_out_dir) else os.path.join(logic.study_dir, be_out_dir)
-        else:
-            out_dir = specimen.out_dir
+    for job in build_export_jobs(cfg, logic.specimens.values(), force):
+        key = tuple(job["key"])
+        specimen = logic.specimens[key]
+        out_dir = job["out_dir"]
         if not os.path.isdir(out_dir):
             os.makedirs(out_dir, exist_ok=True)
 
+        inputs = [job["seg_path"], job["reference_path"], job["markups_path"], job["intensity_path"]]
+        if not any(inputs):
+            continue        # nothing that needs the scene (landmarks go into the landmark table)
+        up_to_date, fingerprints = check_manifest(out_dir, specimen.label, inputs, job["settings"])
+        if up_to_date and not force:
+            print(f"[batch_exporter] {specimen.label} unchanged since the last export, skipped")
+            continue
+
+        logic.load_specimen(key, offer_journal=False, profile="export")
+        written = []
+
         if be_cfg.get("export_segments") and specimen.segmentation_node is not None:
             ref_name = be_cfg.get("reference_image") or cfg["segmentation"].get("reference_image")
-            ref_node = specimen.node_dict.get(ref_name)
+            ref_node = specimen.export_reference_node(ref_name)
+            ref_grid = specimen.export_reference_grid(ref_name) if job["statistics"] else None
             seg = specimen.segmentation_node.GetSegmentation()
 
-            for seg_id in list(seg.GetSegmentIDs()):
+            stats_layers = [] if job["statistics"] else None
+            stats_rows, intensities = [], {}
+            output = be_cfg.get("output", "per_segment")
+            # a multilabel image is only written by the single-pass export
+            if be_cfg.get("single_pass") or output == "multilabel":
+                written += _export_segments_single_pass(specimen, ref_node, out_dir, segments_filter,
+                                                        output, stats_layers)
+                seg = None
+
+            for seg_id in (list(seg.GetSegmentIDs()) if seg is not None else []):
                 segment = seg.GetSegment(seg_id)
                 seg_name = segment.GetName()
                 if segments_filter and seg_name not in segments_filter:
@@ -1140,21 +2681,197 @@ def batch_exporter(logic):
                 ids.InsertNextValue(seg_id)
                 slicer.vtkSlicerSegmentationsModuleLogic.ExportSegmentsToLabelmapNode(
                     specimen.segmentation_node, ids, labelmap, ref_node)
+                if stats_layers is not None:
+                    # one segment per export: its voxels are 1
+                    stats_segment = {"name": seg_name, "label_value": 1, "layer": seg.GetLayerIndex(seg_id)}
+                    rows = _cropped_statistics_rows(labelmap, stats_segment, ref_grid,
+                                                    job["intensity_path"], intensities)
+                    if rows is None:
+                        rows = _reference_statistics_rows(specimen.segmentation_node, ids, ref_node, stats_segment,
+                                                          job["intensity_path"], intensities)
+                    stats_rows += rows
 
                 storage = labelmap.CreateDefaultStorageNode()
                 out_file = os.path.join(out_dir, f"{specimen.label}-{seg_name}.nii.gz")
                 storage.SetFileName(out_file)
                 storage.WriteData(labelmap)
                 print(f"[batch_exporter] saved {out_file}")
+                written.append(out_file)
                 slicer.mrmlScene.RemoveNode(storage)
                 slicer.mrmlScene.RemoveNode(labelmap)
 
-        if be_cfg.get("export_markups") and specimen.markups_node is not None:
+            if stats_layers is not None:
+                for layer, segments, grid in stats_layers:
+                    stats_rows += _statistics_rows(layer, segments, grid, job["intensity_path"], intensities)
+                statistics[key] = stats_rows
+
+        if job["markups_path"] and specimen.markups_node is not None:
             out_file = os.path.join(out_dir, f"{specimen.label}-markups.mrk.json")
             storage = specimen.markups_node.CreateDefaultStorageNode()
             storage.SetFileName(out_file)
             storage.WriteData(specimen.markups_node)
             print(f"[batch_exporter] saved {out_file}")
+            written.append(out_file)
             slicer.mrmlScene.RemoveNode(storage)
 
-        logic.close_active_specimen(no_question=True)
+        write_manifest(out_dir, specimen.label, fingerprints, job["settings"], written)
+        logic.close_active_specimen(no_question=True, keep_cached=False)
+
+    update_statistics_table(cfg, statistics)
+    export_study_landmarks(cfg, logic.specimens.values(), be_cfg.get("workers"), force)
+
+
+def _volume_grid(volume_node):
+    ijk_to_ras = vtk.vtkMatrix4x4()
+    volume_node.GetIJKToRASMatrix(ijk_to_ras)
+    return Grid.from_ijk_to_ras(slicer.util.arrayFromVTKMatrix(ijk_to_ras),
+                                volume_node.GetImageData().GetDimensions())
+
+
+def _intensity_on_grid(intensity_path, grid, intensities):
+    """The intensity image on `grid`, read once per grid (`intensities`
+    caches it for the specimen's other layers / segments)."""
+    grid_key = (grid.size, tuple(grid.origin.round(6)), tuple(grid.spacing.round(6)))
+    if grid_key not in intensities:
+        intensities[grid_key] = image_on_grid(intensity_path, grid)
+    return intensities[grid_key]
+
+
+def _statistics_rows(layer, segments, grid, intensity_path, intensities):
+    """segment_statistics of one layer exported onto the reference grid (so
+    the bounding boxes are reference-grid indices, as in the headless export)."""
+    intensity = _intensity_on_grid(intensity_path, grid, intensities) if intensity_path else None
+    return segment_statistics([(layer, segments)], grid, intensity)
+
+
+def _cropped_statistics_rows(labelmap, segment, ref_grid, intensity_path, intensities):
+    """Statistics of one segment exported to its own (cropped) extent in
+    `labelmap`, with the bounding box in `ref_grid` indices like
+    _statistics_rows. The cropped grid is a block of the reference grid: the
+    box is shifted by the block's offset and the intensity is cut out of the
+    reference-grid image. None if `labelmap` is not such a block."""
+    grid = _volume_grid(labelmap)
+    offset = grid.index_offset_in(ref_grid) if ref_grid is not None else None
+    if offset is None or np.any(offset < 0) or np.any(offset + grid.size > ref_grid.size):
+        return None
+    intensity = None
+    if intensity_path:
+        (i0, j0, k0), (ni, nj, nk) = offset, grid.size
+        intensity = _intensity_on_grid(intensity_path, ref_grid, intensities)[k0:k0 + nk, j0:j0 + nj, i0:i0 + ni]
+    rows = segment_statistics([(slicer.util.arrayFromVolume(labelmap), [segment])], grid, intensity)
+    for row in rows:
+        for axis, shift in zip("ijk", offset):
+            for bound in ("min", "max"):
+                column = f"bbox_{axis}_{bound}"
+                if row[column] is not None:
+                    row[column] += int(shift)
+    return rows
+
+
+def _reference_statistics_rows(segmentation_node, ids, ref_node, segment, intensity_path, intensities):
+    """Statistics of one segment exported once more, for the statistics only,
+    with the full reference extent (when its cropped export is not a block of
+    a known reference grid)."""
+    labelmap = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLLabelMapVolumeNode")
+    try:
+        slicer.vtkSlicerSegmentationsModuleLogic.ExportSegmentsToLabelmapNode(
+            segmentation_node, ids, labelmap, ref_node, slicer.vtkSegmentation.EXTENT_REFERENCE_GEOMETRY)
+        return _statistics_rows(slicer.util.arrayFromVolume(labelmap), [segment], _volume_grid(labelmap),
+                                intensity_path, intensities)
+    finally:
+        slicer.mrmlScene.RemoveNode(labelmap)
+
+
+def _export_segments_single_pass(specimen, ref_node, out_dir, segments_filter=None, output="per_segment",
+                                 stats_layers=None):
+    """Rasterize each shared labelmap layer onto the reference grid once and
+    split / merge the segments in NumPy (batch_export.single_pass).
+
+    Segments of one layer never overlap, so exporting a whole layer in one
+    ExportSegmentsToLabelmapNode call is lossless. Every layer is exported
+    with the full reference extent, so all layers share one grid (the
+    labelmap node is reused for writing). output = "per_segment"
+    writes one binary mask per segment, "multilabel" one label image plus a
+    JSON label table. Returns the written files; the rasterized layers are
+    appended to `stats_layers` (with their Grid) if it is a list.
+    """
+    seg_node = specimen.segmentation_node
+    seg = seg_node.GetSegmentation()
+
+    by_layer = collections.OrderedDict()
+    for seg_id in seg.GetSegmentIDs():
+        segment = seg.GetSegment(seg_id)
+        if segments_filter and segment.GetName() not in segments_filter:
+            continue
+        by_layer.setdefault(seg.GetLayerIndex(seg_id), []).append(seg_id)
+
+    labelmap = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLLabelMapVolumeNode")
+    written = []
+    try:
+        layers = []
+        for layer_index, seg_ids in by_layer.items():
+            ids = vtk.vtkStringArray()
+            segments = []
+            for value, seg_id in enumerate(seg_ids, start=1):
+                ids.InsertNextValue(seg_id)
+                segment = seg.GetSegment(seg_id)
+                # ExportSegmentsToLabelmapNode assigns 1..n in segmentIDs order
+                segments.append({"id": seg_id, "name": segment.GetName(), "label_value": value,
+                                 "layer": layer_index, "color": list(segment.GetColor())})
+            slicer.vtkSlicerSegmentationsModuleLogic.ExportSegmentsToLabelmapNode(
+                seg_node, ids, labelmap, ref_node, slicer.vtkSegmentation.EXTENT_REFERENCE_GEOMETRY)
+            layers.append((slicer.util.arrayFromVolume(labelmap).copy(), segments))
+            if stats_layers is not None:
+                stats_layers.append(layers[-1] + (_volume_grid(labelmap),))
+
+        storage = labelmap.CreateDefaultStorageNode()
+
+        def write(array, out_file):
+            slicer.util.updateVolumeFromArray(labelmap, array)
+            storage.SetFileName(out_file)
+            storage.WriteData(labelmap)
+            print(f"[batch_exporter] saved {out_file}")
+            written.append(out_file)
+
+        if output == "multilabel":
+            labels, label_table, n_overlap = merge_layers(layers)
+            if n_overlap:
+                print(f"[batch_exporter] {specimen.label}: {n_overlap} overlapping voxels, later segment wins")
+            image_file, table_file = multilabel_paths(out_dir, specimen.label)
+            if labels is not None:
+                write(labels, image_file)
+            write_label_table(table_file, label_table)
+            written.append(table_file)
+        else:
+            for layer, segments in layers:
+                for segment, mask in split_layer(layer, segments):
+                    write(mask, os.path.join(out_dir, f"{specimen.label}-{segment['name']}.nii.gz"))
+        slicer.mrmlScene.RemoveNode(storage)
+    finally:
+        slicer.mrmlScene.RemoveNode(labelmap)
+    return written
+
+
+def headless_batch_exporter(logic, force=False):
+    """Scene-free variant of batch_exporter (batch_export.headless = true).
+
+    Reads each done specimen's saved seg.nrrd / markups file directly (see
+    SpecimenExport.py) instead of loading it into the scene, several
+    specimens in parallel (batch_export.workers; batch_export.use_processes
+    for a process pool - only when running outside Slicer's GUI).
+    """
+    cfg = logic.cfg
+    be_cfg = cfg["batch_export"]
+    logic.initializeStudy()
+    jobs = build_export_jobs(cfg, logic.specimens.values(), force)
+    print(f"[batch_exporter] headless export of {len(jobs)} specimens")
+    results = run_export_jobs(jobs, workers=be_cfg.get("workers"), use_processes=be_cfg.get("use_processes", False))
+    update_statistics_table(cfg, {tuple(r["key"]): r["statistics"] for r in results if r["statistics"] is not None})
+    skipped = sum(1 for r in results if r["skipped"])
+    if skipped:
+        print(f"[batch_exporter] {skipped} specimens unchanged since the last export, skipped")
+    failed = [r["label"] for r in results if r["error"]]
+    if failed:
+        print(f"[batch_exporter] {len(failed)} specimens failed: {', '.join(failed)}")
+    export_study_landmarks(cfg, logic.specimens.values(), be_cfg.get("workers"), force)
+    return results
@@ -0,0 +1,419 @@
+"""
+SpecimenCLI
+===========
+
+Command-line runner for a study's batch operations, without the module's
+widget (see "Parancssori futtatás" in README.md):
+
+    python Resources/SpecimenCLI.py --config study.json export --workers 8
+    python Resources/SpecimenCLI.py --config study.json validate --shard 1/4
+    python Resources/SpecimenCLI.py --config study.json stats --shards 4
+    Slicer --no-main-window --python-script Resources/SpecimenCLI.py --config study.json export
+
+Commands:
+
+  export    the headless batch export (SpecimenExport.py) of the done specimens,
+            and the study's landmark table if batch_export.landmark_table is set
+            (SpecimenLandmarks.py; written once, by the unsharded run or the
+            --shards coordinator). With batch_export.statistics the segment
+            statistics go into the study's statistics table; shards leave
+            theirs in `statistics-shard-<i>-of-<n>.csv` for the coordinator
+  validate  every path a specimen would load resolves and exists; duplicate keys
+  stats     one row per specimen: done, images, saved segmentation / segments,
+            landmark count
+  merge     concatenate the per-shard result tables (of every command that has them)
+
+The study is read the way the module reads it (csv files, or the SQLite file
+when database.backend is "sqlite"), but into plain SpecimenPaths objects.
+
+`--shard i/n` (0 <= i < n) keeps the specimens with crc32(label) % n == i, so
+a specimen stays in its shard when rows are added to the csv files. Each
+shard writes `<results_dir>/<command>-shard-<i>-of-<n>.csv`; an unsharded run
+writes `<results_dir>/<command>.csv`. `--shards n` is the coordinator: it
+starts n shard processes of this script, waits for them and merges their
+tables. `--workers` sizes the pool inside each process (processes in plain
+Python, threads inside Slicer).
+
+Nothing in here imports slicer.
+"""
+
+import os
+import sys
+import csv
+import glob
+import json
+import zlib
+import argparse
+import subprocess
+import concurrent.futures
+
+if __name__ == "__main__":
+    # run as a script: make the `Resources.` imports resolve
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Resources.SpecimenStudy import SpecimenPaths, StudyPlan, load_config, config_mtime, join_rows, read_csv_rows
+from Resources.SpecimenSave import write_atomic
+from Resources.SpecimenDatabase import StudyDatabase
+from Resources.SpecimenExport import (build_export_jobs, run_export_jobs, read_nrrd_header, segment_table,
+                                      update_statistics_table, STATISTICS_FIELDS)
+from Resources.SpecimenLandmarks import export_study_landmarks
+
+
+COMMANDS = ("export", "validate", "stats", "merge")
+
+FIELDS = {
+    "export": ["label", "status", "outputs", "error"],
+    "validate": ["label", "level", "item", "message"],
+    "stats": ["label", "done", "images", "images_missing", "segmentation", "segments",
+              "segmentation_bytes", "landmarks"],
+}
+
+
+def in_slicer():
+    return "slicer" in sys.modules
+
+
+# ---------------------------------------------------------------------------
+# Study loading (no scene)
+# ---------------------------------------------------------------------------
+
+def _study_path(cfg, rel):
+    if not rel or os.path.isabs(rel):
+        return rel
+    return os.path.join(cfg["study_dir"], rel)
+
+
+def read_study_rows(cfg, database_csv=None, preseg_csv=None):
+    """(db rows, preseg rows, preseg column names), from the SQLite file if the
+    study uses one and it was imported already, else from the csv files."""
+    db_cfg = cfg["database"]
+    if db_cfg.get("backend") == "sqlite" and not (database_csv or preseg_csv):
+        db = StudyDatabase(_study_path(cfg, db_cfg.get("path", "study.sqlite")),
+                           timeout=float(db_cfg.get("timeout_s", 30)))
+        try:
+            if db.has_source("database") and db.has_source("preseg"):
+                db_rows, _ = db.read_rows("database")
+                preseg_rows, preseg_columns = db.read_rows("preseg")
+                return db_rows, preseg_rows, preseg_columns
+        finally:
+            db.close()
+    db_rows, _ = read_csv_rows(database_csv or _study_path(cfg, cfg.get("database_csv_path", "")))
+    preseg_rows, preseg_columns = read_csv_rows(preseg_csv or _study_path(cfg, cfg.get("preseg_csv_path", "")))
+    return db_rows, preseg_rows, preseg_columns
+
+
+def load_study(config_path, database_csv=None, preseg_csv=None):
+    """(cfg, SpecimenPaths list in key order, duplicate keys as in join_rows)."""
+    cfg = load_config(config_path)
+    db_rows, preseg_rows, preseg_columns = read_study_rows(cfg, database_csv, preseg_csv)
+    plan = StudyPlan(cfg, preseg_columns, config_path, config_mtime(config_path))
+    joined, duplicates = join_rows(db_rows, preseg_rows, cfg["key_columns"])
+    specimens = []
+    for key in sorted(joined):
+        db_idx, db_row, preseg_row = joined[key]
+        specimen = SpecimenPaths(key, cfg, db_row, preseg_row, cfg["study_dir"], plan)
+        specimen.row_index = db_idx
+        specimens.append(specimen)
+    return cfg, specimens, duplicates
+
+
+# ---------------------------------------------------------------------------
+# Sharding
+# ---------------------------------------------------------------------------
+
+def parse_shard(text):
+    """'i/n' -> (i, n), 0 <= i < n."""
+    try:
+        i, n = (int(part) for part in text.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected i/n, got '{text}'")
+    if n < 1 or not 0 <= i < n:
+        raise argparse.ArgumentTypeError(f"shard {text}: need 0 <= i < n")
+    return i, n
+
+
+def shard_of(label, n):
+    return zlib.crc32(label.encode("utf-8")) % n
+
+
+def select_shard(specimens, shard):
+    if shard is None:
+        return list(specimens)
+    i, n = shard
+    return [s for s in specimens if shard_of(s.label, n) == i]
+
+
+def result_path(results_dir, command, shard=None):
+    if shard is None:
+        return os.path.join(results_dir, f"{command}.csv")
+    i, n = shard
+    return os.path.join(results_dir, f"{command}-shard-{i}-of-{n}.csv")
+
+
+def write_rows(path, rows, fieldnames):
+    def write(tmp_path):
+        with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(rows)
+    write_atomic(path, write)
+
+
+def merge_results(results_dir, command):
+    """Concatenate `<command>-shard-*-of-n.csv` into `<command>.csv` (rows
+    sorted by label). Returns (merged path, number of rows, missing shards)."""
+    parts = {}
+    for path in glob.glob(os.path.join(results_dir, f"{command}-shard-*-of-*.csv")):
+        i, n = os.path.basename(path)[len(command) + len("-shard-"):-len(".csv")].split("-of-")
+        parts.setdefault(int(n), {})[int(i)] = path
+    if not parts:
+        raise FileNotFoundError(f"no shard results of '{command}' in {results_dir}")
+    # several shardings in the directory: merge the most recently written one
+    n = max(parts, key=lambda k: max(os.path.getmtime(p) for p in parts[k].values()))
+    if len(parts) > 1:
+        print(f"[SpecimenCLI] shard results for {sorted(parts)} shards found, merging the {n}-shard run")
+    missing = [i for i in range(n) if i not in parts[n]]
+
+    rows = []
+    for i in sorted(parts[n]):
+        rows.extend(read_csv_rows(parts[n][i])[0])
+    rows.sort(key=lambda row: row.get("label", ""))
+    out_path = result_path(results_dir, command)
+    write_rows(out_path, rows, FIELDS[command])
+    return out_path, len(rows), missing
+
+
+# ---------------------------------------------------------------------------
+# Commands
+# ---------------------------------------------------------------------------
+
+def _map(fn, items, workers):
+    """Thread-pool map in input order (the per-specimen checks are I/O bound)."""
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(fn, items))
+
+
+def export_rows(cfg, specimens, workers=None, use_processes=True, force=False, statistics=None):
+    """Export result rows; the segment statistics of the exported specimens
+    are collected into the `statistics` dict ({key tuple: rows}) if given."""
+    if not cfg["batch_export"].get("enabled"):
+        raise RuntimeError("batch_export is not enabled in the config")
+    jobs = build_export_jobs(cfg, specimens, force)
+    print(f"[SpecimenCLI] exporting {len(jobs)} done specimens")
+    rows = []
+    for result in run_export_jobs(jobs, workers=workers, use_processes=use_processes):
+        status = "failed" if result["error"] else "skipped" if result["skipped"] else "exported"
+        rows.append({"label": result["label"], "status": status, "outputs": len(result["written"]),
+                     "error": result["error"] or ""})
+        if statistics is not None and result["statistics"] is not None:
+            statistics[tuple(result["key"])] = result["statistics"]
+    return rows
+
+
+def merge_shard_statistics(cfg, results_dir, n_shards):
+    """Put the statistics the export shards left in results_dir into the study's table."""
+    statistics = {}
+    for path in glob.glob(os.path.join(results_dir, f"statistics-shard-*-of-{n_shards}.csv")):
+        for row in read_csv_rows(path)[0]:
+            key = tuple(row.pop(c) for c in cfg["key_columns"])
+            statistics.setdefault(key, []).append(row)
+    update_statistics_table(cfg, statistics)
+
+
+def validate_specimen(specimen):
+    """Problems of one specimen as validate rows (none if it loads cleanly)."""
+    cfg = specimen.cfg
+    issues = []
+
+    def issue(level, item, message):
+        issues.append({"label": specimen.label, "level": level, "item": item, "message": message})
+
+    for img_cfg in specimen.image_jobs():
+        name = img_cfg.get("name")
+        try:
+            path = specimen.resolve_image_path(img_cfg)
+        except ValueError as e:
+            issue("error", f"image {name}", str(e))
+            continue
+        if not os.path.exists(path):
+            issue("error", f"image {name}", f"'{path}' not found")
+
+    done = specimen.db_info.get(cfg["done_column"]) == "1"
+    seg_cfg = cfg["segmentation"]
+    if seg_cfg.get("enabled"):
+        ref_name = seg_cfg.get("reference_image")
+        if ref_name and specimen.resolved_image_cfg(ref_name) is None:
+            issue("error", "segmentation", f"reference image '{ref_name}' is not among the specimen's images")
+        if os.path.exists(specimen.segmentation_out_path()):
+            pass
+        elif done:
+            issue("warning", "segmentation", f"done, but '{specimen.segmentation_out_path()}' not found")
+        else:
+            for seg_def in specimen.plan.segments:
+                if seg_def.get("source", "file") == "empty":
+                    continue
+                try:
+                    path = specimen.resolve_segment_path(seg_cfg, seg_def)
+                except KeyError as e:
+                    issue("warning", f"segment {seg_def['name']}", f"path pattern field {e} unknown, it would start empty")
+                    continue
+                if path is None or not os.path.exists(path):
+                    issue("warning", f"segment {seg_def['name']}",
+                          f"source '{path}' not found, it would start empty")
+
+    if cfg["landmarks"].get("enabled") and done and not os.path.exists(specimen.markups_out_path()):
+        issue("warning", "landmarks", f"done, but '{specimen.markups_out_path()}' not found")
+    return issues
+
+
+def validate_rows(cfg, specimens, duplicates, workers=None):
+    rows = []
+    for source, dups in duplicates.items():
+        for key, row_indices in dups.items():
+            rows.append({"label": "-".join(key), "level": "error", "item": f"{source} csv",
+                         "message": f"duplicate key at rows {row_indices}, row {row_indices[0]} is used"})
+    for issues in _map(validate_specimen, specimens, workers):
+        rows.extend(issues)
+    return rows
+
+
+def _count_landmarks(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return ""
+    return sum(len(m.get("controlPoints", [])) for m in data.get("markups", []))
+
+
+def specimen_stats(specimen):
+    cfg = specimen.cfg
+    image_paths = specimen.image_paths()
+    row = {"label": specimen.label,
+           "done": specimen.db_info.get(cfg["done_column"], ""),
+           "images": len(specimen.image_jobs()),
+           "images_missing": sum(1 for path, _ in image_paths if not os.path.exists(path))
+                             + len(specimen.image_jobs()) - len(image_paths),
+           "segmentation": "", "segments": "", "segmentation_bytes": "", "landmarks": ""}
+    if cfg["segmentation"].get("enabled"):
+        seg_path = specimen.segmentation_out_path()
+        row["segmentation"] = "yes" if os.path.exists(seg_path) else "no"
+        if row["segmentation"] == "yes":
+            row["segmentation_bytes"] = os.path.getsize(seg_path)
+            try:
+                row["segments"] = len(segment_table(read_nrrd_header(seg_path)[1]))
+            except (OSError, ValueError) as e:
+                print(f"[SpecimenCLI] {specimen.label}: cannot read '{seg_path}': {e}")
+    if cfg["landmarks"].get("enabled"):
+        row["landmarks"] = _count_landmarks(specimen.markups_out_path())
+    return row
+
+
+def stats_rows(cfg, specimens, workers=None):
+    return _map(specimen_stats, specimens, workers)
+
+
+# ---------------------------------------------------------------------------
+# Entry point
+# ---------------------------------------------------------------------------
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="SpecimenCLI", description="Batch operations on a specimen study.")
+    parser.add_argument("--config", required=True, help="study config.json")
+    parser.add_argument("command", choices=COMMANDS)
+    parser.add_argument("--shard", type=parse_shard, help="run only shard i of n (i/n, 0-based)")
+    parser.add_argument("--shards", type=int, help="start N shard processes and merge their results")
+    parser.add_argument("--workers", type=int, help="pool size inside each process")
+    parser.add_argument("--threads", action="store_true", help="export on threads instead of processes")
+    parser.add_argument("--force", action="store_true", help="export even if the manifest shows no change")
+    parser.add_argument("--results-dir", help="where result tables go (default: <study_dir>/batch_results)")
+    parser.add_argument("--database-csv", help="override database_csv_path")
+    parser.add_argument("--preseg-csv", help="override preseg_csv_path")
+    return parser
+
+
+def _coordinate(args, results_dir):
+    """Start args.shards copies of this script, one per shard, then merge."""
+    if in_slicer():
+        raise RuntimeError("--shards starts plain Python processes; run it outside Slicer")
+    base = [sys.executable, os.path.abspath(__file__), "--config", args.config, args.command,
+            "--results-dir", results_dir]
+    for flag, value in (("--workers", args.workers), ("--database-csv", args.database_csv),
+                        ("--preseg-csv", args.preseg_csv)):
+        if value is not None:
+            base += [flag, str(value)]
+    base += [flag for flag, on in (("--threads", args.threads), ("--force", args.force)) if on]
+
+    processes = [subprocess.Popen(base + ["--shard", f"{i}/{args.shards}"]) for i in range(args.shards)]
+    failed = [i for i, p in enumerate(processes) if p.wait() != 0]
+    if failed:
+        print(f"[SpecimenCLI] shards {failed} reported failures")
+    out_path, n_rows, missing = merge_results(results_dir, args.command)
+    print(f"[SpecimenCLI] merged {n_rows} rows into {out_path}")
+    if args.command == "export":
+        cfg, specimens, _ = load_study(args.config, args.database_csv, args.preseg_csv)
+        merge_shard_statistics(cfg, results_dir, args.shards)
+        export_study_landmarks(cfg, specimens, args.workers, args.force)
+    return 1 if failed or missing else 0
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.config = os.path.abspath(args.config)   # study_dir defaults to the config's directory
+    cfg = load_config(args.config)
+    results_dir = args.results_dir or os.path.join(cfg["study_dir"], "batch_results")
+
+    if args.command == "merge":
+        incomplete = False
+        for command in FIELDS:
+            if not glob.glob(os.path.join(results_dir, f"{command}-shard-*-of-*.csv")):
+                continue
+            out_path, n_rows, missing = merge_results(results_dir, command)
+            print(f"[SpecimenCLI] merged {n_rows} rows into {out_path}")
+            if missing:
+                print(f"[SpecimenCLI] {command}: shards {missing} have no results yet")
+                incomplete = True
+        return 1 if incomplete else 0
+    if args.shards:
+        return _coordinate(args, results_dir)
+
+    cfg, specimens, duplicates = load_study(args.config, args.database_csv, args.preseg_csv)
+    specimens = select_shard(specimens, args.shard)
+    print(f"[SpecimenCLI] {args.command}: {len(specimens)} specimens"
+          + (f" (shard {args.shard[0]}/{args.shard[1]})" if args.shard else ""))
+
+    if args.command == "export":
+        use_processes = not (args.threads or in_slicer())
+        statistics = {}
+        rows = export_rows(cfg, specimens, args.workers, use_processes, args.force, statistics)
+        failed = any(row["status"] == "failed" for row in rows)
+        if not args.shard:
+            update_statistics_table(cfg, statistics)
+            export_study_landmarks(cfg, specimens, args.workers, args.force)
+        elif cfg["batch_export"].get("statistics", {}).get("enabled"):
+            stats_rows = [dict(zip(cfg["key_columns"], key), **row)
+                          for key, segment_rows in statistics.items() for row in segment_rows]
+            write_rows(result_path(results_dir, "statistics", args.shard), stats_rows,
+                       list(cfg["key_columns"]) + STATISTICS_FIELDS)
+    elif args.command == "validate":
+        # duplicate keys are a study-wide finding: report them from one shard only
+        rows = validate_rows(cfg, specimens, duplicates if not args.shard or args.shard[0] == 0 else {},
+                             args.workers)
+        failed = any(row["level"] == "error" for row in rows)
+    else:
+        rows = stats_rows(cfg, specimens, args.workers)
+        failed = False
+
+    out_path = result_path(results_dir, args.command, args.shard)
+    write_rows(out_path, rows, FIELDS[args.command])
+    print(f"[SpecimenCLI] {len(rows)} rows written to {out_path}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    status = main()
+    if in_slicer():
+        import slicer
+        slicer.util.exit(status)
+    else:
+        sys.exit(status)
@@ -0,0 +1,173 @@
+"""
+SpecimenCrop
+============
+
+Region of interest loading for images whose structure of interest fills a
+small part of the field of view (`"crop_to"` in README.md).
+
+The crop region of an image is the bounding box of the non-zero voxels of a
+mask - another image of the specimen, a segment's source file, or one
+segment of a saved seg.nrrd - taken in RAS, grown by a margin in mm and
+mapped onto the image's own voxel grid (so mask and image may have
+different geometries). Only that region is decoded
+(`read_image_region`) or sliced out of an already decoded image
+(`crop_image`).
+
+Computing the box means reading the whole mask, so the result is kept in
+a small json file (`CropBoxCache`) next to the specimen's output, keyed by
+path, mtime and size of both files, the mask selector and the margin.
+
+Nothing in here imports slicer.
+"""
+
+import os
+import json
+import itertools
+
+import numpy as np
+import SimpleITK as sitk
+
+from Resources.SpecimenImageIO import CachedImage, header_geometry, _ras_geometry
+from Resources.SpecimenSave import write_atomic
+
+
+# ---------------------------------------------------------------------------
+# Mask bounding boxes
+# ---------------------------------------------------------------------------
+
+def nonzero_bounds(array):
+    """((i, j, k) first, (i, j, k) last) index of the non-zero voxels of a
+    (k, j, i) array, None if there are none."""
+    ranges = []
+    for axis in (2, 1, 0):
+        others = tuple(a for a in range(3) if a != axis)
+        hits = np.flatnonzero(array.any(axis=others))
+        if len(hits) == 0:
+            return None
+        ranges.append((int(hits[0]), int(hits[-1])))
+    return tuple(r[0] for r in ranges), tuple(r[1] for r in ranges)
+
+
+def segment_layer(path, segment_name):
+    """(layer, label value) of the segment called `segment_name` in a seg.nrrd
+    header, None if there is no such segment."""
+    reader = sitk.ImageFileReader()
+    reader.SetFileName(path)
+    reader.ReadImageInformation()
+    index = 0
+    while reader.HasMetaDataKey(f"Segment{index}_Name"):
+        if reader.GetMetaData(f"Segment{index}_Name") == segment_name:
+            layer = int(reader.GetMetaData(f"Segment{index}_Layer")) \
+                if reader.HasMetaDataKey(f"Segment{index}_Layer") else 0
+            value = int(reader.GetMetaData(f"Segment{index}_LabelValue")) \
+                if reader.HasMetaDataKey(f"Segment{index}_LabelValue") else 1
+            return layer, value
+        index += 1
+    return None
+
+
+def mask_box(path, segment_name=None):
+    """RAS corners (8 x 3) of the bounding box of the non-zero voxels of the
+    mask image `path` (voxel edges, not centres), or of segment
+    `segment_name` when `path` is a seg.nrrd. None if the mask is empty."""
+    itk_image = sitk.ReadImage(path)
+    array = sitk.GetArrayFromImage(itk_image)
+    if segment_name is not None:
+        found = segment_layer(path, segment_name)
+        if found is None:
+            raise KeyError(f"no segment '{segment_name}' in '{path}'")
+        layer, value = found
+        if array.ndim == 4:                 # several layers: one vector component each
+            array = array[..., layer]
+        array = array == value
+    bounds = nonzero_bounds(array)
+    if bounds is None:
+        return None
+
+    origin, spacing, directions = _ras_geometry(itk_image)
+    first, last = bounds
+    ijk_to_ras = np.array(directions) * np.array(spacing)
+    corners = [[(last[a] + 0.5) if pick else (first[a] - 0.5) for a, pick in enumerate(picks)]
+               for picks in itertools.product((0, 1), repeat=3)]
+    return np.array(origin) + np.array(corners).dot(ijk_to_ras.T)
+
+
+def crop_region(corners, image_path, margin_mm=0.0):
+    """(index (i, j, k), size (i, j, k)) of the voxels of `image_path` that
+    cover the RAS box `corners` grown by `margin_mm`, clipped to the image.
+    None if the box misses the image."""
+    size, origin, spacing, directions = header_geometry(image_path)
+    ras_to_ijk = np.linalg.inv(np.array(directions) * np.array(spacing))
+    ijk = (np.asarray(corners) - np.array(origin)).dot(ras_to_ijk.T)
+    margin = float(margin_mm) / np.array(spacing)
+    first = np.maximum(np.floor(ijk.min(axis=0) - margin + 0.5), 0).astype(int)
+    last = np.minimum(np.ceil(ijk.max(axis=0) + margin - 0.5), np.array(size) - 1).astype(int)
+    if np.any(last < first):
+        return None
+    return [int(v) for v in first], [int(v) for v in last - first + 1]
+
+
+# ---------------------------------------------------------------------------
+# Region reads
+# ---------------------------------------------------------------------------
+
+def read_image_region(path, index, size):
+    """CachedImage of the (i, j, k) `index` / `size` region of an image file.
+    Only that region is kept in memory (file formats that stream, like
+    uncompressed nrrd, only read that region)."""
+    reader = sitk.ImageFileReader()
+    reader.SetFileName(path)
+    reader.SetExtractIndex([int(v) for v in index])
+    reader.SetExtractSize([int(v) for v in size])
+    itk_image = reader.Execute()
+    origin, spacing, directions = _ras_geometry(itk_image)
+    return CachedImage(path, sitk.GetArrayFromImage(itk_image), origin, spacing, directions)
+
+
+def crop_image(image, index, size):
+    """The (i, j, k) `index` / `size` region of a decoded CachedImage."""
+    i0, j0, k0 = index
+    i1, j1, k1 = (index[a] + size[a] for a in range(3))
+    array = np.ascontiguousarray(image.array[k0:k1, j0:j1, i0:i1])
+    offset = (np.array(image.directions) * np.array(image.spacing)).dot(np.array(index, dtype=float))
+    origin = [float(v) for v in np.array(image.origin) + offset]
+    return CachedImage(image.path, array, origin, list(image.spacing), image.directions)
+
+
+# ---------------------------------------------------------------------------
+# Box cache
+# ---------------------------------------------------------------------------
+
+def file_fingerprint(path):
+    stat = os.stat(path)
+    return [os.path.abspath(path), stat.st_mtime_ns, stat.st_size]
+
+
+class CropBoxCache:
+    """{image name: crop region} of one specimen in a json file, each valid
+    while its fingerprint (files, mask selector, margin) is unchanged."""
+
+    def __init__(self, path):
+        self.path = path
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self._boxes = json.load(f)
+        except (OSError, ValueError):
+            self._boxes = {}
+
+    def get(self, name, fingerprint):
+        entry = self._boxes.get(name)
+        if entry is None or entry.get("fingerprint") != fingerprint:
+            return None
+        return entry["index"], entry["size"]
+
+    def put(self, name, fingerprint, index, size):
+        self._boxes[name] = {"fingerprint": fingerprint, "index": list(index), "size": list(size)}
+
+        def write(tmp_path):
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._boxes, f, indent=1)
+        try:
+            write_atomic(self.path, write)
+        except OSError as e:
+            print(f"[SpecimenCrop] cannot write '{self.path}': {e}")
@@ -0,0 +1,149 @@
+"""
+SpecimenDatabase
+================
+
+Optional SQLite backend for the study tables (database.csv / preseg.csv),
+see `"database": {"backend": "sqlite"}` in README.md.
+
+Each source ("database", "preseg") is one table with a TEXT column per csv
+column plus `_row`, the csv row index, as INTEGER PRIMARY KEY; the key
+columns get an index. Startup reads the rows in `_row` order, and editing a
+cell is a single-row UPDATE instead of rewriting the whole csv.
+
+Several workstations can share one study file on a network share: every
+write is its own short `BEGIN IMMEDIATE` transaction touching one row, so
+concurrent edits of different cells do not overwrite each other. The
+rollback journal is used instead of WAL, because WAL needs shared memory
+that network file systems do not provide; a busy database is retried for
+`timeout` seconds.
+
+Nothing in here imports slicer.
+"""
+
+import os
+import csv
+import json
+import sqlite3
+import contextlib
+
+from Resources.SpecimenStudy import read_csv_rows
+from Resources.SpecimenSave import write_atomic
+
+
+SOURCES = ("database", "preseg")
+
+
+def _quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _table(source):
+    if source not in SOURCES:
+        raise ValueError(f"unknown study table '{source}', expected one of {SOURCES}")
+    return _quote(f"rows_{source}")
+
+
+class StudyDatabase:
+    def __init__(self, path, timeout=30.0):
+        self.path = path
+        self.timeout = timeout
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.isdir(directory):
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=DELETE")
+            conn.execute("PRAGMA synchronous=FULL")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+            self._conn = conn
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    # ---- import ----
+
+    def import_rows(self, source, rows, columns, key_columns=()):
+        """Replace `source` with `rows` (dicts) in one transaction."""
+        table = _table(source)
+        columns = list(columns)
+        with self._transaction() as conn:
+            conn.execute(f"DROP TABLE IF EXISTS {table}")
+            column_sql = "".join(f", {_quote(c)} TEXT" for c in columns)
+            conn.execute(f"CREATE TABLE {table} (_row INTEGER PRIMARY KEY{column_sql})")
+            keys = [c for c in key_columns if c in columns]
+            if keys:
+                conn.execute(f"CREATE INDEX {_quote(f'rows_{source}_key')} ON {table} "
+                             f"({', '.join(_quote(c) for c in keys)})")
+            placeholders = ", ".join("?" * (len(columns) + 1))
+            conn.executemany(f"INSERT INTO {table} VALUES ({placeholders})",
+                             ([i] + [row.get(c, "") for c in columns] for i, row in enumerate(rows)))
+            conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)",
+                         (f"{source}_columns", json.dumps(columns)))
+
+    def import_csv(self, source, csv_path, key_columns=()):
+        rows, columns = read_csv_rows(csv_path)
+        self.import_rows(source, rows, columns, key_columns)
+        print(f"[StudyDatabase] imported {len(rows)} rows of '{csv_path}' into {self.path} ({source})")
+
+    # ---- read / write ----
+
+    def has_source(self, source):
+        row = self._connect().execute("SELECT value FROM meta WHERE name = ?", (f"{source}_columns",)).fetchone()
+        return row is not None
+
+    def columns(self, source):
+        row = self._connect().execute("SELECT value FROM meta WHERE name = ?", (f"{source}_columns",)).fetchone()
+        if row is None:
+            raise KeyError(f"'{source}' was never imported into {self.path}")
+        return json.loads(row[0])
+
+    def read_rows(self, source):
+        """(row dicts in csv row order, ordered column names)."""
+        columns = self.columns(source)
+        select = ", ".join(_quote(c) for c in columns) or "_row"
+        cursor = self._connect().execute(f"SELECT {select} FROM {_table(source)} ORDER BY _row")
+        if not columns:
+            return [{} for _ in cursor], columns
+        return [{c: ("" if v is None else v) for c, v in zip(columns, values)} for values in cursor], columns
+
+    def set_value(self, source, row_index, column, value):
+        """Single-cell, single-row update."""
+        if column not in self.columns(source):
+            raise KeyError(f"column '{column}' not present in {source}")
+        with self._transaction() as conn:
+            cursor = conn.execute(f"UPDATE {_table(source)} SET {_quote(column)} = ? WHERE _row = ?",
+                                  (value, int(row_index)))
+            if cursor.rowcount != 1:
+                raise KeyError(f"row {row_index} not present in {source}")
+
+    # ---- export ----
+
+    def export_csv(self, source, csv_path):
+        """Write `source` back out as a csv (replaced atomically)."""
+        rows, columns = self.read_rows(source)
+
+        def write(tmp_path):
+            with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=columns)
+                writer.writeheader()
+                writer.writerows(rows)
+
+        write_atomic(csv_path, write)
+        print(f"[StudyDatabase] exported {len(rows)} rows of {source} to '{csv_path}'")
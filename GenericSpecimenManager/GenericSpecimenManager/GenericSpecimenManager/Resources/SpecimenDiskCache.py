@@ -0,0 +1,204 @@
+"""
+SpecimenDiskCache
+=================
+
+Read-through cache of study files (images, segmentations, markups) on a
+local disk, for studies that live on a NAS (`"disk_cache"` in README.md).
+
+`local_path(path)` returns a local copy of `path`, copying it first if
+there is none yet. A copy is keyed by the source path and its mtime / size:
+
+    <cache dir>/<hash of the path>-<mtime_ns>-<size>/<file name>
+
+so a file changed on the NAS is simply a new entry, and the file name (and
+with it the extension the Slicer readers pick the format from, and the node
+name they derive) stays the same. Copies are made into a temporary
+directory and renamed into place, so a half-copied file is never used, and
+several processes can share the cache directory.
+
+The cache is read only: writes go to the NAS paths as before, which then
+get a new mtime and with it a new entry on the next read. Entries are
+evicted least recently used first whenever the total would exceed
+`budget_bytes`; the last use of an entry is the mtime of its directory, so
+the order survives restarts.
+
+`warm(paths)` copies files on a background thread, in the given order,
+evicting only entries not used since this cache object was created - a
+warm-up never pushes out what the current session is working on.
+
+Nothing in here imports slicer.
+"""
+
+import os
+import time
+import shutil
+import hashlib
+import threading
+
+
+def _path_hash(path):
+    return hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:16]
+
+
+def _tree_size(directory):
+    total = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class DiskCache:
+    def __init__(self, cache_dir, budget_bytes):
+        self.cache_dir = cache_dir
+        self.budget_bytes = int(budget_bytes)
+        self._lock = threading.Condition()
+        self._entries = {}            # entry dir name -> [size, last use]
+        self._session_start = time.time()
+        self._warm_queue = []
+        self._stop = False
+        self._thread = None
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._scan()
+
+    def _scan(self):
+        for name in os.listdir(self.cache_dir):
+            entry = os.path.join(self.cache_dir, name)
+            if name.startswith(".") or not os.path.isdir(entry):
+                continue
+            try:
+                self._entries[name] = [_tree_size(entry), os.path.getmtime(entry)]
+            except OSError:
+                continue
+
+    # ---- lookup ----
+
+    def _entry_name(self, path, stat):
+        return f"{_path_hash(path)}-{stat.st_mtime_ns}-{stat.st_size}"
+
+    def used_bytes(self):
+        with self._lock:
+            return sum(size for size, _ in self._entries.values())
+
+    def local_path(self, path):
+        """Local copy of `path` (made now if missing). `path` itself if it
+        does not exist, does not fit into the budget or cannot be copied."""
+        copied = self._ensure(path, protect_session=False)
+        return copied if copied is not None else path
+
+    def _ensure(self, path, protect_session):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        if stat.st_size > self.budget_bytes:
+            return None
+        name = self._entry_name(path, stat)
+        local = os.path.join(self.cache_dir, name, os.path.basename(path))
+
+        with self._lock:
+            if name in self._entries and os.path.exists(local):
+                self._touch(name)
+                if not protect_session:
+                    self.hits += 1
+                return local
+            if not protect_session:
+                self.misses += 1
+            if not self._make_room(stat.st_size, protect_session):
+                return None
+            self._drop_older_versions(path, name)
+
+        try:
+            self._copy(path, name)
+        except OSError as e:
+            print(f"[DiskCache] cannot cache '{path}': {e}")
+            return None
+        with self._lock:
+            self._entries[name] = [stat.st_size, time.time()]
+        return local
+
+    def _copy(self, path, name):
+        entry = os.path.join(self.cache_dir, name)
+        tmp = os.path.join(self.cache_dir, f".copying-{os.getpid()}-{threading.get_ident()}-{name}")
+        os.makedirs(tmp, exist_ok=True)
+        try:
+            shutil.copyfile(path, os.path.join(tmp, os.path.basename(path)))
+            try:
+                os.rename(tmp, entry)
+            except OSError:
+                if not os.path.isdir(entry):      # not "another process was faster"
+                    raise
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def _touch(self, name):
+        self._entries[name][1] = time.time()
+        try:
+            os.utime(os.path.join(self.cache_dir, name))
+        except OSError:
+            pass
+
+    # ---- eviction (called with the lock held) ----
+
+    def _remove(self, name):
+        self._entries.pop(name, None)
+        shutil.rmtree(os.path.join(self.cache_dir, name), ignore_errors=True)
+
+    def _drop_older_versions(self, path, name):
+        prefix = _path_hash(path) + "-"
+        for other in [n for n in self._entries if n.startswith(prefix) and n != name]:
+            self._remove(other)
+
+    def _make_room(self, needed, protect_session):
+        used = sum(size for size, _ in self._entries.values())
+        if used + needed <= self.budget_bytes:
+            return True
+        for name, (size, last_use) in sorted(self._entries.items(), key=lambda item: item[1][1]):
+            if protect_session and last_use >= self._session_start:
+                return False
+            self._remove(name)
+            used -= size
+            if used + needed <= self.budget_bytes:
+                return True
+        return False
+
+    # ---- background warm-up ----
+
+    def _fits(self, path):
+        try:
+            return os.path.getsize(path) <= self.budget_bytes
+        except OSError:
+            return False
+
+    def warm(self, paths):
+        """Replace the warm-up queue with `paths` (copied in this order)."""
+        with self._lock:
+            self._warm_queue = list(paths)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="GenericSpecimenDiskCache", daemon=True)
+                self._thread.start()
+            self._lock.notify_all()
+
+    def shutdown(self):
+        with self._lock:
+            self._stop = True
+            self._warm_queue = []
+            self._lock.notify_all()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._warm_queue and not self._stop:
+                    self._lock.wait()
+                if self._stop:
+                    return
+                path = self._warm_queue.pop(0)
+            if self._ensure(path, protect_session=True) is None and self._fits(path):
+                with self._lock:
+                    # budget full of this session's files: the rest would not fit either
+                    self._warm_queue = []
@@ -0,0 +1,619 @@
+"""
+SpecimenExport
+==============
+
+Headless, scene-free batch export for GenericSpecimenEngine studies.
+
+Instead of loading every done specimen through the interactive path
+(all images, Segment Editor, volume rendering) and calling
+ExportSegmentsToLabelmapNode once per segment, this reads the saved
+`segment.seg.nrrd` directly: the segment metadata comes from the NRRD
+header (`Segment<N>_Name`, `_Layer`, `_LabelValue`, ...), the voxels from
+SimpleITK. Each shared labelmap layer is put onto the reference image grid
+once (a plain NumPy paste when the grids are aligned - the normal case,
+since Slicer stores the segmentation cropped on the reference grid - and a
+nearest-neighbour resample otherwise), then split into per-segment binary
+masks with NumPy and written as NIfTI.
+
+With batch_export.statistics, `segment_statistics` measures every segment
+(voxels, volume, bounding box, centroid, intensity mean / std) from the
+same on-grid layers, and `update_statistics_table` collects the results in
+one study-wide table.
+
+Nothing here touches slicer / qt / vtk. A job is a plain dict, so
+`run_export_jobs` can fan specimens out over a process pool.
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import concurrent.futures
+
+import numpy as np
+import SimpleITK as sitk
+
+from Resources.SpecimenStudy import export_table_path
+from Resources.SpecimenLandmarks import read_table, write_table
+
+
+# ---------------------------------------------------------------------------
+# .seg.nrrd reading
+# ---------------------------------------------------------------------------
+
+def read_nrrd_header(path):
+    """Parse the text header of a NRRD file.
+
+    Returns (fields, key_values): standard fields ("sizes", "space directions",
+    ...) and the free-form `key:=value` pairs Slicer stores segment metadata in.
+    """
+    fields, key_values = {}, {}
+    with open(path, "rb") as f:
+        if not f.readline().startswith(b"NRRD"):
+            raise ValueError(f"'{path}' is not a NRRD file")
+        for raw in f:
+            line = raw.decode("latin-1").rstrip("\r\n")
+            if not line:
+                break
+            if line.startswith("#"):
+                continue
+            if ":=" in line:
+                k, v = line.split(":=", 1)
+                key_values[k] = v
+            elif ": " in line:
+                k, v = line.split(": ", 1)
+                fields[k] = v
+    return fields, key_values
+
+
+def segment_table(key_values):
+    """Segment list from seg.nrrd key/values, in file order.
+
+    Files written before shared labelmap layers existed have no _Layer /
+    _LabelValue entries: there every segment is its own layer with value 1.
+    """
+    segments = []
+    i = 0
+    while f"Segment{i}_ID" in key_values:
+        prefix = f"Segment{i}_"
+        color = key_values.get(prefix + "Color", "")
+        segments.append({
+            "id": key_values[prefix + "ID"],
+            "name": key_values.get(prefix + "Name", key_values[prefix + "ID"]),
+            "layer": int(key_values.get(prefix + "Layer", i)),
+            "label_value": int(key_values.get(prefix + "LabelValue", 1)),
+            "color": [float(c) for c in color.split()] if color else None,
+        })
+        i += 1
+    return segments
+
+
+class Grid:
+    """Voxel grid (ITK / LPS convention): size is (i, j, k)."""
+
+    def __init__(self, size, origin, spacing, direction):
+        self.size = tuple(int(v) for v in size)
+        self.origin = np.array(origin, dtype=float)
+        self.spacing = np.array(spacing, dtype=float)
+        self.direction = np.array(direction, dtype=float).reshape(3, 3)
+
+    @classmethod
+    def from_image(cls, image):
+        return cls(image.GetSize(), image.GetOrigin(), image.GetSpacing(), image.GetDirection())
+
+    @classmethod
+    def from_file(cls, path):
+        """Grid of an image file, from its header only."""
+        reader = sitk.ImageFileReader()
+        reader.SetFileName(path)
+        reader.ReadImageInformation()
+        return cls(reader.GetSize(), reader.GetOrigin(), reader.GetSpacing(), reader.GetDirection())
+
+    @classmethod
+    def from_ijk_to_ras(cls, matrix, size):
+        """Grid of a Slicer volume from its 4x4 IJK-to-RAS matrix and (i, j, k) size."""
+        matrix = np.asarray(matrix, dtype=float)
+        spacing = np.linalg.norm(matrix[:3, :3], axis=0)
+        lps = np.diag([-1.0, -1.0, 1.0])
+        return cls(size, lps.dot(matrix[:3, 3]), spacing, lps.dot(matrix[:3, :3] / spacing))
+
+    @property
+    def shape(self):
+        """numpy (k, j, i) shape."""
+        return self.size[::-1]
+
+    def ijk_to_ras(self):
+        """4x4 IJK-to-RAS matrix (Slicer convention)."""
+        lps = np.diag([-1.0, -1.0, 1.0])
+        matrix = np.eye(4)
+        matrix[:3, :3] = lps.dot(self.direction * self.spacing)
+        matrix[:3, 3] = lps.dot(self.origin)
+        return matrix
+
+    def index_offset_in(self, other, tol=1e-3):
+        """Integer (i, j, k) offset of this grid's first voxel in `other`, or
+        None if the two grids are not aligned (different axes / spacing, or a
+        non-integer shift)."""
+        if not (np.allclose(self.direction, other.direction, atol=1e-6)
+                and np.allclose(self.spacing, other.spacing, rtol=1e-5)):
+            return None
+        offset = np.linalg.solve(other.direction * other.spacing, self.origin - other.origin)
+        rounded = np.round(offset)
+        if not np.allclose(offset, rounded, atol=tol):
+            return None
+        return rounded.astype(int)
+
+    def apply_to(self, image):
+        image.SetOrigin([float(v) for v in self.origin])
+        image.SetSpacing([float(v) for v in self.spacing])
+        image.SetDirection([float(v) for v in self.direction.ravel()])
+        return image
+
+
+def read_segmentation_layers(path):
+    """Read a .seg.nrrd -> (layers array (n_layers, k, j, i), Grid, segment table)."""
+    _, key_values = read_nrrd_header(path)
+    segments = segment_table(key_values)
+
+    image = sitk.ReadImage(path)
+    grid = Grid.from_image(image)
+    array = sitk.GetArrayFromImage(image)
+    if image.GetNumberOfComponentsPerPixel() > 1:
+        layers = np.moveaxis(array, -1, 0)          # (k, j, i, C) -> (C, k, j, i)
+    else:
+        layers = array[np.newaxis]
+    return layers, grid, segments
+
+
+def layer_on_grid(layer, layer_grid, target_grid):
+    """Put one labelmap layer onto `target_grid` (nearest neighbour, 0 outside)."""
+    offset = layer_grid.index_offset_in(target_grid)
+    if offset is not None:
+        out = np.zeros(target_grid.shape, dtype=layer.dtype)
+        src, dst = [], []
+        # numpy axes are (k, j, i); offset is (i, j, k)
+        for axis, off in zip(range(3), offset[::-1]):
+            n_src, n_dst = layer.shape[axis], out.shape[axis]
+            lo, hi = max(0, off), min(n_dst, off + n_src)
+            if hi <= lo:
+                return out
+            dst.append(slice(lo, hi))
+            src.append(slice(lo - off, hi - off))
+        out[tuple(dst)] = layer[tuple(src)]
+        return out
+
+    moving = layer_grid.apply_to(sitk.GetImageFromArray(layer))
+    resampled = sitk.Resample(moving, list(target_grid.size), sitk.Transform(), sitk.sitkNearestNeighbor,
+                              [float(v) for v in target_grid.origin], [float(v) for v in target_grid.spacing],
+                              [float(v) for v in target_grid.direction.ravel()], 0, moving.GetPixelID())
+    return sitk.GetArrayFromImage(resampled)
+
+
+def image_on_grid(path, grid):
+    """(k, j, i) float array of the image file `path` on `grid`: as read when
+    the file is on that grid already, linearly resampled (0 outside) if not."""
+    image = sitk.ReadImage(path)
+    own = Grid.from_image(image)
+    offset = own.index_offset_in(grid)
+    if offset is None or own.size != grid.size or np.any(offset != 0):
+        image = sitk.Resample(image, list(grid.size), sitk.Transform(), sitk.sitkLinear,
+                              [float(v) for v in grid.origin], [float(v) for v in grid.spacing],
+                              [float(v) for v in grid.direction.ravel()], 0.0, sitk.sitkFloat64)
+    return sitk.GetArrayFromImage(image).astype(np.float64, copy=False)
+
+
+def write_mask(array, grid, path):
+    """Write a (k, j, i) array on `grid` as a compressed image file."""
+    image = grid.apply_to(sitk.GetImageFromArray(array))
+    sitk.WriteImage(image, path, True)
+
+
+# ---------------------------------------------------------------------------
+# Layer splitting / merging (shared by the headless engine and the
+# single-pass scene export in GenericSpecimenEngine.batch_exporter)
+#
+# A "layer" is one shared labelmap already on the reference grid, together
+# with the segments (dicts with "name", "label_value", ...) stored in it.
+# Segments within a layer never overlap, segments in different layers can.
+# ---------------------------------------------------------------------------
+
+def split_layer(layer, segments):
+    """Yield (segment, binary uint8 mask) for every segment stored in `layer`."""
+    for segment in segments:
+        yield segment, (layer == segment["label_value"]).astype(np.uint8)
+
+
+def merge_layers(layers):
+    """Merge [(layer array, segments), ...] (all on the same grid) into one
+    multi-label array.
+
+    Output label values are 1..n in segment order. Where segments of
+    different layers overlap the later one wins; the number of such voxels is
+    returned so the caller can warn. Returns (labels, label_table, n_overlap).
+    """
+    shapes = {layer.shape for layer, _ in layers}
+    if len(shapes) > 1:
+        raise ValueError(f"layers to merge are on different grids: shapes {sorted(shapes)}")
+    n_segments = sum(len(segments) for _, segments in layers)
+    dtype = np.uint8 if n_segments < 256 else np.uint16
+    labels = None
+    label_table = []
+    n_overlap = 0
+    value = 0
+    for layer, segments in layers:
+        if labels is None:
+            labels = np.zeros(layer.shape, dtype=dtype)
+        lut = np.zeros(int(layer.max()) + 1, dtype=dtype)
+        for segment in segments:
+            value += 1
+            if segment["label_value"] < len(lut):
+                lut[segment["label_value"]] = value
+            label_table.append({"value": value, "name": segment["name"], "id": segment.get("id"),
+                                "color": segment.get("color")})
+        mapped = lut[layer]
+        hit = mapped > 0
+        n_overlap += int(np.count_nonzero(labels[hit]))
+        labels[hit] = mapped[hit]
+    return labels, label_table, n_overlap
+
+
+STATISTICS_FIELDS = ["segment", "layer", "voxels", "volume_mm3",
+                     "bbox_i_min", "bbox_j_min", "bbox_k_min", "bbox_i_max", "bbox_j_max", "bbox_k_max",
+                     "centroid_r", "centroid_a", "centroid_s", "intensity_mean", "intensity_std"]
+
+
+def segment_statistics(layers, grid, intensity=None):
+    """Statistics of every segment of [(layer array, segments), ...] on `grid`.
+
+    One pass per layer over its non-zero voxels: voxel counts, coordinate
+    sums (centroid) and intensity sums come from np.bincount on the label
+    values, bounding boxes from minimum / maximum.reduceat over the voxels
+    sorted by label. `intensity` is an optional (k, j, i) array on the same
+    grid. Returns one dict per segment (STATISTICS_FIELDS); the bounding box
+    is in voxel indices of `grid`, the centroid in RAS mm.
+    """
+    ijk_to_ras = grid.ijk_to_ras()
+    voxel_volume = abs(float(np.linalg.det(ijk_to_ras[:3, :3])))
+    rows = []
+    for layer_index, (layer, segments) in enumerate(layers):
+        flat = layer.ravel()
+        nonzero = np.flatnonzero(flat)
+        labels = flat[nonzero].astype(np.intp)
+        n_bins = int(labels.max()) + 1 if len(labels) else 1
+        counts = np.bincount(labels, minlength=n_bins)
+        ijk = np.stack(np.unravel_index(nonzero, layer.shape)[::-1])     # (3, n): i, j, k
+        sums = [np.bincount(labels, weights=axis, minlength=n_bins) for axis in ijk]
+
+        order = np.argsort(labels, kind="stable")
+        present, starts = np.unique(labels[order], return_index=True)
+        lows = {int(v): lo for v, lo in zip(present, np.minimum.reduceat(ijk[:, order], starts, axis=1).T)} \
+            if len(present) else {}
+        highs = {int(v): hi for v, hi in zip(present, np.maximum.reduceat(ijk[:, order], starts, axis=1).T)} \
+            if len(present) else {}
+
+        if intensity is not None:
+            values = intensity.ravel()[nonzero]
+            value_sums = np.bincount(labels, weights=values, minlength=n_bins)
+            square_sums = np.bincount(labels, weights=values * values, minlength=n_bins)
+
+        for segment in segments:
+            value = segment["label_value"]
+            n = int(counts[value]) if value < n_bins else 0
+            row = dict.fromkeys(STATISTICS_FIELDS)
+            row.update({"segment": segment["name"], "layer": segment.get("layer", layer_index), "voxels": n,
+                        "volume_mm3": n * voxel_volume})
+            if n:
+                centroid = ijk_to_ras.dot([sums[0][value] / n, sums[1][value] / n, sums[2][value] / n, 1.0])
+                row.update(zip(("bbox_i_min", "bbox_j_min", "bbox_k_min"), (int(v) for v in lows[value])))
+                row.update(zip(("bbox_i_max", "bbox_j_max", "bbox_k_max"), (int(v) for v in highs[value])))
+                row.update(zip(("centroid_r", "centroid_a", "centroid_s"), (float(v) for v in centroid[:3])))
+                if intensity is not None:
+                    mean = value_sums[value] / n
+                    row["intensity_mean"] = float(mean)
+                    row["intensity_std"] = float(np.sqrt(max(square_sums[value] / n - mean * mean, 0.0)))
+            rows.append(row)
+    return rows
+
+
+def write_label_table(path, label_table):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"labels": label_table}, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def multilabel_paths(out_dir, label):
+    """(image, label table) file names of the multi-label export."""
+    return (os.path.join(out_dir, f"{label}-labels.nii.gz"),
+            os.path.join(out_dir, f"{label}-labels.json"))
+
+
+# ---------------------------------------------------------------------------
+# Export manifest (incremental export)
+#
+# One small json per specimen next to its exported files:
+#   {out_dir}/{label}-export_manifest.json
+# recording size / mtime / sha1 of every input, the export settings and the
+# files written. A later run skips the specimen when the settings are the
+# same, every output still exists and every input has the same content.
+# Hashing only happens when size or mtime changed, so an unchanged study
+# costs one stat() per input.
+# ---------------------------------------------------------------------------
+
+MANIFEST_SUFFIX = "-export_manifest.json"
+
+
+def manifest_path(out_dir, label):
+    return os.path.join(out_dir, f"{label}{MANIFEST_SUFFIX}")
+
+
+def _sha1(path, chunk_size=4 * 1024 * 1024):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def file_fingerprint(path, previous=None):
+    """{"size", "mtime_ns", "sha1"} of a file, or None if it does not exist.
+    The hash of `previous` is reused when size and mtime are unchanged."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if previous and previous.get("size") == st.st_size and previous.get("mtime_ns") == st.st_mtime_ns:
+        return dict(previous)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha1": _sha1(path)}
+
+
+def read_manifest(out_dir, label):
+    try:
+        with open(manifest_path(out_dir, label), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def check_manifest(out_dir, label, inputs, settings):
+    """Compare the current inputs against the stored manifest.
+
+    Returns (up_to_date, fingerprints) - the fingerprints are meant to be
+    passed on to write_manifest() after a (re-)export, so nothing is hashed
+    twice. A missing input never counts as up to date.
+    """
+    manifest = read_manifest(out_dir, label) or {}
+    old_inputs = manifest.get("inputs", {})
+    fingerprints = {p: file_fingerprint(p, old_inputs.get(p)) for p in inputs if p}
+
+    up_to_date = (
+        bool(manifest)
+        and manifest.get("settings") == settings
+        and set(old_inputs) == set(fingerprints)
+        and all(fp is not None and fp.get("sha1") == old_inputs[p].get("sha1") for p, fp in fingerprints.items())
+        and all(os.path.exists(p) for p in manifest.get("outputs", []))
+    )
+    if up_to_date and any(fp != old_inputs[p] for p, fp in fingerprints.items()):
+        # touched but identical content: refresh size/mtime so the next run does not hash again
+        write_manifest(out_dir, label, fingerprints, settings, manifest.get("outputs", []))
+    return up_to_date, fingerprints
+
+
+def write_manifest(out_dir, label, fingerprints, settings, outputs):
+    path = manifest_path(out_dir, label)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": 1, "label": label, "settings": settings,
+                   "inputs": fingerprints, "outputs": list(outputs)}, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def export_settings(cfg):
+    """The part of the config that changes what gets exported (manifest 'settings')."""
+    be_cfg = cfg.get("batch_export", {})
+    return {
+        "batch_export": {k: v for k, v in be_cfg.items() if k not in ("workers", "use_processes", "headless", "single_pass")},
+        "segments": [s.get("name") for s in cfg.get("segmentation", {}).get("segments", [])],
+    }
+
+
+# ---------------------------------------------------------------------------
+# Segment statistics table (batch_export.statistics)
+#
+# One study-wide table, one row per (specimen, segment). Each export run
+# replaces the rows of the specimens it exported and keeps the others, so
+# specimens skipped as unchanged keep their earlier statistics.
+# ---------------------------------------------------------------------------
+
+def statistics_table_path(cfg):
+    stats_cfg = cfg.get("batch_export", {}).get("statistics", {})
+    if not stats_cfg.get("enabled"):
+        return None
+    return export_table_path(cfg, stats_cfg.get("table", "segment_statistics.csv"))
+
+
+def statistics_intensity_path(cfg, specimen):
+    """Path of the batch_export.statistics.intensity_image of a specimen, None
+    if not configured or not resolvable."""
+    name = cfg.get("batch_export", {}).get("statistics", {}).get("intensity_image")
+    img_cfg = specimen.resolved_image_cfg(name) if name else None
+    if img_cfg is None:
+        return None
+    try:
+        return specimen.resolve_image_path(img_cfg)
+    except ValueError as e:
+        print(f"[SpecimenExport] {specimen.label}: {e}")
+        return None
+
+
+def update_statistics_table(cfg, statistics_by_key):
+    """Replace the rows of the specimens in {key tuple: [statistics rows]} in
+    the study's statistics table (added if new). Returns the table path."""
+    out_path = statistics_table_path(cfg)
+    if not out_path or not statistics_by_key:
+        return out_path
+    key_columns = list(cfg["key_columns"])
+    columns = key_columns + STATISTICS_FIELDS
+    replaced = {tuple(str(v) for v in key) for key in statistics_by_key}
+    try:
+        rows = [row for row in read_table(out_path)
+                if tuple(str(row.get(c, "")) for c in key_columns) not in replaced]
+    except (OSError, ValueError) as e:
+        print(f"[SpecimenExport] cannot read '{out_path}', starting a new table: {e}")
+        rows = []
+    for key, stats_rows in statistics_by_key.items():
+        head = dict(zip(key_columns, key))
+        rows.extend(dict(head, **row) for row in stats_rows)
+    write_table(out_path, rows, columns,
+                float_columns=[c for c in STATISTICS_FIELDS if c not in ("segment", "layer", "voxels")])
+    print(f"[SpecimenExport] statistics of {len(statistics_by_key)} specimens written to {out_path}")
+    return out_path
+
+
+# ---------------------------------------------------------------------------
+# Jobs
+# ---------------------------------------------------------------------------
+
+def build_export_jobs(cfg, specimens, force=False):
+    """One plain-dict job per done specimen (GenericSpecimen / SpecimenPaths objects)."""
+    be_cfg = cfg.get("batch_export", {})
+    done_col = cfg["done_column"]
+    ref_name = be_cfg.get("reference_image") or cfg["segmentation"].get("reference_image")
+    stats_cfg = be_cfg.get("statistics", {})
+
+    jobs = []
+    for specimen in specimens:
+        if specimen.db_info.get(done_col) != "1":
+            continue
+
+        job = {
+            "label": specimen.label,
+            "key": list(specimen.key),
+            "out_dir": specimen.export_dir(),
+            "seg_path": None,
+            "reference_path": None,
+            "segments_filter": be_cfg.get("segments_filter"),
+            "markups_path": None,
+            "output": be_cfg.get("output", "per_segment"),
+            "statistics": False,
+            "intensity_path": None,
+            "settings": export_settings(cfg),
+            "force": force,
+        }
+        if be_cfg.get("export_segments") and cfg["segmentation"].get("enabled"):
+            job["seg_path"] = specimen.segmentation_out_path()
+            ref_cfg = specimen.resolved_image_cfg(ref_name) if ref_name else None
+            if ref_cfg is not None:
+                try:
+                    job["reference_path"] = specimen.resolve_image_path(ref_cfg)
+                except ValueError as e:
+                    print(f"[SpecimenExport] {specimen.label}: {e}")
+            job["statistics"] = bool(stats_cfg.get("enabled"))
+            intensity_path = statistics_intensity_path(cfg, specimen) if job["statistics"] else None
+            if intensity_path:
+                job["intensity_path"] = intensity_path
+        if be_cfg.get("export_markups") and cfg["landmarks"].get("enabled") and not be_cfg.get("landmark_table"):
+            # with a landmark_table the markups go into the study-wide table instead (SpecimenLandmarks.py)
+            job["markups_path"] = specimen.markups_out_path()
+        jobs.append(job)
+    return jobs
+
+
+def export_specimen(job):
+    """Run one export job.
+
+    Returns {"label", "key", "written": [...], "statistics": [...] or None,
+    "skipped": bool, "error": str or None}; "skipped" means the manifest
+    showed nothing changed since the last run.
+    """
+    result = {"label": job["label"], "key": job["key"], "written": [], "statistics": None,
+              "skipped": False, "error": None}
+    out_dir = job["out_dir"]
+    os.makedirs(out_dir, exist_ok=True)
+
+    inputs = [job.get("seg_path"), job.get("reference_path"), job.get("markups_path"), job.get("intensity_path")]
+    up_to_date, fingerprints = check_manifest(out_dir, job["label"], inputs, job.get("settings"))
+    if up_to_date and not job.get("force"):
+        result["skipped"] = True
+        return result
+
+    seg_path = job.get("seg_path")
+    if seg_path:
+        if not os.path.exists(seg_path):
+            result["error"] = f"segmentation '{seg_path}' not found"
+            return result
+        layers, seg_grid, segments = read_segmentation_layers(seg_path)
+        ref_path = job.get("reference_path")
+        ref_grid = Grid.from_file(ref_path) if ref_path else seg_grid
+
+        segments_filter = job.get("segments_filter")
+        wanted = [s for s in segments if not segments_filter or s["name"] in segments_filter]
+        on_ref = [(layer_on_grid(layers[i], seg_grid, ref_grid), [s for s in wanted if s["layer"] == i])
+                  for i in sorted({s["layer"] for s in wanted})]
+        if job.get("statistics"):
+            intensity_path = job.get("intensity_path")
+            intensity = image_on_grid(intensity_path, ref_grid) if intensity_path else None
+            result["statistics"] = segment_statistics(on_ref, ref_grid, intensity)
+
+        if job.get("output") == "multilabel":
+            labels, label_table, n_overlap = merge_layers(on_ref)
+            if n_overlap:
+                print(f"[SpecimenExport] {job['label']}: {n_overlap} overlapping voxels, later segment wins")
+            image_file, table_file = multilabel_paths(out_dir, job["label"])
+            if labels is not None:
+                write_mask(labels, ref_grid, image_file)
+                result["written"].append(image_file)
+            write_label_table(table_file, label_table)
+            result["written"].append(table_file)
+        else:
+            for layer, layer_segments in on_ref:
+                for segment, mask in split_layer(layer, layer_segments):
+                    out_file = os.path.join(out_dir, f"{job['label']}-{segment['name']}.nii.gz")
+                    write_mask(mask, ref_grid, out_file)
+                    result["written"].append(out_file)
+
+    markups_path = job.get("markups_path")
+    if markups_path:
+        if os.path.exists(markups_path):
+            out_file = os.path.join(out_dir, f"{job['label']}-markups.mrk.json")
+            if os.path.abspath(out_file) != os.path.abspath(markups_path):
+                shutil.copyfile(markups_path, out_file)
+            result["written"].append(out_file)
+        else:
+            print(f"[SpecimenExport] {job['label']}: markups '{markups_path}' not found")
+
+    write_manifest(out_dir, job["label"], fingerprints, job.get("settings"), result["written"])
+    return result
+
+
+def _safe_export(job):
+    try:
+        return export_specimen(job)
+    except Exception as e:
+        return {"label": job["label"], "key": job["key"], "written": [], "statistics": None,
+                "skipped": False, "error": f"{type(e).__name__}: {e}"}
+
+
+def run_export_jobs(jobs, workers=None, use_processes=True, on_result=None):
+    """Export all jobs in parallel; returns the result dicts (completion order).
+
+    `use_processes=False` runs on a thread pool instead - use that inside
+    Slicer, where the embedded interpreter cannot spawn worker processes.
+    """
+    executor_cls = concurrent.futures.ProcessPoolExecutor if use_processes else concurrent.futures.ThreadPoolExecutor
+    results = []
+    with executor_cls(max_workers=workers) as executor:
+        futures = [executor.submit(_safe_export, job) for job in jobs]
+        for future in concurrent.futures.as_completed(futures):
+            result = future.result()
+            if result["error"]:
+                print(f"[SpecimenExport] {result['label']}: FAILED - {result['error']}")
+            elif result["skipped"]:
+                print(f"[SpecimenExport] {result['label']}: unchanged since the last export, skipped")
+            else:
+                for path in result["written"]:
+                    print(f"[SpecimenExport] saved {path}")
+            if on_result is not None:
+                on_result(result)
+            results.append(result)
+    return results
@@ -0,0 +1,468 @@
+"""
+SpecimenImageIO
+===============
+
+Scene-free image reading helpers for GenericSpecimenEngine.
+
+Nothing in here touches slicer / qt / the MRML scene, so everything can run
+on a worker thread (or in a plain Python process). Images are read with
+SimpleITK into a `CachedImage`: the voxel array (k, j, i order - same as
+slicer.util.arrayFromVolume) plus its geometry already converted to RAS, so
+the engine can build a volume node from it on the main thread without
+touching the file again.
+
+Progressive loading (`"progressive_load"` in README.md) uses block-mean
+proxies: a copy of a large image downsampled by an integer factor, written
+once to `<image dir>/.proxy/<name>-x<factor>.nrrd` and shown while the full
+resolution is read on `ProgressiveLoader`'s thread.
+"""
+
+import os
+import hashlib
+import threading
+import collections
+import concurrent.futures
+
+import numpy as np
+import SimpleITK as sitk
+
+from Resources.SpecimenSave import write_atomic
+
+
+_LPS_TO_RAS = np.diag([-1.0, -1.0, 1.0])
+
+
+class CachedImage:
+    """Decoded voxels + RAS geometry of one image file."""
+
+    __slots__ = ("path", "array", "origin", "spacing", "directions")
+
+    def __init__(self, path, array, origin, spacing, directions):
+        self.path = path
+        self.array = array                # numpy array, k-j-i order
+        self.origin = origin              # RAS, 3 floats
+        self.spacing = spacing            # 3 floats
+        self.directions = directions      # 3x3 nested list, IJK -> RAS direction columns
+
+    @property
+    def nbytes(self):
+        return int(self.array.nbytes)
+
+
+def _ras_geometry(itk_image):
+    origin = _LPS_TO_RAS.dot(np.array(itk_image.GetOrigin(), dtype=float))
+    lps_dirs = np.array(itk_image.GetDirection(), dtype=float).reshape(3, 3)
+    directions = _LPS_TO_RAS.dot(lps_dirs)
+    return [float(v) for v in origin], [float(v) for v in itk_image.GetSpacing()], directions.tolist()
+
+
+def read_image(path):
+    """Read (and decompress) an image file into a CachedImage."""
+    itk_image = sitk.ReadImage(path)
+    origin, spacing, directions = _ras_geometry(itk_image)
+    return CachedImage(path, sitk.GetArrayFromImage(itk_image), origin, spacing, directions)
+
+
+def read_images(paths, reader=read_image, workers=4):
+    """{path: (CachedImage or None, error or None)} of every path, decoded
+    concurrently on a thread pool (SimpleITK releases the GIL while reading
+    and decompressing, so the reads really overlap)."""
+    def read(path):
+        try:
+            return path, (reader(path), None)
+        except Exception as e:
+            return path, (None, e)
+
+    paths = list(dict.fromkeys(paths))
+    if not paths:
+        return {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, min(int(workers), len(paths)))) as executor:
+        return dict(executor.map(read, paths))
+
+
+def same_grid(image, size, ijk_to_ras, tol=1e-4):
+    """True if a CachedImage has `size` (i, j, k) voxels and the 4x4
+    `ijk_to_ras` geometry (within `tol` mm)."""
+    if list(image.array.shape[::-1]) != list(size):
+        return False
+    matrix = np.array(image.directions) * np.array(image.spacing)
+    return (np.allclose(matrix, np.asarray(ijk_to_ras)[:3, :3], atol=tol)
+            and np.allclose(image.origin, np.asarray(ijk_to_ras)[:3, 3], atol=tol))
+
+
+def _itk_image(image):
+    """SimpleITK image (LPS) of a CachedImage."""
+    itk_image = sitk.GetImageFromArray(image.array)
+    itk_image.SetOrigin([float(v) for v in _LPS_TO_RAS.dot(image.origin)])
+    itk_image.SetSpacing([float(v) for v in image.spacing])
+    itk_image.SetDirection([float(v) for v in _LPS_TO_RAS.dot(np.array(image.directions)).ravel()])
+    return itk_image
+
+
+def resample_to_grid(image, size, ijk_to_ras):
+    """CachedImage of `image` (a label / mask) resampled onto the grid of
+    `size` (i, j, k) voxels and 4x4 `ijk_to_ras`, nearest neighbour (so label
+    values stay labels), 0 outside the image."""
+    itk_image = _itk_image(image)
+    matrix = np.asarray(ijk_to_ras, dtype=float)
+    spacing = np.linalg.norm(matrix[:3, :3], axis=0)
+    resampled = sitk.Resample(itk_image, [int(v) for v in size], sitk.Transform(), sitk.sitkNearestNeighbor,
+                              [float(v) for v in _LPS_TO_RAS.dot(matrix[:3, 3])], [float(v) for v in spacing],
+                              [float(v) for v in _LPS_TO_RAS.dot(matrix[:3, :3] / spacing).ravel()], 0)
+    origin, spacing, directions = _ras_geometry(resampled)
+    return CachedImage(image.path, sitk.GetArrayFromImage(resampled), origin, spacing, directions)
+
+
+_COMPONENT_BYTES = {
+    sitk.sitkUInt8: 1, sitk.sitkInt8: 1, sitk.sitkVectorUInt8: 1, sitk.sitkVectorInt8: 1,
+    sitk.sitkUInt16: 2, sitk.sitkInt16: 2, sitk.sitkVectorUInt16: 2, sitk.sitkVectorInt16: 2,
+    sitk.sitkUInt32: 4, sitk.sitkInt32: 4, sitk.sitkVectorUInt32: 4, sitk.sitkVectorInt32: 4,
+    sitk.sitkFloat32: 4, sitk.sitkVectorFloat32: 4,
+}
+
+
+def estimate_image_bytes(path):
+    """Decoded size of an image, from its header only (no voxel data is read)."""
+    reader = sitk.ImageFileReader()
+    reader.SetFileName(path)
+    reader.ReadImageInformation()
+    n_voxels = int(np.prod(reader.GetSize()))
+    return n_voxels * reader.GetNumberOfComponents() * _COMPONENT_BYTES.get(reader.GetPixelID(), 8)
+
+
+# ---------------------------------------------------------------------------
+# ImagePrefetcher
+# ---------------------------------------------------------------------------
+
+class ImagePrefetcher:
+    """Decode image files on a single background thread into a bounded cache.
+
+    `schedule(paths)` replaces the wanted list (priority order). Anything not
+    in the new list is cancelled: pending reads are dropped, finished ones
+    are evicted, and an in-flight read is discarded when it completes.
+    `take(path)` pops a decoded CachedImage (or returns None) - the caller
+    owns it afterwards, so it no longer counts against the budget. If that
+    path is being decoded right now, take() waits for it instead of letting
+    the caller read the same file a second time.
+
+    The budget is checked from the file header BEFORE decoding, so a file
+    that would not fit is simply left for the normal (blocking) load path.
+    """
+
+    def __init__(self, budget_bytes, reader=read_image, estimator=estimate_image_bytes):
+        self.budget_bytes = int(budget_bytes)
+        self._reader = reader
+        self._estimator = estimator
+
+        self._lock = threading.Condition()
+        self._wanted = []            # paths in priority order
+        self._cache = {}             # path -> CachedImage
+        self._estimates = {}         # path -> decoded bytes (header based)
+        self._failed = set()         # paths that could not be read, not retried until rescheduled
+        self._blocked = False        # next wanted file does not fit the budget; wait for schedule()/take()
+        self._in_flight = None       # path currently being decoded
+        self._stop = False
+
+        self._thread = threading.Thread(target=self._run, name="GenericSpecimenPrefetch", daemon=True)
+        self._thread.start()
+
+    # ---- main thread API ----
+
+    def schedule(self, paths):
+        with self._lock:
+            self._wanted = [p for p in dict.fromkeys(paths) if p]
+            wanted = set(self._wanted)
+            for path in [p for p in self._cache if p not in wanted]:
+                del self._cache[path]
+            self._failed &= wanted
+            self._blocked = False
+            self._lock.notify_all()
+
+    def cancel(self):
+        self.schedule([])
+
+    def take(self, path):
+        with self._lock:
+            while self._in_flight == path and not self._stop:
+                self._lock.wait()
+            image = self._cache.pop(path, None)
+            if path in self._wanted:
+                self._wanted.remove(path)
+            self._blocked = False
+            self._lock.notify_all()
+            return image
+
+    def shutdown(self):
+        with self._lock:
+            self._stop = True
+            self._wanted = []
+            self._cache = {}
+            self._lock.notify_all()
+
+    @property
+    def cached_bytes(self):
+        with self._lock:
+            return self._cached_bytes()
+
+    # ---- worker ----
+
+    def _cached_bytes(self):
+        return sum(img.nbytes for img in self._cache.values())
+
+    def _next_candidate(self):
+        if self._blocked:
+            return None
+        for path in self._wanted:
+            if path not in self._cache and path not in self._failed:
+                return path
+        return None
+
+    def _run(self):
+        while True:
+            with self._lock:
+                path = None
+                while not self._stop:
+                    path = self._next_candidate()
+                    if path is not None:
+                        break
+                    self._lock.wait()
+                if self._stop:
+                    return
+
+            # header read / decode happen outside the lock - take() must never wait on the NAS
+            estimate = self._estimates.get(path)
+            if estimate is None:
+                try:
+                    estimate = self._estimator(path)
+                except Exception as e:
+                    print(f"[ImagePrefetcher] cannot read header of '{path}': {e}")
+                    with self._lock:
+                        self._failed.add(path)
+                    continue
+                self._estimates[path] = estimate
+
+            with self._lock:
+                if path not in self._wanted:
+                    continue
+                if self._cached_bytes() + estimate > self.budget_bytes:
+                    # strictly in priority order: do not skip ahead past a file that does not fit
+                    self._blocked = True
+                    continue
+                self._in_flight = path
+
+            try:
+                image = self._reader(path)
+            except Exception as e:
+                print(f"[ImagePrefetcher] failed to decode '{path}': {e}")
+                image = None
+
+            with self._lock:
+                self._in_flight = None
+                if image is None:
+                    self._failed.add(path)
+                elif path in self._wanted and not self._stop:
+                    self._cache[path] = image
+                self._lock.notify_all()
+
+
+# ---------------------------------------------------------------------------
+# Progressive loading: block-mean proxies
+# ---------------------------------------------------------------------------
+
+PROXY_DIR = ".proxy"
+
+
+def proxy_path(path, factor, proxy_dir=None):
+    """Proxy file of `path`: in `proxy_dir` (named after a hash of the source
+    path, so equally named images of different specimens do not collide), or
+    in PROXY_DIR next to the image without one."""
+    name = f"{node_name_from_path(path)}-x{int(factor)}.nrrd"
+    if proxy_dir:
+        digest = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:16]
+        return os.path.join(proxy_dir, f"{digest}-{name}")
+    return os.path.join(os.path.dirname(path), PROXY_DIR, name)
+
+
+def proxy_is_fresh(path, proxy):
+    """The proxy exists and is not older than its source."""
+    try:
+        return os.path.getmtime(proxy) >= os.path.getmtime(path)
+    except OSError:
+        return False
+
+
+def downsample(array, factor, labelmap=False):
+    """(k, j, i) array reduced by `factor` along every axis.
+
+    Intensities: mean of each factor^3 block (partial blocks at the far
+    edges average what is there), computed one k-slab at a time so the
+    float temporary stays one slab large. Labelmaps: the centre voxel of each
+    block, so no label values are invented.
+
+    Returns (small array, (i, j, k) index of the first block's centre in
+    the source grid).
+    """
+    f = int(factor)
+    if labelmap:
+        c = f // 2
+        return np.ascontiguousarray(array[c::f, c::f, c::f]), np.array([c, c, c], dtype=float)
+
+    nk, nj, ni = array.shape
+    pad_j, pad_i = -nj % f, -ni % f
+    out = np.empty(((nk + f - 1) // f, (nj + pad_j) // f, (ni + pad_i) // f), dtype=np.float32)
+    for index, k0 in enumerate(range(0, nk, f)):
+        slab = array[k0:k0 + f].astype(np.float32).mean(axis=0)
+        if pad_j or pad_i:
+            slab = np.pad(slab, ((0, pad_j), (0, pad_i)), mode="edge")
+        out[index] = slab.reshape(slab.shape[0] // f, f, slab.shape[1] // f, f).mean(axis=(1, 3))
+    if np.issubdtype(array.dtype, np.integer):
+        info = np.iinfo(array.dtype)
+        out = np.clip(np.rint(out), info.min, info.max)
+    centre = (f - 1) / 2.0
+    return out.astype(array.dtype), np.array([centre, centre, centre])
+
+
+def write_proxy(path, factor, labelmap=False, image=None, proxy_dir=None):
+    """Write the proxy of `path` (replaced atomically) from `image`, its
+    already decoded CachedImage, or else from the file; returns the proxy path."""
+    if image is not None:
+        array = image.array
+        origin = _LPS_TO_RAS.dot(np.array(image.origin, dtype=float))
+        spacing = np.array(image.spacing, dtype=float)
+        direction = _LPS_TO_RAS.dot(np.array(image.directions, dtype=float))
+    else:
+        itk_image = sitk.ReadImage(path)
+        if itk_image.GetNumberOfComponentsPerPixel() > 1:
+            raise ValueError(f"'{path}' is not a scalar image, no proxy")
+        array = sitk.GetArrayFromImage(itk_image)
+        origin = np.array(itk_image.GetOrigin(), dtype=float)
+        spacing = np.array(itk_image.GetSpacing(), dtype=float)
+        direction = np.array(itk_image.GetDirection(), dtype=float).reshape(3, 3)
+    if array.ndim != 3:
+        raise ValueError(f"'{path}' is not a scalar image, no proxy")
+    small, first_centre = downsample(array, factor, labelmap)
+    proxy = sitk.GetImageFromArray(small)
+    proxy.SetSpacing([float(v) for v in spacing * factor])
+    proxy.SetOrigin([float(v) for v in origin + direction.dot(first_centre * spacing)])
+    proxy.SetDirection([float(v) for v in direction.ravel()])
+    out = proxy_path(path, factor, proxy_dir)
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    write_atomic(out, lambda tmp_path: sitk.WriteImage(proxy, tmp_path, False))
+    return out
+
+
+def header_geometry(path):
+    """(size (i, j, k), RAS origin, spacing, IJK -> RAS direction columns) from the header only."""
+    reader = sitk.ImageFileReader()
+    reader.SetFileName(path)
+    reader.ReadImageInformation()
+    origin = _LPS_TO_RAS.dot(np.array(reader.GetOrigin(), dtype=float))
+    directions = _LPS_TO_RAS.dot(np.array(reader.GetDirection(), dtype=float).reshape(3, 3))
+    return ([int(v) for v in reader.GetSize()], [float(v) for v in origin],
+            [float(v) for v in reader.GetSpacing()], directions.tolist())
+
+
+class ProgressiveLoader:
+    """One background thread for progressive loading.
+
+    `request_full(path)` decodes the full resolution image into a
+    CachedImage; `request_proxy(path, factor, labelmap, image)` writes a
+    missing proxy into `proxy_dir` (see proxy_path), from `image` if the
+    caller has decoded the file already (full reads go first). `poll(paths)`
+    hands out the finished full reads of `paths` as (path, CachedImage or
+    None, error or None) - each specimen polls only its own paths from a qt
+    timer on the main thread. `cancel(paths)` drops queued and finished
+    reads of `paths`.
+    """
+
+    def __init__(self, reader=read_image, proxy_dir=None):
+        self._reader = reader
+        self.proxy_dir = proxy_dir
+        self._lock = threading.Condition()
+        self._full = collections.OrderedDict()     # path -> None, queued full reads
+        self._proxies = collections.OrderedDict()  # path -> (factor, labelmap, CachedImage or None), queued proxy writes
+        self._done = {}                            # path -> (CachedImage or None, error)
+        self._in_flight = None                     # path of the full read running now
+        self._cancelled = set()                    # in-flight reads to discard when they complete
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name="GenericSpecimenProgressive", daemon=True)
+        self._thread.start()
+
+    def proxy_path(self, path, factor):
+        return proxy_path(path, factor, self.proxy_dir)
+
+    def request_full(self, path):
+        with self._lock:
+            self._cancelled.discard(path)
+            self._full[path] = None
+            self._lock.notify_all()
+
+    def request_proxy(self, path, factor, labelmap=False, image=None):
+        with self._lock:
+            if image is not None or path not in self._proxies:
+                self._proxies[path] = (int(factor), labelmap, image)
+            self._lock.notify_all()
+
+    def poll(self, paths):
+        with self._lock:
+            return [(path,) + self._done.pop(path) for path in list(paths) if path in self._done]
+
+    def cancel(self, paths):
+        with self._lock:
+            for path in paths:
+                self._full.pop(path, None)
+                self._done.pop(path, None)
+                if path == self._in_flight:
+                    self._cancelled.add(path)    # discarded when it completes
+
+    def shutdown(self):
+        with self._lock:
+            self._stop = True
+            self._full.clear()
+            self._proxies.clear()
+            self._done.clear()
+            self._lock.notify_all()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._full and not self._proxies and not self._stop:
+                    self._lock.wait()
+                if self._stop:
+                    return
+                if self._full:
+                    path, _ = self._full.popitem(last=False)
+                    proxy_job = None
+                    self._in_flight = path
+                else:
+                    path, proxy_job = self._proxies.popitem(last=False)
+
+            if proxy_job is not None:
+                factor, labelmap, image = proxy_job
+                try:
+                    print(f"[ProgressiveLoader] wrote proxy "
+                          f"{write_proxy(path, factor, labelmap, image, self.proxy_dir)}")
+                except Exception as e:
+                    print(f"[ProgressiveLoader] no proxy for '{path}': {e}")
+                continue
+
+            image, error = None, None
+            try:
+                image = self._reader(path)
+            except Exception as e:
+                error = e
+            with self._lock:
+                self._in_flight = None
+                if path in self._cancelled:
+                    self._cancelled.discard(path)
+                elif not self._stop:
+                    self._done[path] = (image, error)
+
+
+def node_name_from_path(path):
+    """Same naming as slicer.util.loadVolume: file name without (double) extension."""
+    name = os.path.basename(path)
+    for ext in (".nii.gz", ".seg.nrrd", ".mrk.json"):
+        if name.endswith(ext):
+            return name[:-len(ext)]
+    return os.path.splitext(name)[0]
@@ -0,0 +1,202 @@
+"""
+SpecimenJournal
+===============
+
+Crash-safe autosave journal of one specimen's unsaved edits.
+
+The journal is a directory (`<out_dir>/.autosave/` by default) holding
+
+  journal.json        index: segment id -> entry file, name, color, sequence
+                      number; removed segment ids; the markups entry
+  seg-<n>.npz         one edited segment: its binary mask cropped to its
+                      bounding box (compressed), the IJK extent of that crop
+                      and the IJK -> RAS matrix of the labelmap it came from
+  markups.mrk.json    the markups, written by the caller's storage node
+
+Only the segments that changed since the last autosave are written, so the
+cost scales with what was edited, not with the whole segmentation. Every file
+(index included) is replaced atomically, so a crash in the middle of an
+autosave leaves the previous journal state readable.
+
+Every write bumps a sequence number. `clear(up_to_seq)` removes only entries
+not newer than a given sequence number, which lets a background save discard
+exactly what it persisted while newer edits stay journaled.
+
+Nothing here touches slicer; the engine converts between segments and the
+plain arrays stored here.
+"""
+
+import os
+import json
+import threading
+
+import numpy as np
+
+from Resources.SpecimenSave import write_atomic
+
+
+INDEX_NAME = "journal.json"
+MARKUPS_NAME = "markups.mrk.json"
+
+
+def crop_to_bbox(mask, extent):
+    """Crop a (k, j, i) mask to its non-zero bounding box.
+
+    `extent` is the VTK extent (i0, i1, j0, j1, k0, k1) of `mask`. Returns
+    (cropped mask, cropped extent); an empty mask gives a (0, 0, 0) array and
+    the empty extent (0, -1, 0, -1, 0, -1).
+    """
+    nonzero = [np.flatnonzero(mask.any(axis=axes)) for axes in ((0, 1), (0, 2), (1, 2))]  # i, j, k
+    if any(len(idx) == 0 for idx in nonzero):
+        return np.zeros((0, 0, 0), dtype=np.uint8), (0, -1, 0, -1, 0, -1)
+    (i0, i1), (j0, j1), (k0, k1) = [(int(idx[0]), int(idx[-1])) for idx in nonzero]
+    cropped = mask[k0:k1 + 1, j0:j1 + 1, i0:i1 + 1]
+    return cropped, (extent[0] + i0, extent[0] + i1, extent[2] + j0, extent[2] + j1,
+                     extent[4] + k0, extent[4] + k1)
+
+
+class SegmentJournal:
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()   # the background save clears entries from its own thread
+        self._index = self._read_index()
+
+    # ---- index ----
+
+    def _read_index(self):
+        path = os.path.join(self.directory, INDEX_NAME)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+        index.setdefault("seq", 0)
+        index.setdefault("segments", {})
+        index.setdefault("removed", {})
+        index.setdefault("markups", None)
+        return index
+
+    def _write_index(self):
+        def write(tmp_path):
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._index, f, indent=1)
+        write_atomic(os.path.join(self.directory, INDEX_NAME), write)
+
+    def _next_seq(self):
+        self._index["seq"] += 1
+        return self._index["seq"]
+
+    @property
+    def seq(self):
+        with self._lock:
+            return self._index["seq"]
+
+    def has_entries(self):
+        with self._lock:
+            return bool(self._index["segments"] or self._index["removed"] or self._index["markups"])
+
+    def summary(self):
+        """Short human readable description of what the journal holds."""
+        with self._lock:
+            parts = []
+            names = [e["name"] for e in self._index["segments"].values()]
+            if names:
+                parts.append(f"{len(names)} edited segment(s): {', '.join(names)}")
+            if self._index["removed"]:
+                parts.append(f"{len(self._index['removed'])} removed segment(s)")
+            if self._index["markups"]:
+                parts.append("edited landmarks")
+            return "; ".join(parts)
+
+    # ---- writing ----
+
+    def write_segment(self, segment_id, name, color, mask, extent, ijk_to_ras):
+        """Journal one segment. `mask` is (k, j, i) over VTK `extent`; it is
+        cropped to its bounding box before being written."""
+        cropped, cropped_extent = crop_to_bbox(np.asarray(mask) != 0, extent)
+        with self._lock:
+            entry = self._index["segments"].get(segment_id)
+            file_name = entry["file"] if entry else f"seg-{self._index['seq'] + 1}.npz"
+
+            def write(tmp_path):
+                with open(tmp_path, "wb") as f:
+                    np.savez_compressed(f, mask=cropped.astype(np.uint8), extent=np.array(cropped_extent),
+                                        ijk_to_ras=np.array(ijk_to_ras, dtype=float).reshape(4, 4))
+            write_atomic(os.path.join(self.directory, file_name), write)
+
+            self._index["removed"].pop(segment_id, None)
+            self._index["segments"][segment_id] = {"file": file_name, "name": name,
+                                                   "color": list(color) if color is not None else None,
+                                                   "seq": self._next_seq()}
+            self._write_index()
+
+    def remove_segment(self, segment_id):
+        with self._lock:
+            entry = self._index["segments"].pop(segment_id, None)
+            if entry:
+                self._remove_file(entry["file"])
+            self._index["removed"][segment_id] = self._next_seq()
+            self._write_index()
+
+    def write_markups(self, write_fn):
+        """`write_fn(path)` writes the markups file (a temp name is passed)."""
+        with self._lock:
+            write_atomic(os.path.join(self.directory, MARKUPS_NAME), write_fn)
+            self._index["markups"] = {"file": MARKUPS_NAME, "seq": self._next_seq()}
+            self._write_index()
+
+    # ---- reading (replay) ----
+
+    def segments(self):
+        """[(segment id, name, color, mask, extent, ijk_to_ras)] in journal order."""
+        with self._lock:
+            entries = sorted(self._index["segments"].items(), key=lambda item: item[1]["seq"])
+        result = []
+        for segment_id, entry in entries:
+            with np.load(os.path.join(self.directory, entry["file"])) as data:
+                result.append((segment_id, entry["name"], entry["color"], data["mask"],
+                               tuple(int(v) for v in data["extent"]), data["ijk_to_ras"]))
+        return result
+
+    def removed_segments(self):
+        with self._lock:
+            return list(self._index["removed"])
+
+    def markups_path(self):
+        with self._lock:
+            entry = self._index["markups"]
+        return os.path.join(self.directory, entry["file"]) if entry else None
+
+    # ---- clearing ----
+
+    def clear(self, up_to_seq=None):
+        """Drop entries with seq <= up_to_seq (everything if None)."""
+        with self._lock:
+            if not os.path.isdir(self.directory):
+                return
+            for segment_id, entry in list(self._index["segments"].items()):
+                if up_to_seq is None or entry["seq"] <= up_to_seq:
+                    self._remove_file(entry["file"])
+                    del self._index["segments"][segment_id]
+            for segment_id, seq in list(self._index["removed"].items()):
+                if up_to_seq is None or seq <= up_to_seq:
+                    del self._index["removed"][segment_id]
+            markups = self._index["markups"]
+            if markups and (up_to_seq is None or markups["seq"] <= up_to_seq):
+                self._remove_file(markups["file"])
+                self._index["markups"] = None
+
+            if self._index["segments"] or self._index["removed"] or self._index["markups"]:
+                self._write_index()
+            else:
+                self._remove_file(INDEX_NAME)
+                try:
+                    os.rmdir(self.directory)
+                except OSError:
+                    pass
+
+    def _remove_file(self, name):
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except OSError:
+            pass
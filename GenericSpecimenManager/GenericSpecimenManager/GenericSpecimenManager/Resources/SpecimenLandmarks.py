@@ -0,0 +1,234 @@
+"""
+SpecimenLandmarks
+=================
+
+Cohort-wide landmark table (`"landmark_table"` under batch_export in
+README.md): every control point of every done specimen's markups file in
+one long-format table,
+
+    <key columns...>, trial, markup, label, description, x, y, z, position_status
+
+read straight from the .mrk.json files (plain json, no scene), several
+files in parallel. Coordinates are RAS, as Slicer shows them: files saved
+in LPS (the default since Slicer 4.11) are converted.
+
+The table is `.csv`, or `.parquet` when its name says so (needs pandas with
+pyarrow). Next to it, `<table>.manifest.json` keeps the mtime / size of
+every markups file the table was built from; on the next run the rows of
+specimens whose file did not change are taken over from the old table and
+only the changed files are parsed again.
+
+Nothing in here imports slicer.
+"""
+
+import os
+import csv
+import json
+import concurrent.futures
+
+from Resources.SpecimenSave import write_atomic
+from Resources.SpecimenStudy import export_table_path
+
+
+VALUE_COLUMNS = ["trial", "markup", "label", "description", "x", "y", "z", "position_status"]
+MANIFEST_SUFFIX = ".manifest.json"
+
+
+# ---------------------------------------------------------------------------
+# Markups files
+# ---------------------------------------------------------------------------
+
+def read_markups(path):
+    """One dict per control point of a .mrk.json file (VALUE_COLUMNS without
+    "trial"); x, y, z in RAS, None for a point without a position."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    rows = []
+    for markup in data.get("markups", []):
+        lps = markup.get("coordinateSystem", "LPS") == "LPS"
+        name = markup.get("name", "")
+        for point in markup.get("controlPoints", []):
+            position = point.get("position")
+            if position and len(position) == 3:
+                x, y, z = (float(v) for v in position)
+                if lps:
+                    x, y = -x, -y
+            else:
+                x = y = z = None
+            rows.append({"markup": name, "label": point.get("label", ""),
+                         "description": point.get("description", ""),
+                         "x": x, "y": y, "z": z,
+                         "position_status": point.get("positionStatus", "")})
+    return rows
+
+
+def _fingerprint(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+# ---------------------------------------------------------------------------
+# Table files
+# ---------------------------------------------------------------------------
+
+def _is_parquet(path):
+    return path.lower().endswith(".parquet")
+
+
+def _pandas():
+    try:
+        import pandas
+    except ImportError:
+        raise RuntimeError("a .parquet table needs pandas (with pyarrow); use a .csv name instead")
+    return pandas
+
+
+def read_table(path):
+    """Rows of an existing landmark table, [] if there is none."""
+    if not os.path.exists(path):
+        return []
+    if _is_parquet(path):
+        frame = _pandas().read_parquet(path)
+        return frame.astype(object).where(frame.notna(), None).to_dict("records")
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        return list(csv.DictReader(f))
+
+
+def write_table(path, rows, columns, float_columns=()):
+    """Write `rows` (dicts) as .csv, or .parquet if `path` says so; in
+    Parquet, `float_columns` are stored as floats (empty cells as NaN)."""
+    def write(tmp_path):
+        if _is_parquet(path):
+            frame = _pandas().DataFrame(rows, columns=columns)
+            for column in float_columns:
+                frame[column] = frame[column].astype(float)
+            frame.to_parquet(tmp_path, index=False)
+        else:
+            with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=columns, extrasaction="ignore")
+                writer.writeheader()
+                writer.writerows(rows)
+    write_atomic(path, write)
+
+
+def _read_manifest(path):
+    try:
+        with open(path + MANIFEST_SUFFIX, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_manifest(path, columns, entries):
+    def write(tmp_path):
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "columns": columns, "entries": entries}, f, indent=1)
+    write_atomic(path + MANIFEST_SUFFIX, write)
+
+
+# ---------------------------------------------------------------------------
+# Export
+# ---------------------------------------------------------------------------
+
+def _job_id(job, key_columns):
+    return json.dumps([str(job["key"].get(c, "")) for c in key_columns] + [str(job.get("trial", ""))])
+
+
+def _row_id(row, key_columns):
+    return json.dumps([str(row.get(c, "")) for c in key_columns] + [str(row.get("trial", ""))])
+
+
+def export_landmark_table(jobs, out_path, key_columns, workers=None, force=False):
+    """Write the landmark table of `jobs` to `out_path`.
+
+    A job is {"key": {key column: value}, "trial": str, "path": markups file}.
+    Jobs whose file is unchanged since the last run (per the manifest) keep
+    their old rows unless `force` is set; a missing file contributes no rows.
+    Returns {"read", "kept", "missing", "failed": [(path, error)], "rows"}.
+    """
+    columns = list(key_columns) + VALUE_COLUMNS
+    manifest = _read_manifest(out_path)
+    old_entries = manifest.get("entries", {}) if manifest.get("columns") == columns else {}
+    reuse = not force and bool(old_entries)
+
+    old_rows = {}
+    if reuse:
+        try:
+            for row in read_table(out_path):
+                old_rows.setdefault(_row_id(row, key_columns), []).append(row)
+        except (OSError, ValueError) as e:
+            print(f"[SpecimenLandmarks] cannot read '{out_path}', rebuilding it: {e}")
+            old_entries = {}
+
+    result = {"read": 0, "kept": 0, "missing": 0, "failed": [], "rows": 0}
+    entries, rows_by_job, to_read = {}, {}, []
+    for job in jobs:
+        job_id = _job_id(job, key_columns)
+        fingerprint = _fingerprint(job["path"])
+        if fingerprint is None:
+            result["missing"] += 1
+            continue
+        entries[job_id] = {"path": job["path"], "fingerprint": fingerprint}
+        old = old_entries.get(job_id) or {}
+        kept_rows = old_rows.get(job_id, [])
+        if (reuse and old.get("path") == job["path"] and old.get("fingerprint") == fingerprint
+                and old.get("rows") == len(kept_rows)):
+            rows_by_job[job_id] = kept_rows
+            result["kept"] += 1
+        else:
+            to_read.append((job_id, job))
+
+    def read(item):
+        job_id, job = item
+        head = dict({c: job["key"].get(c, "") for c in key_columns}, trial=job.get("trial", ""))
+        return job_id, [dict(head, **point) for point in read_markups(job["path"])]
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers or 8) as executor:
+        futures = {executor.submit(read, item): item for item in to_read}
+        for future in concurrent.futures.as_completed(futures):
+            job_id, job = futures[future]
+            try:
+                rows_by_job[job_id] = future.result()[1]
+                result["read"] += 1
+            except (OSError, ValueError) as e:
+                result["failed"].append((job["path"], str(e)))
+                entries.pop(job_id, None)       # retried on the next run
+
+    rows = []
+    for job in jobs:
+        job_id = _job_id(job, key_columns)
+        if job_id in entries:
+            entries[job_id]["rows"] = len(rows_by_job[job_id])
+            rows.extend(rows_by_job[job_id])
+    write_table(out_path, rows, columns, float_columns=("x", "y", "z"))
+    _write_manifest(out_path, columns, entries)
+    result["rows"] = len(rows)
+    return result
+
+
+def landmark_table_path(cfg):
+    """batch_export.landmark_table (absolute, or relative to the export
+    directory / study_dir), None if not configured."""
+    return export_table_path(cfg, cfg.get("batch_export", {}).get("landmark_table"))
+
+
+def export_study_landmarks(cfg, specimens, workers=None, force=False):
+    """The landmark table of the done specimens of a study (GenericSpecimen /
+    SpecimenPaths objects) at landmark_table_path(cfg). Returns the
+    export_landmark_table result, None if no table is configured."""
+    out_path = landmark_table_path(cfg)
+    if not out_path or not cfg["batch_export"].get("export_markups") or not cfg["landmarks"].get("enabled"):
+        return None
+    done_col = cfg["done_column"]
+    jobs = [{"key": dict(zip(cfg["key_columns"], specimen.key)), "trial": "",
+             "path": specimen.markups_out_path()}
+            for specimen in specimens if specimen.db_info.get(done_col) == "1"]
+    result = export_landmark_table(jobs, out_path, cfg["key_columns"], workers, force)
+    for path, error in result["failed"]:
+        print(f"[SpecimenLandmarks] cannot read '{path}': {error}")
+    print(f"[SpecimenLandmarks] {result['rows']} landmarks written to {out_path} "
+          f"({result['read']} files read, {result['kept']} unchanged, {result['missing']} missing)")
+    return result
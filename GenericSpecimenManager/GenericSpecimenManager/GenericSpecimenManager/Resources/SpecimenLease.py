@@ -0,0 +1,214 @@
+"""
+SpecimenLease
+=============
+
+Lock files so several Slicer seats can work on one study directory without
+opening (and saving over) the same specimen.
+
+A lease is `<lease_dir>/<label>.lease`, a small json naming its holder
+(user, host, pid) and the time of its last heartbeat. It is created with
+O_CREAT | O_EXCL, so of two seats racing for a free specimen exactly one
+wins. The holder rewrites the heartbeat periodically; a lease whose
+heartbeat is older than `ttl_s` belongs to a crashed / disconnected seat and
+may be taken over. Takeover first renames the stale file to a tombstone
+name unique to this seat - a rename that only one seat can win - and then
+creates the lease with O_EXCL as for a free specimen, so of two seats taking
+over the same stale lease only one ends up holding it. (A seat that judged
+the lease stale late and renamed a fresh one puts it back with a hard link,
+or an O_EXCL-created copy where the share has no hard links.)
+
+Nothing in here imports slicer.
+"""
+
+import os
+import json
+import time
+import uuid
+import socket
+import getpass
+
+from Resources.SpecimenSave import temp_path_for, replace_atomic
+
+
+LEASE_SUFFIX = ".lease"
+
+
+def default_owner():
+    try:
+        user = getpass.getuser()
+    except Exception:
+        user = "unknown"
+    return f"{user}@{socket.gethostname()}:{os.getpid()}"
+
+
+class LeaseManager:
+    def __init__(self, lease_dir, ttl_s=300, owner=None):
+        self.lease_dir = lease_dir
+        self.ttl_s = float(ttl_s)
+        self.owner = owner or default_owner()
+        self.held = set()          # labels this seat holds
+
+    def _path(self, label):
+        return os.path.join(self.lease_dir, f"{label}{LEASE_SUFFIX}")
+
+    def _record(self, label, acquired=None):
+        now = time.time()
+        return {"label": label, "owner": self.owner, "acquired": acquired or now, "heartbeat": now}
+
+    def read(self, label):
+        """Lease info of `label`, None if there is no lease file."""
+        path = self._path(label)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except ValueError:
+            # being written right now (O_EXCL create, content follows): age it by mtime
+            try:
+                return {"label": label, "owner": None, "heartbeat": os.path.getmtime(path)}
+            except OSError:
+                return None
+        except OSError:
+            return None
+
+    def is_stale(self, info):
+        return info is None or time.time() - float(info.get("heartbeat", 0)) > self.ttl_s
+
+    def _create(self, label):
+        """O_EXCL-create the lease file of `label`; False if it exists."""
+        try:
+            fd = os.open(self._path(label), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self._record(label), f)
+        return True
+
+    def _remove_stale(self, label):
+        """Move a stale lease file out of the way. Only one of several seats
+        racing for it gets to rename it; False for the others. A seat that
+        judged the lease stale late may rename the fresh lease a faster seat
+        has just created: that one is checked and put back."""
+        path = self._path(label)
+        tombstone = f"{path}.stale-{uuid.uuid4().hex}"
+        try:
+            os.rename(path, tombstone)
+        except OSError:
+            return False
+        try:
+            with open(tombstone, "rb") as f:
+                content = f.read()
+            info = json.loads(content.decode("utf-8"))
+        except (OSError, ValueError):
+            content, info = None, None
+        stale = info is None or self.is_stale(info)
+        if not stale:
+            self._restore(tombstone, path, content)
+        try:
+            os.remove(tombstone)
+        except OSError:
+            pass
+        return stale
+
+    @staticmethod
+    def _restore(tombstone, path, content):
+        """Put a fresh lease moved to `tombstone` back at `path`, unless a
+        lease exists there again (never overwrites it). os.link keeps the
+        file as it was; shares without hard links (SMB / CIFS) get an
+        O_EXCL-created copy of its content instead."""
+        try:
+            os.link(tombstone, path)
+            return
+        except FileExistsError:
+            return
+        except OSError:
+            pass
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except OSError:
+            return
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+
+    def acquire(self, label):
+        """Try to lease `label`. Returns (True, None) or (False, holder info)."""
+        os.makedirs(self.lease_dir, exist_ok=True)
+        if not self._create(label):
+            info = self.read(label)
+            if info is not None and info.get("owner") == self.owner:
+                self.held.add(label)
+                self.heartbeat(label)
+                return True, None
+            if info is not None and not self.is_stale(info):
+                return False, info
+            print(f"[LeaseManager] taking over stale lease of {label} "
+                  f"(held by {info.get('owner') if info else 'unknown'})")
+            if not (self._remove_stale(label) and self._create(label)):
+                return False, self.read(label)
+        self.held.add(label)
+        return True, None
+
+    def _is_ours(self, info):
+        return info is not None and info.get("owner") == self.owner
+
+    def heartbeat(self, label):
+        """Refresh our lease of `label`. False if it is no longer ours (expired
+        and taken over by another seat); the label is then dropped from `held`.
+
+        The new record is written to a temp file first and the lease is read
+        again right before the temp file replaces it, so a seat whose lease
+        was taken over while it stalled does not overwrite the new holder."""
+        info = self.read(label)
+        if not self._is_ours(info):
+            self.held.discard(label)
+            return False
+        path = self._path(label)
+        tmp_path = temp_path_for(path)
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._record(label, info.get("acquired")), f)
+            if not self._is_ours(self.read(label)):
+                os.remove(tmp_path)
+                self.held.discard(label)
+                return False
+            replace_atomic(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+            raise
+        return True
+
+    def heartbeat_all(self):
+        """Heartbeat every held lease; returns the labels that were lost."""
+        return [label for label in list(self.held) if not self.heartbeat(label)]
+
+    def release(self, label):
+        info = self.read(label)
+        if info is not None and info.get("owner") == self.owner:
+            try:
+                os.remove(self._path(label))
+            except OSError:
+                pass
+        self.held.discard(label)
+
+    def release_all(self):
+        for label in list(self.held):
+            self.release(label)
+
+    def holders(self):
+        """{label: holder info} of every live (not stale) lease - one directory scan."""
+        result = {}
+        try:
+            names = os.listdir(self.lease_dir)
+        except OSError:
+            return result
+        for name in names:
+            if not name.endswith(LEASE_SUFFIX):
+                continue
+            label = name[:-len(LEASE_SUFFIX)]
+            info = self.read(label)
+            if info is not None and not self.is_stale(info):
+                result[label] = info
+        return result
@@ -0,0 +1,142 @@
+"""
+SpecimenSave
+============
+
+Atomic file replacement and a coalescing background writer for
+GenericSpecimen.save.
+
+Every file is written to a temporary name in the same directory first and
+renamed over the target with os.replace only after it was written (and
+fsync'ed) completely, so an interrupted save leaves the previous file in
+place instead of a truncated one.
+
+`BackgroundWriter` runs the write callables on one worker thread. It knows
+nothing about slicer: the engine hands it a callable that writes an already
+snapshotted (scene-detached) node. Submitting a new write for a key that is
+still queued replaces the queued one (coalescing), so hammering "Save" only
+writes the latest state once.
+"""
+
+import os
+import threading
+import collections
+
+
+def temp_path_for(path):
+    """Temporary sibling of `path`. The prefix (not a suffix) changes, so
+    writers that pick the format from the extension (.seg.nrrd, .mrk.json)
+    still recognize it."""
+    directory, name = os.path.split(path)
+    return os.path.join(directory, f".saving-{os.getpid()}-{name}")
+
+
+def replace_atomic(tmp_path, path):
+    """fsync `tmp_path` and rename it over `path`."""
+    with open(tmp_path, "rb+") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def write_atomic(path, write_fn):
+    """Call `write_fn(tmp_path)`, then atomically move the result to `path`.
+    The temporary file is removed if writing fails."""
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = temp_path_for(path)
+    try:
+        write_fn(tmp_path)
+        if not os.path.exists(tmp_path):
+            raise IOError(f"writer did not produce '{tmp_path}'")
+        replace_atomic(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+        raise
+
+
+# ---------------------------------------------------------------------------
+# BackgroundWriter
+# ---------------------------------------------------------------------------
+
+class BackgroundWriter:
+    """Single worker thread running `write_fn()` callables.
+
+    `submit(key, write_fn, description)` queues a write; a write already
+    queued (not yet started) under the same key is replaced. Finished writes
+    are collected as (key, description, error-or-None) and handed out by
+    `poll_results()` - the widget polls that from a qt timer, so completion
+    and failure are reported on the main thread.
+    """
+
+    def __init__(self):
+        self._lock = threading.Condition()
+        self._queue = collections.OrderedDict()   # key -> (write_fn, description)
+        self._in_flight = None
+        self._results = []
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name="GenericSpecimenSave", daemon=True)
+        self._thread.start()
+
+    def submit(self, key, write_fn, description=""):
+        with self._lock:
+            if key in self._queue:
+                print(f"[BackgroundWriter] coalescing queued save of {description or key}")
+                del self._queue[key]
+            self._queue[key] = (write_fn, description)
+            self._lock.notify_all()
+
+    def pending(self, prefix=None):
+        """Keys queued or being written (optionally only keys starting with `prefix`)."""
+        with self._lock:
+            keys = list(self._queue) + ([self._in_flight] if self._in_flight is not None else [])
+        if prefix is None:
+            return keys
+        return [k for k in keys if k[:len(prefix)] == prefix]
+
+    def wait(self, prefix=None, timeout=None):
+        """Block until nothing matching `prefix` is queued or in flight."""
+        with self._lock:
+            def busy():
+                keys = list(self._queue) + ([self._in_flight] if self._in_flight is not None else [])
+                return any(prefix is None or k[:len(prefix)] == prefix for k in keys)
+            return self._lock.wait_for(lambda: not busy() or self._stop, timeout)
+
+    def poll_results(self):
+        with self._lock:
+            results, self._results = self._results, []
+            return results
+
+    def shutdown(self, wait=True):
+        """Stop the worker. With `wait`, everything queued is written first."""
+        if wait:
+            self.wait()
+        with self._lock:
+            self._stop = True
+            self._lock.notify_all()
+        self._thread.join(timeout=None if wait else 0)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._queue and not self._stop:
+                    self._lock.wait()
+                if self._stop:
+                    return
+                key, (write_fn, description) = self._queue.popitem(last=False)
+                self._in_flight = key
+
+            error = None
+            try:
+                write_fn()
+            except Exception as e:
+                print(f"[BackgroundWriter] failed to save {description or key}: {e}")
+                error = e
+
+            with self._lock:
+                self._in_flight = None
+                self._results.append((key, description, error))
+                self._lock.notify_all()
@@ -0,0 +1,394 @@
+"""
+SpecimenStudy
+=============
+
+The scene-free half of GenericSpecimenEngine: study config loading, the
+key-based row index, and path resolution for one specimen.
+
+Nothing in here imports slicer / qt / vtk, so it can be used from worker
+processes and plain Python scripts (headless batch export, command-line
+tools). GenericSpecimenEngine re-exports `load_config`, and its
+GenericSpecimen extends `SpecimenPaths` with everything that needs the
+MRML scene.
+"""
+
+import os
+import re
+import csv
+import json
+import string
+import types
+
+
+# ---------------------------------------------------------------------------
+# Config helpers
+# ---------------------------------------------------------------------------
+
+def load_config(path):
+    """Load and normalize a study config json. See README.md for the schema."""
+    with open(path, "r", encoding="utf-8") as f:
+        cfg = json.load(f)
+
+    cfg.setdefault("study_dir", os.path.dirname(path))
+    cfg.setdefault("key_columns", ["ID"])
+    cfg.setdefault("done_column", "done")
+    cfg.setdefault("table_columns", list(cfg["key_columns"]) + [cfg["done_column"]])
+    cfg.setdefault("output_dir_pattern", list(cfg["key_columns"]))
+
+    cfg.setdefault("defaults", {})
+    cfg["defaults"].setdefault("image", {})
+    cfg["defaults"].setdefault("segment", {})
+    cfg.setdefault("presets", {})
+
+    cfg.setdefault("images", [])
+    cfg.setdefault("segmentation", {"enabled": False})
+    cfg.setdefault("landmarks", {"enabled": False})
+    cfg.setdefault("volume_rendering", {"enabled": False})
+    cfg.setdefault("window_level", {"enabled": False})
+    cfg.setdefault("batch_export", {"enabled": False})
+    cfg.setdefault("segment_editor", {})
+    cfg.setdefault("prefetch", {"enabled": False})
+    cfg.setdefault("closed_cache", {"enabled": False})
+    cfg.setdefault("save", {"async": False})
+    cfg.setdefault("autosave", {"enabled": False})
+    cfg.setdefault("database", {"backend": "csv"})
+    cfg.setdefault("leasing", {"enabled": False})
+    cfg.setdefault("timing", {"enabled": False})
+    cfg.setdefault("progressive_load", {"enabled": False})
+    cfg.setdefault("disk_cache", {"enabled": False})
+    return cfg
+
+
+def export_table_path(cfg, name):
+    """Path of a study-wide export table: `name` if absolute, else relative to
+    batch_export.output_dir (itself relative to study_dir) or study_dir."""
+    if not name or os.path.isabs(name):
+        return name
+    be_out_dir = cfg.get("batch_export", {}).get("output_dir")
+    if be_out_dir and not os.path.isabs(be_out_dir):
+        be_out_dir = os.path.join(cfg["study_dir"], be_out_dir)
+    return os.path.join(be_out_dir or cfg["study_dir"], name)
+
+
+def config_mtime(path):
+    """mtime (ns) of a config file, None if it cannot be stat'ed."""
+    try:
+        return os.stat(path).st_mtime_ns
+    except (OSError, TypeError):
+        return None
+
+
+def _merge(*dicts):
+    """Shallow dict merge, later entries win. None entries are skipped."""
+    result = {}
+    for d in dicts:
+        if d:
+            result.update(d)
+    return result
+
+
+def index_rows(rows, key_columns):
+    """Single pass over a list of row dicts.
+
+    Returns ({key: row_index}, {key: [row_index, ...]}) - the first dict maps
+    every key to its FIRST row, the second one lists every key that occurs
+    more than once together with all of its row indices (for reporting).
+    """
+    index = {}
+    duplicates = {}
+    for i, row in enumerate(rows):
+        key = tuple(row.get(c, "") for c in key_columns)
+        if key in index:
+            duplicates.setdefault(key, [index[key]]).append(i)
+            continue
+        index[key] = i
+    return index, duplicates
+
+
+def join_rows(db_rows, preseg_rows, key_columns):
+    """Hash join of database.csv and preseg.csv rows on key_columns.
+
+    Returns ({key: (db_row_index, db_row, preseg_row)} for every key present
+    in both, {"database": duplicates, "preseg": duplicates}) - duplicates as
+    returned by index_rows; the first row of a duplicated key is used.
+    """
+    db_index, db_dups = index_rows(db_rows, key_columns)
+    preseg_index, preseg_dups = index_rows(preseg_rows, key_columns)
+    joined = {}
+    for key, db_idx in db_index.items():
+        preseg_idx = preseg_index.get(key)
+        if preseg_idx is None:
+            continue
+        joined[key] = (db_idx, db_rows[db_idx], preseg_rows[preseg_idx])
+    return joined, {"database": db_dups, "preseg": preseg_dups}
+
+
+def read_csv_rows(path):
+    """Plain csv.DictReader equivalent of loading a table node + _table_to_dicts:
+    returns (list of row dicts with string values, ordered column names)."""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.DictReader(f)
+        rows = [{k: (v if v is not None else "") for k, v in row.items()} for row in reader]
+        return rows, list(reader.fieldnames or [])
+
+
+# ---------------------------------------------------------------------------
+# StudyPlan: the config compiled once per study
+# ---------------------------------------------------------------------------
+
+class PathTemplate:
+    """A `str.format` path pattern, parsed once.
+
+    `render(lookup)` only looks up the fields the pattern actually uses
+    (`lookup(name)` raises KeyError for unknown names, like format() would),
+    so no per-call merged context dict is needed.
+    """
+
+    __slots__ = ("pattern", "fields")
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        fields = []
+        for _, field, _, _ in string.Formatter().parse(pattern):
+            if field:
+                name = re.split(r"[.\[]", field, maxsplit=1)[0]
+                if name not in fields:
+                    fields.append(name)
+        self.fields = tuple(fields)
+
+    def render(self, lookup):
+        if not self.fields:
+            return self.pattern
+        return self.pattern.format(**{name: lookup(name) for name in self.fields})
+
+
+class StudyPlan:
+    """Immutable, precompiled form of a study config.
+
+    Built once per (config, preseg.csv columns): image entries have their
+    defaults + preset + inline settings merged, "pattern" entries are already
+    matched against the preseg columns (so a specimen only has to check
+    which of those columns are non-empty), segment definitions are merged
+    with defaults.segment, and every path_pattern is parsed into a
+    PathTemplate. `is_stale()` tells whether config.json changed on disk since
+    the plan was compiled.
+    """
+
+    def __init__(self, cfg, preseg_columns, config_path=None, config_mtime_ns=None):
+        self.config_path = config_path
+        self.config_mtime_ns = config_mtime_ns
+        self.preseg_columns = tuple(preseg_columns)
+
+        key_columns = set(cfg["key_columns"])
+        image_entries = []
+        for img_cfg in cfg["images"]:
+            pattern = img_cfg.get("pattern")
+            if not pattern:
+                image_entries.append((self._merged_image_cfg(cfg, img_cfg), None))
+                continue
+
+            regex = re.compile(pattern)
+            for col in self.preseg_columns:
+                if col in key_columns or not regex.match(col):
+                    continue
+
+                name = col
+                strip_prefix = img_cfg.get("strip_prefix")
+                if strip_prefix and name.startswith(strip_prefix):
+                    name = name[len(strip_prefix):]
+                strip_suffix = img_cfg.get("strip_suffix")
+                if strip_suffix and name.endswith(strip_suffix):
+                    name = name[:-len(strip_suffix)]
+
+                virtual_cfg = {k: v for k, v in img_cfg.items()
+                               if k not in ("pattern", "strip_prefix", "strip_suffix")}
+                virtual_cfg["name"] = name
+                virtual_cfg["csv_column"] = col
+                image_entries.append((self._merged_image_cfg(cfg, virtual_cfg), col))
+        self.image_entries = tuple(image_entries)   # (merged cfg, column that must be non-empty or None)
+
+        self.segments = tuple(types.MappingProxyType(_merge(cfg["defaults"]["segment"], seg_def))
+                              for seg_def in cfg["segmentation"].get("segments", []))
+
+        patterns = [c.get("path_pattern") for c, _ in self.image_entries]
+        patterns += [s.get("path_pattern") for s in self.segments]
+        patterns += [cfg["segmentation"].get("path_pattern"),
+                     cfg["landmarks"].get("path_pattern", "{label}-markups.mrk.json")]
+        self._templates = {p: PathTemplate(p) for p in patterns if p}
+
+    @staticmethod
+    def _merged_image_cfg(cfg, img_cfg):
+        preset = cfg["presets"].get(img_cfg.get("preset"), {}) if img_cfg.get("preset") else {}
+        return types.MappingProxyType(_merge(cfg["defaults"]["image"], preset, img_cfg))
+
+    def image_jobs(self, preseg_info):
+        """Merged image configs a specimen with this preseg row would load."""
+        return [img_cfg for img_cfg, col in self.image_entries if col is None or preseg_info.get(col)]
+
+    def template(self, pattern):
+        template = self._templates.get(pattern)
+        return template if template is not None else PathTemplate(pattern)
+
+    def is_stale(self):
+        return self.config_path is not None and config_mtime(self.config_path) != self.config_mtime_ns
+
+
+# ---------------------------------------------------------------------------
+# SpecimenPaths: identity + path resolution of one specimen (no scene access)
+# ---------------------------------------------------------------------------
+
+class SpecimenPaths:
+    def __init__(self, key_values, cfg, db_row, preseg_row, study_dir, plan=None):
+        self.cfg = cfg
+        self.key_columns = cfg["key_columns"]
+        self.key_values = tuple(key_values)
+        self.context = dict(zip(self.key_columns, self.key_values))
+        self.db_info = dict(db_row or {})
+        self.preseg_info = dict(preseg_row or {})
+        self.study_dir = study_dir
+        self.plan = plan if plan is not None else StudyPlan(cfg, list(self.preseg_info))
+
+    def rebind(self, cfg, plan, study_dir):
+        """Switch to a recompiled config (config.json changed on disk)."""
+        self.cfg = cfg
+        self.plan = plan
+        self.study_dir = study_dir
+
+    # ---- identity / paths ----
+
+    @property
+    def key(self):
+        return self.key_values
+
+    @property
+    def label(self):
+        return "-".join(str(v) for v in self.key_values)
+
+    @property
+    def out_dir(self):
+        parts = [str(self.context.get(k, self.db_info.get(k, k))) for k in self.cfg["output_dir_pattern"]]
+        return os.path.join(self.study_dir, *parts)
+
+    def _lookup(self, extra=None):
+        """Field lookup for PathTemplate.render: extra > preseg row > db row > key columns."""
+        sources = ((extra,) if extra else ()) + (self.preseg_info, self.db_info, self.context)
+
+        def lookup(name):
+            for source in sources:
+                if name in source:
+                    return source[name]
+            raise KeyError(name)
+        return lookup
+
+    def _format(self, pattern, extra=None):
+        return self.plan.template(pattern).render(self._lookup(extra))
+
+    def _to_abs(self, rel):
+        rel = str(rel).replace(2 * os.sep, os.sep)
+        if os.path.isabs(rel):
+            return rel
+        return os.path.join(self.study_dir, rel)
+
+    def markups_out_path(self):
+        lm_cfg = self.cfg["landmarks"]
+        col = lm_cfg.get("csv_column")
+        rel = self.preseg_info.get(col) if col else None
+        if not rel:
+            rel = self._format(lm_cfg.get("path_pattern", "{label}-markups.mrk.json"), {"label": self.label})
+        return self._to_abs(rel)
+
+    def segmentation_out_path(self):
+        seg_cfg = self.cfg["segmentation"]
+        return os.path.join(self.out_dir, seg_cfg.get("output_filename", "segment.seg.nrrd"))
+
+    def autosave_dir(self):
+        """Autosave journal directory: autosave.dir (relative to out_dir) or out_dir/.autosave."""
+        return os.path.join(self.out_dir, self.cfg["autosave"].get("dir", ".autosave"))
+
+    def export_dir(self):
+        """Where batch export writes this specimen's files: batch_export.output_dir
+        (absolute, or relative to study_dir) if given, else out_dir."""
+        be_out_dir = self.cfg["batch_export"].get("output_dir")
+        if be_out_dir:
+            return be_out_dir if os.path.isabs(be_out_dir) else os.path.join(self.study_dir, be_out_dir)
+        return self.out_dir
+
+    # ---- images: dynamic column expansion + defaults/preset/inline merge ----
+
+    def image_jobs(self):
+        """This specimen's image list: merged configs from the StudyPlan.
+
+        A normal entry (with "csv_column" or "path_pattern") -> exactly one job.
+        An entry with "pattern" (a regex) -> ZERO OR MORE jobs: one per
+        non-key preseg.csv column whose name matches the regex AND that has a
+        non-empty value for THIS specimen. The job's image name is the
+        column name (optionally with a prefix/suffix stripped). This is how
+        "open as many images as this specimen has, named after their
+        column" works - some specimens can end up with more/fewer images
+        than others.
+        """
+        return self.plan.image_jobs(self.preseg_info)
+
+    def resolve_image_path(self, img_cfg):
+        col = img_cfg.get("csv_column")
+        if col and self.preseg_info.get(col):
+            rel = self.preseg_info[col]
+        elif img_cfg.get("path_pattern"):
+            rel = self._format(img_cfg["path_pattern"], {"name": img_cfg.get("name")})
+        else:
+            raise ValueError(f"Cannot resolve path for image '{img_cfg.get('name')}': "
+                              f"no csv_column value and no path_pattern given")
+        return self._to_abs(rel)
+
+    def resolved_image_cfg(self, name):
+        """Fully merged config of the image called `name` (pattern-expanded names included), or None."""
+        for img_cfg in self.image_jobs():
+            if img_cfg.get("name") == name:
+                return img_cfg
+        return None
+
+    def image_paths(self, eager_only=False):
+        """Resolved paths of every image this specimen would load (for
+        prefetching). `eager_only`: leave out images with an on_demand /
+        background load policy."""
+        paths = []
+        for img_cfg in self.image_jobs():
+            if eager_only and img_cfg.get("load", "eager") != "eager" and not img_cfg.get("role"):
+                continue
+            try:
+                paths.append((self.resolve_image_path(img_cfg), img_cfg.get("type", "volume")))
+            except Exception:
+                continue
+        return paths
+
+    def cache_paths(self):
+        """Every file a load of this specimen reads - images, the saved
+        segmentation (or the segment sources while there is none), markups -
+        in load order (for cache warm-up)."""
+        paths = [path for path, _ in self.image_paths()]
+        seg_cfg = self.cfg["segmentation"]
+        if seg_cfg.get("enabled") and os.path.exists(self.segmentation_out_path()):
+            paths.append(self.segmentation_out_path())
+        elif seg_cfg.get("enabled"):
+            for seg_def in self.plan.segments:
+                if seg_def.get("source", "file") != "file":
+                    continue
+                try:
+                    path = self.resolve_segment_path(seg_cfg, seg_def)
+                except Exception:
+                    path = None
+                if path:
+                    paths.append(path)
+        if self.cfg["landmarks"].get("enabled"):
+            paths.append(self.markups_out_path())
+        return paths
+
+    def resolve_segment_path(self, seg_cfg, seg_def):
+        col = seg_def.get("csv_column")
+        if col and self.preseg_info.get(col):
+            return self._to_abs(self.preseg_info[col])
+        pattern = seg_def.get("path_pattern") or seg_cfg.get("path_pattern")
+        if pattern:
+            rel = self._format(pattern, {"segment_name": seg_def["name"]})
+            return self._to_abs(rel)
+        return None
@@ -0,0 +1,232 @@
+"""
+SpecimenTiming
+==============
+
+Named timing spans around the phases of loading / saving / closing a
+specimen and initializing a study (`"timing"` in README.md):
+
+    with timing.span("load.segmentation", label):
+        ...
+
+Every finished span is one record: phase, specimen, host, start time, wall
+time, bytes the process read during the span and its peak RSS.
+
+- bytes read is `rchar` of /proc/self/io, i.e. everything read through
+  read() - network file systems included, page cache hits too. It is empty
+  where /proc is not available.
+- peak RSS: when no other span is open, the kernel's high-water mark
+  (VmHWM) is reset through /proc/self/clear_refs, so an outermost span
+  reports its own peak and a nested span the peak since the outermost one
+  began. Where the reset is not possible, it is the process' lifetime peak.
+
+Each workstation appends to its own `<dir>/spans-<host>.jsonl` (or .csv),
+rotated to `spans-<host>.1.jsonl` ... when it grows over `max_mb`, so the
+log stays small on the shared study directory. `read_spans` + `summarize`
+turn all of them into median / p95 per phase for the module's timing panel.
+
+Nothing in here imports slicer.
+"""
+
+import os
+import sys
+import csv
+import glob
+import json
+import time
+import socket
+import threading
+import contextlib
+
+try:
+    import resource
+except ImportError:      # Windows
+    resource = None
+
+
+FIELDS = ["phase", "specimen", "host", "start", "wall_s", "bytes_read", "peak_rss_bytes", "error"]
+
+
+# ---------------------------------------------------------------------------
+# Process counters
+# ---------------------------------------------------------------------------
+
+def read_bytes():
+    """Bytes read by this process so far, None if unknown."""
+    try:
+        with open("/proc/self/io", "rb") as f:
+            for line in f:
+                if line.startswith(b"rchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def reset_peak_rss():
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss():
+    """Peak resident set size in bytes, None if unknown."""
+    try:
+        with open("/proc/self/status", "rb") as f:
+            for line in f:
+                if line.startswith(b"VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024   # bytes on macOS, KiB elsewhere
+
+
+# ---------------------------------------------------------------------------
+# Span logs
+# ---------------------------------------------------------------------------
+
+class NullTiming:
+    """Timing switched off: span() costs nothing."""
+
+    enabled = False
+
+    def span(self, phase, specimen=""):
+        return contextlib.nullcontext()
+
+
+NULL_TIMING = NullTiming()
+
+
+class SpanLog:
+    enabled = True
+
+    def __init__(self, directory, fmt="jsonl", max_bytes=5 * 1024 * 1024, backups=3):
+        if fmt not in ("jsonl", "csv"):
+            raise ValueError(f"timing.format must be 'jsonl' or 'csv', got '{fmt}'")
+        self.directory = directory
+        self.fmt = fmt
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.host = socket.gethostname()
+        self.path = os.path.join(directory, f"spans-{self.host}.{fmt}")
+        self._lock = threading.Lock()
+        self._open_spans = 0
+        self._write_failed = False
+
+    @contextlib.contextmanager
+    def span(self, phase, specimen=""):
+        with self._lock:
+            if self._open_spans == 0:
+                reset_peak_rss()
+            self._open_spans += 1
+        start = time.time()
+        t0 = time.perf_counter()
+        bytes0 = read_bytes()
+        error = ""
+        try:
+            yield
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            wall = time.perf_counter() - t0
+            bytes1 = read_bytes()
+            with self._lock:
+                self._open_spans -= 1
+            self.write({"phase": phase, "specimen": specimen, "host": self.host,
+                        "start": round(start, 3), "wall_s": round(wall, 4),
+                        "bytes_read": bytes1 - bytes0 if bytes0 is not None and bytes1 is not None else None,
+                        "peak_rss_bytes": peak_rss(), "error": error})
+
+    def write(self, record):
+        """Append one record. A log that cannot be written never breaks the
+        phase being timed; the failure is reported once."""
+        with self._lock:
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                if os.path.exists(self.path) and os.path.getsize(self.path) > self.max_bytes:
+                    self._rotate()
+                new_file = not os.path.exists(self.path)
+                with open(self.path, "a", encoding="utf-8", newline="") as f:
+                    if self.fmt == "jsonl":
+                        f.write(json.dumps(record) + "\n")
+                    else:
+                        writer = csv.DictWriter(f, fieldnames=FIELDS)
+                        if new_file:
+                            writer.writeheader()
+                        writer.writerow(record)
+            except OSError as e:
+                if not self._write_failed:
+                    print(f"[SpecimenTiming] cannot write '{self.path}': {e}")
+                    self._write_failed = True
+
+    def _rotate(self):
+        base, ext = os.path.splitext(self.path)
+        if self.backups < 1:
+            os.remove(self.path)
+            return
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{base}.{i}{ext}"):
+                os.replace(f"{base}.{i}{ext}", f"{base}.{i + 1}{ext}")
+        os.replace(self.path, f"{base}.1{ext}")
+
+
+# ---------------------------------------------------------------------------
+# Summary
+# ---------------------------------------------------------------------------
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def read_spans(directory):
+    """Every record of every workstation's span logs (rotated ones included)."""
+    records = []
+    for path in sorted(glob.glob(os.path.join(directory, "spans-*.jsonl"))):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue        # a line cut short by a crash
+    for path in sorted(glob.glob(os.path.join(directory, "spans-*.csv"))):
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            records.extend(csv.DictReader(f))
+    return records
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile (q in 0..100) of an ascending list."""
+    if not sorted_values:
+        return None
+    rank = max(1, int(-(-q * len(sorted_values) // 100)))   # ceil
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(records):
+    """One row per phase (sorted by phase): n, median and p95 wall time,
+    median bytes read, max peak RSS. Failed spans are left out."""
+    by_phase = {}
+    for record in records:
+        if record.get("error"):
+            continue
+        by_phase.setdefault(record.get("phase", ""), []).append(record)
+
+    rows = []
+    for phase in sorted(by_phase):
+        walls = sorted(w for w in (_number(r.get("wall_s")) for r in by_phase[phase]) if w is not None)
+        reads = sorted(b for b in (_number(r.get("bytes_read")) for r in by_phase[phase]) if b is not None)
+        peaks = [p for p in (_number(r.get("peak_rss_bytes")) for r in by_phase[phase]) if p is not None]
+        rows.append({"phase": phase, "n": len(walls),
+                     "median_s": percentile(walls, 50), "p95_s": percentile(walls, 95),
+                     "median_bytes_read": percentile(reads, 50),
+                     "max_peak_rss_bytes": max(peaks) if peaks else None})
+    return rows
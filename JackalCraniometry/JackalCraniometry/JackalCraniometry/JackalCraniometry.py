@@ -167,6 +167,8 @@ class JackalCraniometryWidget(ScriptedLoadableModuleWidget, VTKObservationMixin)
         continue
 
     self.removeObservers()
+    if self.logic:
+      self.logic.shutdown_node_index()
 
 
   def enter(self):
@@ -439,7 +441,99 @@ class JackalCraniometryWidget(ScriptedLoadableModuleWidget, VTKObservationMixin)
   
 
   def onBtnBatchExport(self):
-    batch_exporter()
+    landmark_table_exporter()
+
+#
+# StorageNodeIndex
+#
+
+class StorageNodeIndex:
+  """
+  File path -> storable node index, so looking up an already loaded table does not scan
+  every node of the scene. Scene NodeAdded / NodeRemoved observers keep it current, a
+  ModifiedEvent observer per storable node catches storage nodes attached after the node
+  was added. get() re-checks the hit, a stale entry can only cause a miss.
+  """
+
+  def __init__(self, scene):
+    self._scene = scene
+    self._by_path = {}
+    self._path_of = {}
+    self._node_tags = {}
+    self._scene_tags = [
+      scene.AddObserver(scene.NodeAddedEvent, self._on_node_added),
+      scene.AddObserver(scene.NodeRemovedEvent, self._on_node_removed),
+      scene.AddObserver(scene.EndCloseEvent, lambda caller, event: self._rebuild()),
+    ]
+    self._rebuild()
+
+  def get(self, path):
+    for node_id in list(self._by_path.get(path, ())):
+      node = self._scene.GetNodeByID(node_id)
+      storage = node.GetStorageNode() if node is not None else None
+      if storage is not None and storage.GetFileName() == path:
+        return node
+    return None
+
+  def close(self):
+    for tag in self._scene_tags:
+      self._scene.RemoveObserver(tag)
+    self._scene_tags = []
+    self._clear()
+
+  def _clear(self):
+    for node, tag in self._node_tags.values():
+      node.RemoveObserver(tag)
+    self._by_path = {}
+    self._path_of = {}
+    self._node_tags = {}
+
+  def _rebuild(self):
+    self._clear()
+    for node in slicer.util.getNodesByClass("vtkMRMLStorableNode"):
+      self._track(node)
+
+  def _track(self, node):
+    if node.GetID() in self._node_tags:
+      return
+    self._node_tags[node.GetID()] = (node, node.AddObserver(vtk.vtkCommand.ModifiedEvent, self._on_node_modified))
+    self._update(node)
+
+  def _update(self, node):
+    node_id = node.GetID()
+    storage = node.GetStorageNode()
+    path = storage.GetFileName() if storage is not None else None
+    old_path = self._path_of.get(node_id)
+    if old_path == path:
+      return
+    if old_path is not None:
+      self._by_path.get(old_path, set()).discard(node_id)
+    if path:
+      self._path_of[node_id] = path
+      self._by_path.setdefault(path, set()).add(node_id)
+    else:
+      self._path_of.pop(node_id, None)
+
+  def _forget(self, node_id):
+    node_tag = self._node_tags.pop(node_id, None)
+    if node_tag is not None:
+      node_tag[0].RemoveObserver(node_tag[1])
+    path = self._path_of.pop(node_id, None)
+    if path is not None:
+      self._by_path.get(path, set()).discard(node_id)
+
+  @vtk.calldata_type(vtk.VTK_OBJECT)
+  def _on_node_added(self, caller, event, node):
+    if node is not None and node.IsA("vtkMRMLStorableNode"):
+      self._track(node)
+
+  @vtk.calldata_type(vtk.VTK_OBJECT)
+  def _on_node_removed(self, caller, event, node):
+    if node is not None and node.IsA("vtkMRMLStorableNode"):
+      self._forget(node.GetID())
+
+  def _on_node_modified(self, caller, event):
+    self._update(caller)
 
 class JackalCraniometryLogic(ScriptedLoadableModuleLogic):
 
@@ -453,6 +547,7 @@ class JackalCraniometryLogic(ScriptedLoadableModuleLogic):
     Called when the logic class is instantiated. Can be used for initializing member variables.
     """
     ScriptedLoadableModuleLogic.__init__(self)
+    self._node_index = None
 
     self.dbTable = None
     self.dbDictList = []
@@ -483,18 +578,20 @@ class JackalCraniometryLogic(ScriptedLoadableModuleLogic):
       parameterNode.SetParameter("ShowNonControl","true")
 
 
+  @property
+  def node_index(self):
+    if self._node_index is None:
+      self._node_index = StorageNodeIndex(slicer.mrmlScene)
+    return self._node_index
+
+  def shutdown_node_index(self):
+    if self._node_index is not None:
+      self._node_index.close()
+      self._node_index = None
+
   def get_node_if_loaded(self, file_path):
-    all_node = slicer.mrmlScene.GetNodes()
-    node_name = ""
-    for n in all_node:
-      try:
-        if n.GetStorageNode().GetFileName()==file_path:
-          node_name = n.GetName()
-          break
-      except:
-        continue    
-      
-    return node_name
+    node = self.node_index.get(file_path)
+    return node.GetName() if node is not None else ""
 
 
   def initializeStudy(self):
@@ -504,17 +601,13 @@ class JackalCraniometryLogic(ScriptedLoadableModuleLogic):
     print(f"Database path {db_path}")
     print(f"Presegmentation path {preseg_path}")
 
-    try:
-      _node = slicer.util.getNode(self.get_node_if_loaded(db_path))
-      self.dbTable = _node
-    except slicer.util.MRMLNodeNotFoundException:
+    self.dbTable = self.node_index.get(db_path)
+    if self.dbTable is None:
       self.dbTable = slicer.util.loadTable(db_path)
 
-    try:
-      _node = _node = slicer.util.getNode(self.get_node_if_loaded(preseg_path))
-      self.presegTable = _node
-    except slicer.util.MRMLNodeNotFoundException:
-      self.presegTable = slicer.util.loadTable(preseg_path)    
+    self.presegTable = self.node_index.get(preseg_path)
+    if self.presegTable is None:
+      self.presegTable = slicer.util.loadTable(preseg_path)
 
     self.dbDictList = self.init_table(self.dbTable)
     self.presegDictList = self.init_table(self.presegTable)
@@ -836,3 +929,91 @@ def batch_exporter():
 
         #close specimen
         slicer.modules.JackalCraniometryWidget.logic.close_active_specimen(True)
+
+
+#
+# Landmark table export (no scene)
+#
+
+def read_markups_rows(path):
+    """One row per control point of a .mrk.json file, x/y/z in RAS (LPS files are converted)."""
+    import json
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    rows = []
+    for markup in data.get("markups", []):
+        lps = markup.get("coordinateSystem", "LPS") == "LPS"
+        for point in markup.get("controlPoints", []):
+            position = point.get("position")
+            if position and len(position) == 3:
+                x, y, z = (float(v) for v in position)
+                if lps:
+                    x, y = -x, -y
+            else:
+                x = y = z = None
+            rows.append({"label": point.get("label", ""), "description": point.get("description", ""),
+                         "x": x, "y": y, "z": z, "position_status": point.get("positionStatus", "")})
+    return rows
+
+
+def landmark_table_exporter(force=False, workers=8):
+    """All done specimens' landmarks in one long table (results/landmarks.csv),
+    read straight from the markups files in parallel instead of loading every specimen.
+    Specimens whose markups file did not change (landmarks.csv.manifest.json) keep their old rows."""
+    import csv, json
+    import concurrent.futures
+    logic = slicer.modules.JackalCraniometryWidget.logic
+    slicer.modules.JackalCraniometryWidget.onBtnInitializeStudy()
+
+    columns = ["ID", "trial", "label", "description", "x", "y", "z", "position_status"]
+    out_path = os.path.join(JackalCraniometryLogic._root_dir_, "results", "landmarks.csv")
+    manifest_path = out_path + ".manifest.json"
+
+    old_entries, old_rows = {}, {}
+    if not force and os.path.exists(out_path) and os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            old_entries = json.load(f)
+        with open(out_path, "r", encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f):
+                old_rows.setdefault(row["ID"], []).append(row)
+
+    jobs, entries, rows_by_id = [], {}, {}
+    for sid, specimen in sorted(logic.Specimens.items()):
+        if not specimen.db_info.get("done") == '1' or not os.path.exists(specimen.markups_path):
+            continue
+        stat = os.stat(specimen.markups_path)
+        entries[sid] = [specimen.markups_path, stat.st_mtime_ns, stat.st_size]
+        jobs.append(sid)
+        old = old_entries.get(sid)
+        if old is not None and old[:3] == entries[sid] and len(old_rows.get(sid, [])) == old[3]:
+            rows_by_id[sid] = old_rows.get(sid, [])
+
+    def read(sid):
+        return sid, [dict({"ID": sid, "trial": ""}, **point) for point in read_markups_rows(entries[sid][0])]
+
+    to_read = [sid for sid in jobs if sid not in rows_by_id]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        for future in concurrent.futures.as_completed([executor.submit(read, sid) for sid in to_read]):
+            try:
+                sid, rows = future.result()
+                rows_by_id[sid] = rows
+            except (OSError, ValueError) as e:
+                print(f"Cannot read markups: {e}")
+
+    rows = []
+    for sid in jobs:
+        if sid in rows_by_id:
+            entries[sid] = entries[sid][:3] + [len(rows_by_id[sid])]
+            rows.extend(rows_by_id[sid])
+        else:
+            entries.pop(sid)
+
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    with open(out_path + ".tmp", "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=columns, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(out_path + ".tmp", out_path)
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(entries, f, indent=1)
+    print(f"{len(rows)} landmarks of {len(jobs)} specimens written to {out_path} ({len(to_read)} markups files read)")
@@ -160,6 +160,8 @@ class PigChunkerWidget(ScriptedLoadableModuleWidget, VTKObservationMixin):
     Called when the application closes and the module widget is destroyed.
     """
     self.removeObservers()
+    if self.logic:
+      self.logic.shutdown_node_index()
 
   def enter(self):
     """
@@ -435,6 +437,98 @@ class PigChunkerWidget(ScriptedLoadableModuleWidget, VTKObservationMixin):
   def onBtnBatchExport(self):
     batch_exporter()
 
+#
+# StorageNodeIndex
+#
+
+class StorageNodeIndex:
+  """
+  File path -> storable node index, so looking up an already loaded table does not scan
+  every node of the scene. Scene NodeAdded / NodeRemoved observers keep it current, a
+  ModifiedEvent observer per storable node catches storage nodes attached after the node
+  was added. get() re-checks the hit, a stale entry can only cause a miss.
+  """
+
+  def __init__(self, scene):
+    self._scene = scene
+    self._by_path = {}
+    self._path_of = {}
+    self._node_tags = {}
+    self._scene_tags = [
+      scene.AddObserver(scene.NodeAddedEvent, self._on_node_added),
+      scene.AddObserver(scene.NodeRemovedEvent, self._on_node_removed),
+      scene.AddObserver(scene.EndCloseEvent, lambda caller, event: self._rebuild()),
+    ]
+    self._rebuild()
+
+  def get(self, path):
+    for node_id in list(self._by_path.get(path, ())):
+      node = self._scene.GetNodeByID(node_id)
+      storage = node.GetStorageNode() if node is not None else None
+      if storage is not None and storage.GetFileName() == path:
+        return node
+    return None
+
+  def close(self):
+    for tag in self._scene_tags:
+      self._scene.RemoveObserver(tag)
+    self._scene_tags = []
+    self._clear()
+
+  def _clear(self):
+    for node, tag in self._node_tags.values():
+      node.RemoveObserver(tag)
+    self._by_path = {}
+    self._path_of = {}
+    self._node_tags = {}
+
+  def _rebuild(self):
+    self._clear()
+    for node in slicer.util.getNodesByClass("vtkMRMLStorableNode"):
+      self._track(node)
+
+  def _track(self, node):
+    if node.GetID() in self._node_tags:
+      return
+    self._node_tags[node.GetID()] = (node, node.AddObserver(vtk.vtkCommand.ModifiedEvent, self._on_node_modified))
+    self._update(node)
+
+  def _update(self, node):
+    node_id = node.GetID()
+    storage = node.GetStorageNode()
+    path = storage.GetFileName() if storage is not None else None
+    old_path = self._path_of.get(node_id)
+    if old_path == path:
+      return
+    if old_path is not None:
+      self._by_path.get(old_path, set()).discard(node_id)
+    if path:
+      self._path_of[node_id] = path
+      self._by_path.setdefault(path, set()).add(node_id)
+    else:
+      self._path_of.pop(node_id, None)
+
+  def _forget(self, node_id):
+    node_tag = self._node_tags.pop(node_id, None)
+    if node_tag is not None:
+      node_tag[0].RemoveObserver(node_tag[1])
+    path = self._path_of.pop(node_id, None)
+    if path is not None:
+      self._by_path.get(path, set()).discard(node_id)
+
+  @vtk.calldata_type(vtk.VTK_OBJECT)
+  def _on_node_added(self, caller, event, node):
+    if node is not None and node.IsA("vtkMRMLStorableNode"):
+      self._track(node)
+
+  @vtk.calldata_type(vtk.VTK_OBJECT)
+  def _on_node_removed(self, caller, event, node):
+    if node is not None and node.IsA("vtkMRMLStorableNode"):
+      self._forget(node.GetID())
+
+  def _on_node_modified(self, caller, event):
+    self._update(caller)
+
 #
 # PigChunkerLogic
 #
@@ -446,6 +540,7 @@ class PigChunkerLogic(ScriptedLoadableModuleLogic):
     Called when the logic class is instantiated. Can be used for initializing member variables.
     """
     ScriptedLoadableModuleLogic.__init__(self)
+    self._node_index = None
 
     self._database_csv_path_ = fix_path(__database_csv_path__)
     self._preseg_csv_path_ =  fix_path(__preseg_csv_path__)
@@ -480,18 +575,20 @@ class PigChunkerLogic(ScriptedLoadableModuleLogic):
       parameterNode.SetParameter("ShowNonControl","true")
 
 
+  @property
+  def node_index(self):
+    if self._node_index is None:
+      self._node_index = StorageNodeIndex(slicer.mrmlScene)
+    return self._node_index
+
+  def shutdown_node_index(self):
+    if self._node_index is not None:
+      self._node_index.close()
+      self._node_index = None
+
   def get_node_if_loaded(self, file_path):
-    all_node = slicer.mrmlScene.GetNodes()
-    node_name = ""
-    for n in all_node:
-      try:
-        if n.GetStorageNode().GetFileName()==file_path:
-          node_name = n.GetName()
-          break
-      except:
-        continue    
-      
-    return node_name
+    node = self.node_index.get(file_path)
+    return node.GetName() if node is not None else ""
 
 
   def initializeStudy(self):
@@ -501,17 +598,13 @@ class PigChunkerLogic(ScriptedLoadableModuleLogic):
     print(f"Database path {db_path}")
     print(f"Presegmentation path {preseg_path}")
 
-    try:
-      _node = slicer.util.getNode(self.get_node_if_loaded(db_path))
-      self.dbTable = _node
-    except slicer.util.MRMLNodeNotFoundException:
+    self.dbTable = self.node_index.get(db_path)
+    if self.dbTable is None:
       self.dbTable = slicer.util.loadTable(db_path)
 
-    try:
-      _node = _node = slicer.util.getNode(self.get_node_if_loaded(preseg_path))
-      self.presegTable = _node
-    except slicer.util.MRMLNodeNotFoundException:
-      self.presegTable = slicer.util.loadTable(preseg_path)    
+    self.presegTable = self.node_index.get(preseg_path)
+    if self.presegTable is None:
+      self.presegTable = slicer.util.loadTable(preseg_path)
 
     self.dbDictList = self.init_table(self.dbTable)
     self.presegDictList = self.init_table(self.presegTable)
@@ -734,11 +827,8 @@ class Specimen():
       slicer.mrmlScene.RemoveNode(_mask_node)
     except:
       print(f"unable to open {path}")
-      label_dummy = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLLabelMapVolumeNode")
-      slicer.vtkSlicerVolumesLogic().CreateLabelVolumeFromVolume(slicer.mrmlScene, label_dummy, default_mask_node)
-      empty = label_dummy.GetImageData().GetPointData().GetScalars().Fill(0)
-      slicer.mrmlScene.RemoveNode(label_dummy)
-      segmentation_node.AddSegmentFromBinaryLabelmapRepresentation(empty,name)
+      # empty extent: no voxel buffer until the segment is painted
+      segmentation_node.GetSegmentation().AddEmptySegment("", name)
   
   def load(self,load_bg = True):
     print(f"loading specimen {self.ID} measurement {self.measurement}")
@@ -826,7 +916,53 @@ class Specimen():
     self.node_dict = dict(remaining_nodes)
 
 
-def batch_exporter():
+# ---- incremental batch export ----
+# One <sid>-export_manifest.json next to the exported files records size / mtime /
+# sha1 of the inputs plus the exported files; unchanged specimens are skipped on the
+# next run (hashing only happens when size or mtime changed).
+
+def _file_fingerprint(path, previous=None):
+    import hashlib
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if previous and previous.get("size") == st.st_size and previous.get("mtime_ns") == st.st_mtime_ns:
+        return dict(previous)
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(4 * 1024 * 1024), b""):
+            h.update(chunk)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha1": h.hexdigest()}
+
+
+def _check_export_manifest(manifest_file, inputs, settings):
+    import json
+    try:
+        with open(manifest_file, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+    old_inputs = manifest.get("inputs", {})
+    fingerprints = {p: _file_fingerprint(p, old_inputs.get(p)) for p in inputs}
+    up_to_date = (
+        bool(manifest)
+        and manifest.get("settings") == settings
+        and set(old_inputs) == set(fingerprints)
+        and all(fp is not None and fp.get("sha1") == old_inputs[p].get("sha1") for p, fp in fingerprints.items())
+        and all(os.path.exists(p) for p in manifest.get("outputs", []))
+    )
+    return up_to_date, fingerprints
+
+
+def _write_export_manifest(manifest_file, fingerprints, settings, outputs):
+    import json
+    with open(manifest_file + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"version": 1, "settings": settings, "inputs": fingerprints, "outputs": outputs}, f, indent=1)
+    os.replace(manifest_file + ".tmp", manifest_file)
+
+
+def batch_exporter(force = False):
     import vtk, qt, ctk, slicer
     import os
     if slicer.modules.PigChunkerWidget.logic.hasActiveSpecimen:
@@ -837,6 +973,15 @@ def batch_exporter():
     for (sid,measurement), specimen in slicer.modules.PigChunkerWidget.logic.Specimens.items():
         if not specimen.db_info["done"]=='1':
             continue
+        export_dir = specimen.slicer_out_dir
+        manifest_file = os.path.join(export_dir, f"{sid}-export_manifest.json")
+        settings = {"segment_names": list(segment_names)}
+        up_to_date, fingerprints = _check_export_manifest(manifest_file, [specimen.segment_path, specimen.mask_path], settings)
+        if up_to_date and not force:
+            print(f"specimen {specimen.ID} unchanged since the last export, skipped")
+            continue
+        written = []
+
         #open specimen
         slicer.modules.PigChunkerWidget.logic.load_specimen(sid,measurement,load_bg = False)
 
@@ -867,9 +1012,13 @@ def batch_exporter():
             myStorageNode.SetFileName(out_file)
             myStorageNode.WriteData(labelmap_node)
             print(f"Saving {out_file}")
+            written.append(out_file)
             slicer.mrmlScene.RemoveNode(myStorageNode)
             slicer.mrmlScene.RemoveNode(labelmap_node)
 
 
+        if os.path.isdir(export_dir):
+            _write_export_manifest(manifest_file, fingerprints, settings, written)
+
         #close specimen
         slicer.modules.PigChunkerWidget.logic.close_active_specimen(True)